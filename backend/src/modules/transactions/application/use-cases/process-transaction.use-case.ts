@@ -9,6 +9,9 @@ import { RulesEngineService } from '../../../rules/application/services/rules-en
 import { AuditService } from '../../../audit/application/services/audit.service';
 import { CreateTransactionDto } from '../dtos/create-transaction.dto';
 
+// Timeout de la llamada al ML Service; se envía también como deadline para su control de admisión
+const ML_SERVICE_TIMEOUT_MS = 2000;
+
 export interface ProcessTransactionResult {
   transaction: Transaction;
   riskScore: number;
@@ -147,9 +150,10 @@ export class ProcessTransactionUseCase {
           bin: transaction.bin,
         },
         {
-          timeout: 2000, // 2 segundos timeout
+          timeout: ML_SERVICE_TIMEOUT_MS,
           headers: {
             'Content-Type': 'application/json',
+            'X-Request-Timeout-Ms': String(ML_SERVICE_TIMEOUT_MS),
           },
         },
       );
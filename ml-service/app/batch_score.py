@@ -0,0 +1,299 @@
+"""
+Scoring offline de un archivo de transacciones con un pool de procesos
+
+Lee el CSV/Parquet por bloques (mismas columnas que la ingesta de entrenamiento), evalúa cada
+bloque en un proceso del pool con el encoder vectorizado y el modelo, y escribe los resultados en
+orden en un CSV a medida que se completan. Tras cada bloque se guarda un checkpoint
+(`<salida>.checkpoint`) con las filas leídas y el tamaño de la salida: si el proceso se cae, al
+volver a ejecutar el mismo comando se trunca la salida al último bloque completo y se continúa
+desde ahí.
+
+El modelo puede ser una versión del registro (por defecto la versión activa), un directorio de
+versión o compilado, o un artefacto .joblib. Las tablas de riesgo se leen de DATA_PATH igual que
+en el servicio.
+
+Uso (desde ml-service/):
+    python -m app.batch_score data/transacciones.csv scores.csv --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .features.velocity import VELOCITY_FEATURES
+from .models.fraud_detector import FraudDetector
+from .models.registry import ARTIFACT_FILE, COMPILED_DIR, ModelRegistry
+from .training.ingestion import REQUIRED_COLUMNS, iter_raw_chunks, time_columns
+
+DEFAULT_CHUNK_SIZE = 100_000
+SCORE_COLUMNS = ('risk_score', 'fraud_probability', 'confidence', 'anomaly_score')
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+# Detector del proceso del pool (se carga una vez en el initializer)
+_detector: Optional[FraudDetector] = None
+
+
+def resolve_model(spec: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Traduce --model a rutas cargables: {'compiled', 'artifact', 'version'}
+    Acepta None (versión activa del registro), una versión registrada, un directorio de versión o
+    compilado, o un artefacto .joblib
+    """
+    if spec is not None and os.path.isfile(spec):
+        return {'compiled': None, 'artifact': spec, 'version': None}
+
+    if spec is not None and os.path.isdir(spec):
+        artifact = os.path.join(spec, ARTIFACT_FILE)
+        if os.path.exists(artifact):
+            compiled = os.path.join(spec, COMPILED_DIR)
+            return {
+                'compiled': compiled if os.path.isdir(compiled) else None,
+                'artifact': artifact,
+                'version': os.path.basename(os.path.normpath(spec)),
+            }
+        return {'compiled': spec, 'artifact': None, 'version': None}
+
+    registry = ModelRegistry()
+    version = spec or registry.current_version()
+    if version is None:
+        raise ValueError("El registro no tiene una versión activa; indicar --model")
+    if not os.path.exists(registry.artifact_path(version)):
+        raise ValueError(f"La versión {version} no existe en el registro")
+    compiled = registry.compiled_path(version)
+    return {
+        'compiled': compiled if os.path.isdir(compiled) else None,
+        'artifact': registry.artifact_path(version),
+        'version': version,
+    }
+
+
+def load_detector(model: Dict[str, Optional[str]]) -> FraudDetector:
+    if model['compiled'] is not None:
+        detector = FraudDetector.from_compiled(model['compiled'], estimators_path=model['artifact'])
+    else:
+        detector = FraudDetector.from_artifact(model['artifact'])
+    if model['version'] is not None:
+        detector.model_version = model['version']
+    return detector
+
+
+def _init_worker(model: Dict[str, Optional[str]]):
+    global _detector
+    _detector = load_detector(model)
+
+
+def score_chunk(first_row: int, raw: pd.DataFrame, id_column: Optional[str] = None) -> Tuple[int, int, bytes]:
+    """
+    Evalúa un bloque crudo; retorna (filas leídas, filas evaluadas, líneas CSV sin encabezado)
+    Las filas incompletas se omiten; la columna `row` (posición en el archivo, desde 0) permite cruzarlas
+    """
+    rows_read = len(raw)
+    hour, day_of_week = time_columns(raw)
+    rows = np.arange(first_row, first_row + rows_read)
+
+    valid = raw[list(REQUIRED_COLUMNS)].notna().all(axis=1) & hour.notna() & day_of_week.notna()
+    if not valid.all():
+        raw, hour, day_of_week = raw[valid], hour[valid], day_of_week[valid]
+        rows = rows[valid.to_numpy()]
+    if not len(raw):
+        return rows_read, 0, b''
+
+    encoder = _detector.feature_encoder
+    velocity = None
+    if encoder.uses_velocity and all(name in raw.columns for name in VELOCITY_FEATURES):
+        velocity = raw[list(VELOCITY_FEATURES)].fillna(0).to_numpy(dtype=np.float64)
+
+    X = encoder.encode_columns(
+        amount=raw['amount'].to_numpy(),
+        merchant_category_code=raw['merchantCategoryCode'],
+        country_code=raw['countryCode'],
+        bin_code=raw['bin'],
+        hour=hour.to_numpy(dtype=np.int64),
+        day_of_week=day_of_week.to_numpy(dtype=np.int64),
+        velocity=velocity
+    )
+    scores = _detector.score_matrix(X)
+
+    output = {'row': rows}
+    if id_column is not None:
+        output[id_column] = raw[id_column].to_numpy()
+    # Redondear antes de escribir es más barato que float_format (que formatea valor por valor)
+    output.update((name, np.round(scores[name], 6)) for name in SCORE_COLUMNS)
+    frame = pd.DataFrame(output, copy=False)
+    frame['model_version'] = _detector.model_version
+
+    data = frame.to_csv(index=False, header=False, lineterminator='\n')
+    return rows_read, len(frame), data.encode()
+
+
+def count_rows(path: str) -> Optional[int]:
+    """Filas de datos del archivo para estimar el progreso (None si no se puede contar barato)"""
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return None
+        return pq.ParquetFile(path).metadata.num_rows
+
+    lines = 0
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(16 * 1024 * 1024)
+            if not block:
+                break
+            lines += block.count(b'\n')
+    return max(0, lines - 1)
+
+
+def _input_identity(path: str) -> Dict[str, Any]:
+    stat = os.stat(path)
+    return {'input': os.path.abspath(path), 'input_size': stat.st_size, 'input_mtime': stat.st_mtime}
+
+
+def read_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """Escribe el checkpoint de forma atómica (archivo temporal + os.replace)"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _progress(rows_read: int, total_rows: Optional[int], elapsed: float, rows_resumed: int):
+    rate = (rows_read - rows_resumed) / max(elapsed, 1e-9)
+    line = f"{rows_read:,} filas | {rate:,.0f} filas/s"
+    if total_rows:
+        remaining = max(0, total_rows - rows_read) / max(rate, 1e-9)
+        line += f" | {min(100.0, rows_read * 100 / total_rows):.1f}% | restante ~{remaining / 60:.1f} min"
+    print(line, file=sys.stderr, flush=True)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    model = resolve_model(args.model)
+    # Se carga en el proceso principal para validar el modelo y conocer su versión
+    detector = load_detector(model)
+
+    checkpoint_path = args.output + CHECKPOINT_SUFFIX
+    identity = {**_input_identity(args.input), 'model_version': detector.model_version, 'id_column': args.id_column}
+    checkpoint = None if args.restart else read_checkpoint(checkpoint_path)
+
+    if checkpoint is not None:
+        mismatched = [key for key, value in identity.items() if checkpoint.get(key) != value]
+        if mismatched:
+            raise ValueError(
+                f"El checkpoint {checkpoint_path} corresponde a otra ejecución (difiere en {mismatched}); "
+                f"usar --restart para empezar de cero"
+            )
+        output = open(args.output, 'r+b')
+        output.truncate(checkpoint['output_bytes'])
+        output.seek(checkpoint['output_bytes'])
+        print(f"Retomando desde la fila {checkpoint['rows_read']:,}", file=sys.stderr)
+    else:
+        checkpoint = {**identity, 'rows_read': 0, 'rows_scored': 0, 'output_bytes': 0}
+        output = open(args.output, 'wb')
+        columns = ['row', *([args.id_column] if args.id_column else []), *SCORE_COLUMNS, 'model_version']
+        output.write((','.join(columns) + '\n').encode())
+
+    rows_resumed = checkpoint['rows_read']
+    total_rows = count_rows(args.input)
+    extra_columns = (args.id_column,) if args.id_column else ()
+    chunks = iter_raw_chunks(args.input, args.chunk_size, extra_columns=extra_columns, skip_rows=rows_resumed)
+
+    workers = max(1, args.workers)
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model,))
+    else:
+        global _detector
+        _detector = detector
+
+    start = time.perf_counter()
+
+    def write_result(result: Tuple[int, int, bytes]):
+        rows_read, rows_scored, data = result
+        output.write(data)
+        output.flush()
+        os.fsync(output.fileno())
+        # El checkpoint solo avanza cuando el bloque ya está en disco
+        checkpoint['rows_read'] += rows_read
+        checkpoint['rows_scored'] += rows_scored
+        checkpoint['output_bytes'] = output.tell()
+        write_checkpoint(checkpoint_path, checkpoint)
+        _progress(checkpoint['rows_read'], total_rows, time.perf_counter() - start, rows_resumed)
+
+    try:
+        # A lo sumo 2 bloques por worker en vuelo: la memoria no depende del tamaño del archivo
+        pending = deque()
+        first_row = rows_resumed
+        for raw in chunks:
+            if args.id_column and args.id_column not in raw.columns:
+                raise ValueError(f"La columna {args.id_column} no está en {args.input}")
+            if executor is None:
+                write_result(score_chunk(first_row, raw, args.id_column))
+            else:
+                pending.append(executor.submit(score_chunk, first_row, raw, args.id_column))
+                if len(pending) >= 2 * workers:
+                    write_result(pending.popleft().result())
+            first_row += len(raw)
+
+        while pending:
+            write_result(pending.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        output.close()
+
+    os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - start
+    return {
+        'output': args.output,
+        'model_version': detector.model_version,
+        'rows_read': checkpoint['rows_read'],
+        'rows_scored': checkpoint['rows_scored'],
+        'rows_skipped': checkpoint['rows_read'] - checkpoint['rows_scored'],
+        'rows_resumed': rows_resumed,
+        'workers': workers,
+        'seconds': elapsed,
+        'rows_per_second': (checkpoint['rows_read'] - rows_resumed) / max(elapsed, 1e-9),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Archivo CSV o Parquet con transacciones")
+    parser.add_argument("output", help="Archivo CSV de resultados")
+    parser.add_argument("--model", help="Versión del registro, directorio o artefacto .joblib (por defecto la versión activa)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Procesos del pool")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Filas por bloque")
+    parser.add_argument("--id-column", help="Columna del input que se copia a la salida para cruzar resultados")
+    parser.add_argument("--restart", action="store_true", help="Ignora el checkpoint y empieza de cero")
+    args = parser.parse_args()
+
+    try:
+        summary = run(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    for key, value in summary.items():
+        print(f"{key:18s} {value:,.1f}" if isinstance(value, float) else f"{key:18s} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +7,7 @@ class Settings(BaseSettings):
     PORT: int = 5000
     DEBUG: bool = False
     LOG_LEVEL: str = "INFO"
+    WORKERS: int = 1  # Procesos de uvicorn (python -m app.server)
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:3001"]
@@ -14,16 +15,87 @@ class Settings(BaseSettings):
     # Configuración del modelo
     MODEL_PATH: str = "models"
     MODEL_NAME: str = "fraud_detector_v1.joblib"
-    RETRAIN_INTERVAL_HOURS: int = 24
+    RETRAIN_INTERVAL_HOURS: int = 24  # 0 desactiva el reentrenamiento programado
+    BOOTSTRAP_TRAINING: bool = True  # Sin modelo, entrenar el primero en segundo plano (el servicio arranca no listo)
+    USE_COMPILED_TREES: bool = True
+    COMPILED_TREES_MAX_BATCH: int = 512
+    MODEL_REGISTRY_MAX_LOADED: int = 3
+    MODEL_ARTIFACT_MMAP: bool = True  # Mapear el ensemble compilado en memoria (páginas compartidas)
     
     # Configuración de datos
     DATA_PATH: str = "data"
     TRAINING_DATA_FILE: str = "training_data.csv"
+    TRAINING_LABEL_COLUMN: str = "is_fraud"
+    TRAINING_CHUNK_SIZE: int = 500000
+    TRAINING_MAX_ROWS: int = 0  # 0 = sin límite
+    TRAINING_SAMPLE_ROWS: int = 0  # Muestra uniforme del archivo; 0 = todas las filas en memoria
+    SIMULATED_TRAINING_SAMPLES: int = 10000
+    
+    # Tablas de riesgo de MCC, país y BIN (CSV en DATA_PATH/RISK_TABLES_DIR; sin archivo, las del código)
+    RISK_TABLES_DIR: str = "risk"
+    RISK_TABLES_RELOAD_INTERVAL_SECONDS: float = 30.0  # 0 = sin recarga en caliente
     
     # Umbrales de detección
     HIGH_RISK_THRESHOLD: float = 0.7
     MEDIUM_RISK_THRESHOLD: float = 0.3
     
+    # Predicción por lotes
+    MAX_BATCH_SIZE: int = 5000
+    
+    # Scoring en streaming (/predict/stream)
+    STREAM_CHUNK_SIZE: int = 256
+    STREAM_MAX_LINE_BYTES: int = 65536
+    
+    # Micro-batching de /predict (agrupa solicitudes concurrentes)
+    MICRO_BATCHING_ENABLED: bool = False
+    MICRO_BATCH_MAX_SIZE: int = 64
+    MICRO_BATCH_MAX_WAIT_MS: float = 2.0
+    MICRO_BATCH_QUEUE_SIZE: int = 10000
+    
+    # Cache de predicciones de /predict (LRU + TTL, ~450 bytes por entrada)
+    PREDICTION_CACHE_ENABLED: bool = False
+    PREDICTION_CACHE_MAX_ENTRIES: int = 100000
+    PREDICTION_CACHE_TTL_SECONDS: float = 300.0
+    PREDICTION_CACHE_AMOUNT_BUCKET: float = 0.0  # 0 = monto exacto
+    
+    # Velocity features (ventanas deslizantes por tarjeta, BIN, dispositivo e IP)
+    VELOCITY_ENABLED: bool = False  # También agrega las velocity features al entrenamiento simulado
+    VELOCITY_MAX_KEYS: int = 200000  # Por tipo de llave (~340 bytes por llave)
+    VELOCITY_SNAPSHOT_FILE: str = "velocity_snapshot.npz"  # En DATA_PATH; vacío = sin snapshots
+    VELOCITY_SNAPSHOT_INTERVAL_SECONDS: float = 60.0  # 0 = solo al apagar
+    
+    # Monitoreo de drift de /predict frente al perfil de entrenamiento (PSI/KS, GET /model/drift)
+    DRIFT_MONITOR_ENABLED: bool = True
+    DRIFT_BINS: int = 10  # Intervalos por feature del perfil (se fija al entrenar)
+    DRIFT_WINDOW_SIZE: int = 10000  # Observaciones por ventana; se compara la anterior + la actual
+    DRIFT_MIN_OBSERVATIONS: int = 500  # Antes de esto el reporte no da PSI/KS ni exporta métricas
+    
+    # Shadow scoring: un modelo challenger evalúa el tráfico de /predict en un proceso aparte
+    SHADOW_MODEL_VERSION: str = ""  # Versión del registro; vacío = deshabilitado (también POST /model/shadow/{version})
+    SHADOW_BATCH_SIZE: int = 256  # Filas por bloque enviado al challenger
+    SHADOW_QUEUE_SIZE: int = 8192  # Filas en espera; con la cola llena los bloques se descartan
+    SHADOW_FLUSH_INTERVAL_MS: float = 200.0  # Envío de bloques incompletos
+    SHADOW_LOG_FILE: str = ""  # Log binario de pares champion/challenger (24 bytes por fila); vacío = sin log
+    SHADOW_LOG_MAX_MB: float = 100.0  # Al superarlo se rota a <archivo>.1
+    
+    # Scoring en cascada: un árbol poco profundo resuelve las transacciones claramente legítimas
+    CASCADE_ENABLED: bool = False  # La primera etapa se entrena siempre; esto solo activa su uso
+    CASCADE_MAX_DEPTH: int = 6  # Profundidad del árbol de la primera etapa (se fija al entrenar)
+    CASCADE_MAX_RECALL_LOSS: float = 0.01  # Alertas del ensemble que puede perder la salida temprana
+    
+    # Control de admisión de /predict y /predict/batch (límite en vuelo y deadline del caller)
+    ADMISSION_CONTROL_ENABLED: bool = False
+    ADMISSION_MAX_IN_FLIGHT: int = 64  # Requests en vuelo por worker antes de degradar (0 = sin límite)
+    ADMISSION_DEADLINE_HEADER: str = "X-Request-Timeout-Ms"  # ms que el caller espera la respuesta
+    ADMISSION_DEFAULT_TIMEOUT_MS: float = 0.0  # Deadline sin header (0 = sin deadline)
+    ADMISSION_MIN_REMAINING_MS: float = 5.0  # Plazo mínimo restante para evaluar el modelo
+    ADMISSION_OVERLOAD_MODE: str = "fallback"  # fallback (score de reglas en /predict) o reject (503)
+    
+    # Profiling dentro del worker (/debug/profile)
+    PROFILING_SAMPLE_EVERY: int = 0  # cProfile continuo en 1 de cada K requests a /predict* (0 = apagado)
+    PROFILING_MAX_REQUESTS: int = 10000  # Tope de requests de una sesión cprofile
+    PROFILING_MAX_SECONDS: float = 600.0  # Tope de duración de una sesión de muestreo
+    
     # Configuración de features
     FEATURE_COLUMNS: List[str] = [
         "amount",
@@ -34,13 +106,24 @@ class Settings(BaseSettings):
         "bin"
     ]
     
+    # Token para endpoints administrativos (vacío = sin protección, solo desarrollo; /debug/profile queda deshabilitado)
+    ADMIN_TOKEN: Optional[str] = None
+    
     # Configuración de logging
-    LOG_FORMAT: str = "json"
+    LOG_FORMAT: str = "json"  # json o console
     LOG_FILE: str = "logs/ml_service.log"
+    LOG_TO_STDOUT: bool = True
+    LOG_ASYNC: bool = True  # Escritura en un hilo aparte a través de una cola acotada
+    LOG_QUEUE_SIZE: int = 10000  # Si se llena, los registros se descartan
+    LOG_SAMPLE_RATE: float = 1.0  # Fracción de requests registrados por defecto
+    LOG_SAMPLE_RATES: Dict[str, float] = {"/health": 0.0, "/health/live": 0.0, "/health/ready": 0.0, "/metrics": 0.0}  # Por ruta
     
     # Configuración de métricas
     METRICS_ENABLED: bool = True
+    STAGE_TIMING_ENABLED: bool = True  # Histograma por etapa y header Server-Timing en /predict*
     PROMETHEUS_PORT: int = 8000
+    PROMETHEUS_MULTIPROC_DIR: str = "/tmp/smaf_ml_metrics"  # Solo con WORKERS > 1
+    MODEL_SYNC_INTERVAL_SECONDS: float = 5.0  # Con WORKERS > 1 o sin modelo al arrancar, revisión del puntero CURRENT
     
     # Variables de entorno
     class Config:
@@ -0,0 +1,5 @@
+# Features module
+
+
+
+
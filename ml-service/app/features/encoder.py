@@ -0,0 +1,273 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .risk_tables import get_risk_tables
+from .velocity import VELOCITY_FEATURES
+
+DOMESTIC_COUNTRY = 'CO'
+
+HIGH_AMOUNT = 1000000  # 1M COP
+ROUND_AMOUNT = 10000  # Múltiplo de 10K
+
+# Orden canónico de las features derivadas de una transacción (mismo orden del entrenamiento)
+TRANSACTION_FEATURES = (
+    'amount',
+    'hour',
+    'dayOfWeek',
+    'mcc_high_risk',
+    'mcc_medium_risk',
+    'mcc_numeric',
+    'country_high_risk',
+    'country_medium_risk',
+    'country_domestic',
+    'bin_high_risk',
+    'bin_numeric',
+    'is_night',
+    'is_business_hours',
+    'is_weekend',
+    'is_friday',
+    'amount_log',
+    'is_high_amount',
+    'is_round_amount',
+)
+
+# Features de un modelo entrenado con velocity features: las de la transacción y luego las del store
+ALL_FEATURES = TRANSACTION_FEATURES + VELOCITY_FEATURES
+_ZERO_VELOCITY = (0.0,) * len(VELOCITY_FEATURES)
+
+
+def _field(transaction: Any, name: str) -> Any:
+    """Lee un campo de un PredictionRequest o de un diccionario crudo"""
+    if isinstance(transaction, dict):
+        return transaction[name]
+    return getattr(transaction, name)
+
+
+class FeatureEncoder:
+    """
+    Codifica transacciones directamente en el orden de columnas del modelo
+    Se construye una vez a partir de `feature_names`; las features desconocidas quedan en 0.0
+    """
+
+    def __init__(self, feature_names: Sequence[str]):
+        self.feature_names: List[str] = list(feature_names)
+        self.n_features = len(self.feature_names)
+
+        # Mapeo de columnas canónicas -> columnas del modelo
+        canonical_index = {name: i for i, name in enumerate(ALL_FEATURES)}
+        pairs = [
+            (model_idx, canonical_index[name])
+            for model_idx, name in enumerate(self.feature_names)
+            if name in canonical_index
+        ]
+        self._target = np.array([model_idx for model_idx, _ in pairs], dtype=np.intp)
+        self._source = np.array([canonical_idx for _, canonical_idx in pairs], dtype=np.intp)
+
+        # Si el modelo no usa velocity features, el vector del store se ignora
+        self.uses_velocity = any(name in VELOCITY_FEATURES for name in self.feature_names)
+
+        # Caso común: el modelo usa exactamente el orden canónico
+        self._identity = tuple(self.feature_names) == (ALL_FEATURES if self.uses_velocity else TRANSACTION_FEATURES)
+        self._has_unmapped = len(pairs) != self.n_features
+
+        # Columnas que dependen del monto (para agrupar montos cercanos, p. ej. en el cache)
+        self.amount_index = self.feature_names.index('amount') if 'amount' in self.feature_names else None
+        self.amount_log_index = self.feature_names.index('amount_log') if 'amount_log' in self.feature_names else None
+
+    def encode_row(
+        self,
+        transaction: Any,
+        out: Optional[np.ndarray] = None,
+        velocity: Optional[Sequence[float]] = None
+    ) -> np.ndarray:
+        """
+        Codifica una transacción en un vector float64 (opcionalmente en el buffer `out`)
+        `velocity` son las features del VelocityStore en el orden de VELOCITY_FEATURES (0.0 si falta)
+        """
+        if isinstance(transaction, dict):
+            fields = transaction
+        else:
+            fields = transaction.__dict__
+
+        amount = float(fields['amount'])
+        hour = int(fields['hour'])
+        day_of_week = int(fields['dayOfWeek'])
+        country = fields['countryCode']
+        bin_numeric = int(fields['bin'])
+
+        # Las tablas se leen una vez: una recarga en caliente no mezcla versiones dentro de la fila
+        tables = get_risk_tables()
+        mcc_numeric = int(fields['merchantCategoryCode'])
+        mcc_tier = tables.mcc_tiers_bytes[mcc_numeric]
+        country_tier = tables.country_tiers.get(country, 0)
+
+        values = (
+            amount,
+            hour,
+            day_of_week,
+            mcc_tier == 2,
+            mcc_tier == 1,
+            mcc_numeric,
+            country_tier == 2,
+            country_tier == 1,
+            country == DOMESTIC_COUNTRY,
+            tables.bin_tiers_bytes[bin_numeric] == 2,
+            bin_numeric,
+            hour >= 22 or hour <= 6,
+            8 <= hour <= 18,
+            day_of_week == 0 or day_of_week == 6,
+            day_of_week == 5,
+            math.log(amount + 1),
+            amount >= HIGH_AMOUNT,
+            amount % ROUND_AMOUNT == 0,
+        )
+        if self.uses_velocity:
+            values += tuple(velocity) if velocity is not None else _ZERO_VELOCITY
+
+        if out is None:
+            out = np.zeros(self.n_features, dtype=np.float64)
+        elif self._has_unmapped:
+            out.fill(0.0)
+
+        if self._identity:
+            out[:] = values
+        else:
+            out[self._target] = np.array(values, dtype=np.float64)[self._source]
+        return out
+
+    def encode_batch(
+        self,
+        transactions: Sequence[Any],
+        out: Optional[np.ndarray] = None,
+        velocity: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Codifica un lote de transacciones columna por columna en una matriz (n, n_features)
+        `velocity` es una matriz (n, len(VELOCITY_FEATURES)) del VelocityStore
+        """
+        n = len(transactions)
+        return self.encode_columns(
+            amount=np.fromiter((_field(t, 'amount') for t in transactions), dtype=np.float64, count=n),
+            merchant_category_code=[_field(t, 'merchantCategoryCode') for t in transactions],
+            country_code=[_field(t, 'countryCode') for t in transactions],
+            bin_code=[_field(t, 'bin') for t in transactions],
+            hour=np.fromiter((_field(t, 'hour') for t in transactions), dtype=np.int64, count=n),
+            day_of_week=np.fromiter((_field(t, 'dayOfWeek') for t in transactions), dtype=np.int64, count=n),
+            out=out,
+            velocity=velocity
+        )
+
+    def encode_columns(
+        self,
+        amount: Any,
+        merchant_category_code: Any,
+        country_code: Any,
+        bin_code: Any,
+        hour: Any,
+        day_of_week: Any,
+        out: Optional[np.ndarray] = None,
+        velocity: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        Versión vectorizada a partir de columnas crudas (arrays, listas o Series de pandas)
+        MCC y BIN pueden venir como texto o como enteros
+        """
+        columns = derive_feature_columns(amount, merchant_category_code, country_code, bin_code, hour, day_of_week)
+        n = len(columns['amount'])
+
+        if self.uses_velocity:
+            velocity = np.zeros((n, len(VELOCITY_FEATURES))) if velocity is None else velocity
+            columns.update(zip(VELOCITY_FEATURES, velocity.T))
+
+        if out is None:
+            out = np.zeros((n, self.n_features), dtype=np.float64)
+        elif self._has_unmapped:
+            out.fill(0.0)
+
+        for model_idx, canonical_idx in zip(self._target, self._source):
+            out[:, model_idx] = columns[ALL_FEATURES[canonical_idx]]
+        return out
+
+    def to_dict(self, row: np.ndarray) -> Dict[str, float]:
+        """Vista nombre -> valor de un vector codificado (para logging)"""
+        return dict(zip(self.feature_names, row.tolist()))
+
+
+def _categorical(values: Any):
+    """Accesor `.cat` si `values` es una Series categórica de pandas (sin importar pandas)"""
+    return getattr(values, 'cat', None)
+
+
+def _to_int_array(values: Any) -> np.ndarray:
+    """Convierte códigos (texto, enteros o categóricos) a int64"""
+    cat = _categorical(values)
+    if cat is not None:
+        # Se convierten solo las categorías y se expanden con los códigos
+        return np.asarray(cat.categories).astype(np.int64)[np.asarray(cat.codes)]
+    return np.asarray(values).astype(np.int64)
+
+
+def _unique_inverse(values: Any):
+    """Valores únicos como texto y el índice de cada fila en ellos"""
+    cat = _categorical(values)
+    if cat is not None:
+        return np.asarray(cat.categories).astype(str), np.asarray(cat.codes)
+    return np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+
+
+def _dense_lookup(table: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Nivel de riesgo por código en un índice denso; los códigos fuera del rango quedan en 0"""
+    if len(codes) and (codes.min() < 0 or codes.max() >= len(table)):
+        valid = (codes >= 0) & (codes < len(table))
+        tiers = np.zeros(len(codes), dtype=table.dtype)
+        tiers[valid] = table[codes[valid]]
+        return tiers
+    return table[codes]
+
+
+def derive_feature_columns(
+    amount: Any,
+    merchant_category_code: Any,
+    country_code: Any,
+    bin_code: Any,
+    hour: Any,
+    day_of_week: Any
+) -> Dict[str, np.ndarray]:
+    """Deriva todas las features de TRANSACTION_FEATURES de forma vectorizada"""
+    amount = np.asarray(amount, dtype=np.float64)
+    hour = np.asarray(hour, dtype=np.int64)
+    day_of_week = np.asarray(day_of_week, dtype=np.int64)
+    mcc_numeric = _to_int_array(merchant_category_code)
+    bin_numeric = _to_int_array(bin_code)
+
+    tables = get_risk_tables()
+    mcc_tier = _dense_lookup(tables.mcc_tiers, mcc_numeric)
+    bin_tier = _dense_lookup(tables.bin_tiers, bin_numeric)
+
+    # Pocos países distintos por lote: se resuelve el nivel sobre los valores únicos
+    countries, inverse = _unique_inverse(country_code)
+    country_tier = np.array([tables.country_tiers.get(c, 0) for c in countries], dtype=np.int8)[inverse]
+    country_domestic = (countries == DOMESTIC_COUNTRY)[inverse]
+
+    return {
+        'amount': amount,
+        'hour': hour,
+        'dayOfWeek': day_of_week,
+        'mcc_high_risk': mcc_tier == 2,
+        'mcc_medium_risk': mcc_tier == 1,
+        'mcc_numeric': mcc_numeric,
+        'country_high_risk': country_tier == 2,
+        'country_medium_risk': country_tier == 1,
+        'country_domestic': country_domestic,
+        'bin_high_risk': bin_tier == 2,
+        'bin_numeric': bin_numeric,
+        'is_night': (hour >= 22) | (hour <= 6),
+        'is_business_hours': (hour >= 8) & (hour <= 18),
+        'is_weekend': (day_of_week == 0) | (day_of_week == 6),
+        'is_friday': day_of_week == 5,
+        'amount_log': np.log(amount + 1),
+        'is_high_amount': amount >= HIGH_AMOUNT,
+        'is_round_amount': amount % ROUND_AMOUNT == 0,
+    }
@@ -0,0 +1,235 @@
+"""
+Tablas de riesgo de MCC, país y BIN cargadas desde archivos
+
+Archivos en DATA_PATH/RISK_TABLES_DIR (CSV con encabezado; `tier` es 0/1/2 o low/medium/high):
+- mcc_risk.csv: mcc,tier
+- country_risk.csv: country,tier
+- bin_risk.csv: bin_start,bin_end,tier (rangos inclusivos de BIN de 6 dígitos) o bin,tier
+
+Un archivo ausente usa la tabla por defecto del código. MCC y BIN se indexan en arrays densos
+(un int8 por código), así que el costo de consulta no depende del tamaño de las tablas. Las tablas
+son inmutables: una recarga construye una instancia nueva y reemplaza la referencia global.
+pandas se importa solo al leer archivos: con las tablas por defecto el arranque no lo carga.
+"""
+import os
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..config import settings
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Tablas por defecto (sin archivos)
+HIGH_RISK_MCCS = frozenset({'7995', '7801', '6010', '6011'})  # Casinos, ATM, etc.
+MEDIUM_RISK_MCCS = frozenset({'5411', '5541', '5542'})  # Gasolineras, etc.
+HIGH_RISK_COUNTRIES = frozenset({'VE', 'CU', 'IR', 'KP', 'SY'})
+MEDIUM_RISK_COUNTRIES = frozenset({'BR', 'AR', 'PE', 'EC'})
+HIGH_RISK_BINS = frozenset({'123456', '654321'})
+
+MCC_SPACE = 10_000
+BIN_SPACE = 1_000_000
+TIER_NAMES = {'low': 0, 'medium': 1, 'high': 2}
+MAX_TIER = 2
+
+MCC_FILE = 'mcc_risk.csv'
+COUNTRY_FILE = 'country_risk.csv'
+BIN_FILE = 'bin_risk.csv'
+
+
+def _parse_tiers(values: "pd.Series", path: str) -> np.ndarray:
+    """Convierte la columna tier (categórica: números o nombres) a int8 validando el rango"""
+    tiers = []
+    for category in values.cat.categories:
+        name = str(category).strip().lower()
+        tier = TIER_NAMES.get(name, int(name) if name.isdigit() else -1)
+        if not 0 <= tier <= MAX_TIER:
+            raise ValueError(f"{path}: tier '{category}' inválido, debe ser 0-{MAX_TIER} o {'/'.join(TIER_NAMES)}")
+        tiers.append(tier)
+    # Se convierten solo las categorías y se expanden con los códigos
+    return np.array(tiers, dtype=np.int8)[values.cat.codes.to_numpy()]
+
+
+def _read_csv(path: str, required: Tuple[str, ...], numeric: Tuple[str, ...] = ()) -> "pd.DataFrame":
+    """Lee la tabla con el parser de C: códigos como números y tier como categórico"""
+    import pandas as pd
+
+    header = pd.read_csv(path, nrows=0, skipinitialspace=True).columns
+    missing = [column for column in required if column not in header]
+    if missing:
+        raise ValueError(f"{path}: faltan las columnas {missing}")
+
+    dtypes = {column: 'float64' for column in numeric}
+    dtypes.update({column: 'str' for column in required if column not in numeric and column != 'tier'})
+    dtypes['tier'] = 'category'
+    try:
+        frame = pd.read_csv(path, usecols=list(required), dtype=dtypes, skipinitialspace=True)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from e
+    return frame.dropna(subset=list(required))
+
+
+def _codes(values: "pd.Series", space: int, path: str) -> np.ndarray:
+    codes = values.to_numpy()
+    if not ((codes >= 0) & (codes < space) & (codes == np.floor(codes))).all():
+        raise ValueError(f"{path}: códigos fuera del rango 0-{space - 1}")
+    return codes.astype(np.int64)
+
+
+def _dense_from_ranges(starts: np.ndarray, ends: np.ndarray, tiers: np.ndarray, size: int) -> np.ndarray:
+    """Expande rangos inclusivos a un array denso; si se solapan gana el tier más alto"""
+    table = np.zeros(size, dtype=np.int8)
+    for tier in range(1, MAX_TIER + 1):
+        selected = tiers == tier
+        if not selected.any():
+            continue
+        # Marca +1 al inicio y -1 después del fin: la suma acumulada es > 0 dentro de algún rango
+        delta = np.zeros(size + 1, dtype=np.int32)
+        np.add.at(delta, starts[selected], 1)
+        np.add.at(delta, ends[selected] + 1, -1)
+        table[np.cumsum(delta[:-1]) > 0] = tier
+    return table
+
+
+def _load_mcc(path: str) -> np.ndarray:
+    frame = _read_csv(path, ('mcc', 'tier'), numeric=('mcc',))
+    table = np.zeros(MCC_SPACE, dtype=np.int8)
+    np.maximum.at(table, _codes(frame['mcc'], MCC_SPACE, path), _parse_tiers(frame['tier'], path))
+    return table
+
+
+def _load_country(path: str) -> Dict[str, int]:
+    frame = _read_csv(path, ('country', 'tier'))
+    tiers = _parse_tiers(frame['tier'], path)
+    countries = frame['country'].str.strip().str.upper()
+    return {country: int(tier) for country, tier in zip(countries, tiers) if tier > 0}
+
+
+def _load_bin(path: str) -> Tuple[np.ndarray, int]:
+    import pandas as pd
+
+    if 'bin' in pd.read_csv(path, nrows=0, skipinitialspace=True).columns:
+        frame = _read_csv(path, ('bin', 'tier'), numeric=('bin',))
+        starts = ends = _codes(frame['bin'], BIN_SPACE, path)
+    else:
+        frame = _read_csv(path, ('bin_start', 'bin_end', 'tier'), numeric=('bin_start', 'bin_end'))
+        starts = _codes(frame['bin_start'], BIN_SPACE, path)
+        ends = _codes(frame['bin_end'], BIN_SPACE, path)
+        if (ends < starts).any():
+            raise ValueError(f"{path}: bin_end menor que bin_start")
+
+    tiers = _parse_tiers(frame['tier'], path)
+    return _dense_from_ranges(starts, ends, tiers, BIN_SPACE), len(frame)
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+class RiskTables:
+    """Índices de riesgo por MCC, país y BIN (0 = bajo, 1 = medio, 2 = alto)"""
+
+    def __init__(
+        self,
+        mcc_tiers: np.ndarray,
+        country_tiers: Dict[str, int],
+        bin_tiers: np.ndarray,
+        directory: Optional[str] = None,
+        mtimes: Optional[Dict[str, Optional[float]]] = None,
+        bin_ranges: int = 0
+    ):
+        self.mcc_tiers = mcc_tiers
+        self.country_tiers = country_tiers
+        self.bin_tiers = bin_tiers
+        # Copias en bytes para el camino de una fila: indexar bytes retorna un int de Python sin crear escalares de NumPy
+        self.mcc_tiers_bytes = mcc_tiers.tobytes()
+        self.bin_tiers_bytes = bin_tiers.tobytes()
+        self.directory = directory
+        self.mtimes = mtimes or {}
+        self.bin_ranges = bin_ranges
+
+    @classmethod
+    def defaults(cls) -> "RiskTables":
+        """Tablas por defecto del código"""
+        mcc_tiers = np.zeros(MCC_SPACE, dtype=np.int8)
+        mcc_tiers[[int(mcc) for mcc in MEDIUM_RISK_MCCS]] = 1
+        mcc_tiers[[int(mcc) for mcc in HIGH_RISK_MCCS]] = 2
+
+        country_tiers = {
+            **{country: 1 for country in MEDIUM_RISK_COUNTRIES},
+            **{country: 2 for country in HIGH_RISK_COUNTRIES},
+        }
+
+        bin_tiers = np.zeros(BIN_SPACE, dtype=np.int8)
+        bin_tiers[[int(bin_code) for bin_code in HIGH_RISK_BINS]] = 2
+        return cls(mcc_tiers, country_tiers, bin_tiers, bin_ranges=len(HIGH_RISK_BINS))
+
+    @classmethod
+    def load(cls, directory: str) -> "RiskTables":
+        """Carga las tablas de `directory`; cada archivo ausente usa la tabla por defecto"""
+        defaults = cls.defaults()
+        paths = {name: os.path.join(directory, name) for name in (MCC_FILE, COUNTRY_FILE, BIN_FILE)}
+        mtimes = {name: _mtime(path) for name, path in paths.items()}
+
+        mcc_tiers = _load_mcc(paths[MCC_FILE]) if mtimes[MCC_FILE] is not None else defaults.mcc_tiers
+        country_tiers = _load_country(paths[COUNTRY_FILE]) if mtimes[COUNTRY_FILE] is not None else defaults.country_tiers
+        if mtimes[BIN_FILE] is not None:
+            bin_tiers, bin_ranges = _load_bin(paths[BIN_FILE])
+        else:
+            bin_tiers, bin_ranges = defaults.bin_tiers, defaults.bin_ranges
+
+        return cls(mcc_tiers, country_tiers, bin_tiers, directory, mtimes, bin_ranges)
+
+    def is_stale(self) -> bool:
+        """Si algún archivo del directorio cambió (o apareció/desapareció) desde la carga"""
+        if self.directory is None:
+            return False
+        return any(
+            _mtime(os.path.join(self.directory, name)) != mtime
+            for name, mtime in self.mtimes.items()
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'source': {name: 'file' if mtime is not None else 'default' for name, mtime in self.mtimes.items()},
+            'mcc_high': int((self.mcc_tiers == 2).sum()),
+            'mcc_medium': int((self.mcc_tiers == 1).sum()),
+            'countries': len(self.country_tiers),
+            'bin_ranges': self.bin_ranges,
+        }
+
+
+def risk_tables_directory() -> str:
+    return os.path.join(settings.DATA_PATH, settings.RISK_TABLES_DIR)
+
+
+_current: Optional[RiskTables] = None
+
+
+def get_risk_tables() -> RiskTables:
+    """Tablas vigentes; se cargan del directorio configurado en el primer uso"""
+    global _current
+    if _current is None:
+        _current = RiskTables.load(risk_tables_directory())
+    return _current
+
+
+def set_risk_tables(tables: RiskTables):
+    global _current
+    _current = tables
+
+
+def reload_if_changed() -> bool:
+    """
+    Recarga las tablas si algún archivo cambió; retorna True si se reemplazaron
+    Si la carga falla se conservan las tablas vigentes y se propaga el error
+    """
+    current = get_risk_tables()
+    if not current.is_stale():
+        return False
+    set_risk_tables(RiskTables.load(current.directory))
+    return True
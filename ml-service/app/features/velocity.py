@@ -0,0 +1,350 @@
+"""
+Velocity features: conteo y suma de montos por ventana deslizante para tarjeta, BIN, dispositivo e IP
+
+Cada tipo de llave tiene capacidad fija con arrays de NumPy preasignados. Por llave y ventana se
+guarda un ring buffer de buckets más los totales de la ventana, así que registrar y leer una
+transacción es O(1). El estado se puede guardar en un snapshot .npz para sobrevivir reinicios.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import time
+from typing import IO, Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..metrics import VELOCITY_EVICTIONS
+
+# (nombre, segundos por bucket, número de buckets); la ventana cubre bucket * buckets segundos
+VELOCITY_WINDOWS = (
+    ('1m', 10, 6),
+    ('1h', 600, 6),
+    ('24h', 10800, 8),
+)
+
+# Tipo de llave -> campo de PredictionRequest
+VELOCITY_KEY_FIELDS = {
+    'card': 'cardHash',
+    'bin': 'bin',
+    'device': 'deviceFingerprint',
+    'ip': 'ipAddress',
+}
+
+# Orden canónico de las velocity features (mismo orden del entrenamiento)
+VELOCITY_FEATURES = tuple(
+    f'{key_type}_{stat}_{window}'
+    for key_type in VELOCITY_KEY_FIELDS
+    for window, _, _ in VELOCITY_WINDOWS
+    for stat in ('count', 'amount')
+)
+
+# Features por tipo de llave: (conteo, monto) por ventana
+_STRIDE = 2 * len(VELOCITY_WINDOWS)
+# Una llave sin actividad en la ventana más larga ya no aporta nada
+IDLE_SECONDS = max(bucket_seconds * n_buckets for _, bucket_seconds, n_buckets in VELOCITY_WINDOWS)
+# Fracción de la capacidad que se libera de una vez cuando un tipo de llave se llena
+EVICTION_FRACTION = 0.05
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def key_id(value: Any) -> int:
+    """Llave entera de 64 bits estable entre procesos (hash() de str cambia en cada arranque)"""
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'little', signed=True)
+
+
+class SlidingWindowCounters:
+    """
+    Conteos y montos por llave en las ventanas de VELOCITY_WINDOWS, con capacidad fija
+    Las lecturas y escrituras por request van por memoryviews (mucho más rápidas que indexar NumPy);
+    NumPy se usa para la evicción y los snapshots, que son vectorizados
+    """
+
+    def __init__(self, capacity: int, name: str = ""):
+        self.capacity = capacity
+        self.name = name
+        self.evictions = 0
+        self._reset()
+
+    def _reset(self):
+        self._slots: Dict[int, int] = {}
+        self._next_slot = 0
+        self._free: List[int] = []
+
+        self.keys = np.zeros(self.capacity, dtype=np.int64)
+        # Último registro de la llave en segundos; 0 = slot libre
+        self.last_seen = np.zeros(self.capacity, dtype=np.int64)
+        self.ticks = [np.zeros(self.capacity, dtype=np.int64) for _ in VELOCITY_WINDOWS]
+        self.counts = [np.zeros((self.capacity, n_buckets), dtype=np.int32) for _, _, n_buckets in VELOCITY_WINDOWS]
+        self.amounts = [np.zeros((self.capacity, n_buckets), dtype=np.float32) for _, _, n_buckets in VELOCITY_WINDOWS]
+        self.total_counts = [np.zeros(self.capacity, dtype=np.int32) for _ in VELOCITY_WINDOWS]
+        self.total_amounts = [np.zeros(self.capacity, dtype=np.float64) for _ in VELOCITY_WINDOWS]
+        self._bind_views()
+
+    def _bind_views(self):
+        self._last_seen = memoryview(self.last_seen)
+        self._windows = [
+            (
+                bucket_seconds,
+                n_buckets,
+                memoryview(self.ticks[w]),
+                memoryview(self.counts[w].reshape(-1)),
+                memoryview(self.amounts[w].reshape(-1)),
+                memoryview(self.total_counts[w]),
+                memoryview(self.total_amounts[w]),
+            )
+            for w, (_, bucket_seconds, n_buckets) in enumerate(VELOCITY_WINDOWS)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def observe(self, key: int, amount: float, now: int, record: bool, out: List[float], offset: int):
+        """
+        Escribe en out[offset:] (conteo, monto) por ventana incluyendo la transacción actual
+        Con `record` la transacción queda registrada; sin él solo se lee el estado
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            if not record:
+                # Llave desconocida: la ventana solo contiene la transacción actual
+                for w in range(len(self._windows)):
+                    out[offset + 2 * w] = 1.0
+                    out[offset + 2 * w + 1] = amount
+                return
+            slot = self._allocate(key, now)
+
+        if record:
+            self._last_seen[slot] = now
+
+        for w, (bucket_seconds, n_buckets, ticks, counts, amounts, total_counts, total_amounts) in enumerate(self._windows):
+            tick = now // bucket_seconds
+            last = ticks[slot]
+            base = slot * n_buckets
+            count_total = total_counts[slot]
+            amount_total = total_amounts[slot]
+
+            if tick > last:
+                if tick - last >= n_buckets:
+                    count_total = 0
+                    amount_total = 0.0
+                    if record:
+                        for i in range(base, base + n_buckets):
+                            counts[i] = 0
+                            amounts[i] = 0.0
+                else:
+                    # Restar los buckets que salen de la ventana
+                    for t in range(last + 1, tick + 1):
+                        i = base + t % n_buckets
+                        count_total -= counts[i]
+                        amount_total -= amounts[i]
+                        if record:
+                            counts[i] = 0
+                            amounts[i] = 0.0
+                    if count_total <= 0:
+                        # Ventana vacía: se descarta el error de redondeo acumulado
+                        count_total = 0
+                        amount_total = 0.0
+                if record:
+                    ticks[slot] = tick
+            else:
+                # Reloj igual o hacia atrás: se usa el bucket más reciente
+                tick = last
+
+            count_total += 1
+            amount_total += amount
+            if record:
+                i = base + tick % n_buckets
+                counts[i] += 1
+                amounts[i] += amount
+                total_counts[slot] = count_total
+                total_amounts[slot] = amount_total
+
+            out[offset + 2 * w] = float(count_total)
+            out[offset + 2 * w + 1] = amount_total
+
+    def _allocate(self, key: int, now: int) -> int:
+        if self._free:
+            slot = self._free.pop()
+        elif self._next_slot < self.capacity:
+            slot = self._next_slot
+            self._next_slot += 1
+        else:
+            self.evict(now)
+            slot = self._free.pop()
+
+        self._slots[key] = slot
+        self.keys[slot] = key
+        # Los buckets de un slot libre están en cero: basta con fijar el tick actual
+        for bucket_seconds, _, ticks, _, _, _, _ in self._windows:
+            ticks[slot] = now // bucket_seconds
+        return slot
+
+    def evict(self, now: int) -> int:
+        """
+        Libera las llaves inactivas por más de la ventana más larga; si no alcanzan para liberar
+        EVICTION_FRACTION de la capacidad, también las de actividad más antigua
+        """
+        target = max(1, int(self.capacity * EVICTION_FRACTION))
+        evicted = np.flatnonzero((self.last_seen > 0) & (self.last_seen < now - IDLE_SECONDS))
+        if len(evicted) < target:
+            used = np.flatnonzero(self.last_seen > 0)
+            oldest = np.argpartition(self.last_seen[used], min(target, len(used)) - 1)[:target]
+            evicted = used[oldest]
+
+        for key in self.keys[evicted].tolist():
+            del self._slots[key]
+
+        self.last_seen[evicted] = 0
+        for w in range(len(VELOCITY_WINDOWS)):
+            self.counts[w][evicted] = 0
+            self.amounts[w][evicted] = 0.0
+            self.total_counts[w][evicted] = 0
+            self.total_amounts[w][evicted] = 0.0
+
+        self._free.extend(evicted.tolist())
+        self.evictions += len(evicted)
+        VELOCITY_EVICTIONS.labels(key_type=self.name).inc(len(evicted))
+        return len(evicted)
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Copia de las llaves en uso (consistente si se llama desde el hilo que registra)"""
+        used = np.flatnonzero(self.last_seen > 0)
+        state = {'keys': self.keys[used], 'last_seen': self.last_seen[used]}
+        for w, (name, _, _) in enumerate(VELOCITY_WINDOWS):
+            state[f'ticks_{name}'] = self.ticks[w][used]
+            state[f'counts_{name}'] = self.counts[w][used]
+            state[f'amounts_{name}'] = self.amounts[w][used]
+            state[f'total_counts_{name}'] = self.total_counts[w][used]
+            state[f'total_amounts_{name}'] = self.total_amounts[w][used]
+        return state
+
+    def restore(self, state: Dict[str, np.ndarray]) -> int:
+        """Carga un estado de `state()`; si excede la capacidad se conservan las llaves más recientes"""
+        order = np.argsort(state['last_seen'])[::-1][:self.capacity]
+        n = len(order)
+
+        self._reset()
+        self.keys[:n] = state['keys'][order]
+        self.last_seen[:n] = state['last_seen'][order]
+        for w, (name, _, _) in enumerate(VELOCITY_WINDOWS):
+            self.ticks[w][:n] = state[f'ticks_{name}'][order]
+            self.counts[w][:n] = state[f'counts_{name}'][order]
+            self.amounts[w][:n] = state[f'amounts_{name}'][order]
+            self.total_counts[w][:n] = state[f'total_counts_{name}'][order]
+            self.total_amounts[w][:n] = state[f'total_amounts_{name}'][order]
+
+        self._slots = dict(zip(self.keys[:n].tolist(), range(n)))
+        self._next_slot = n
+        return n
+
+
+class VelocityStore:
+    """
+    Velocity features de las transacciones recientes, en memoria del proceso
+    No es thread-safe: se usa desde el event loop (registro, lectura y copia para snapshots)
+    """
+
+    def __init__(self, max_keys: int, clock: Callable[[], float] = time.time):
+        self.counters = {key_type: SlidingWindowCounters(max_keys, key_type) for key_type in VELOCITY_KEY_FIELDS}
+        self._fields = [(self.counters[key_type], field) for key_type, field in VELOCITY_KEY_FIELDS.items()]
+        self._clock = clock
+
+    def update(self, transaction: Any) -> List[float]:
+        """Registra la transacción y retorna sus features (orden de VELOCITY_FEATURES)"""
+        return self._features(transaction, int(self._clock()), record=True)
+
+    def lookup(self, transaction: Any) -> List[float]:
+        """Features de la transacción como si se registrara, sin modificar el estado"""
+        return self._features(transaction, int(self._clock()), record=False)
+
+    def lookup_batch(self, transactions: Sequence[Any]) -> np.ndarray:
+        """Matriz (n, len(VELOCITY_FEATURES)) de `lookup`; las filas del lote no se ven entre sí"""
+        now = int(self._clock())
+        rows = [self._features(transaction, now, record=False) for transaction in transactions]
+        return np.array(rows, dtype=np.float64).reshape(len(rows), len(VELOCITY_FEATURES))
+
+    def _features(self, transaction: Any, now: int, record: bool) -> List[float]:
+        fields = transaction if isinstance(transaction, dict) else transaction.__dict__
+        amount = float(fields['amount'])
+        out = [0.0] * len(VELOCITY_FEATURES)
+
+        # Los campos ausentes dejan en 0 las features de ese tipo de llave
+        for i, (counters, field) in enumerate(self._fields):
+            value = fields.get(field)
+            if value:
+                counters.observe(key_id(value), amount, now, record, out, i * _STRIDE)
+        return out
+
+    def key_counts(self) -> Dict[str, int]:
+        return {key_type: len(counters) for key_type, counters in self.counters.items()}
+
+    def evictions(self) -> Dict[str, int]:
+        return {key_type: counters.evictions for key_type, counters in self.counters.items()}
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Copia del estado para guardarlo con write_snapshot (p. ej. en otro hilo)"""
+        state = {
+            'format_version': np.array(SNAPSHOT_FORMAT_VERSION),
+            'windows': np.array(json.dumps(VELOCITY_WINDOWS)),
+        }
+        for key_type, counters in self.counters.items():
+            for name, array in counters.state().items():
+                state[f'{key_type}/{name}'] = array
+        return state
+
+    @staticmethod
+    def write_snapshot(state: Dict[str, np.ndarray], path: str):
+        """Escribe el snapshot de forma atómica (archivo temporal + rename)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Temporal por proceso: dos procesos nunca escriben ni renombran el mismo archivo a medias
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, path)
+
+    def load_snapshot(self, path: str) -> int:
+        """Restaura un snapshot; retorna el número de llaves cargadas (0 si no existe)"""
+        if not os.path.exists(path):
+            return 0
+
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"Versión de snapshot no soportada: {int(data['format_version'])}")
+            if json.loads(str(data['windows'])) != [list(window) for window in VELOCITY_WINDOWS]:
+                raise ValueError("El snapshot usa otras ventanas de velocity")
+
+            restored = 0
+            for key_type, counters in self.counters.items():
+                prefix = f'{key_type}/'
+                state = {name[len(prefix):]: data[name] for name in data.files if name.startswith(prefix)}
+                if state:
+                    restored += counters.restore(state)
+        return restored
+
+
+def claim_snapshot_slot(path: str, slots: int) -> Optional[Tuple[str, IO]]:
+    """
+    Snapshot propio del proceso: toma con flock el primer slot libre de `slots` y retorna su ruta y
+    el archivo de lock (se mantiene abierto mientras el proceso use el slot; el sistema lo libera
+    si el proceso termina). None si todos los slots están tomados
+    El slot 0 usa `path` sin sufijo, así con un solo worker el snapshot no cambia de nombre
+    """
+    root, extension = os.path.splitext(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    for slot in range(slots):
+        slot_path = path if slot == 0 else f"{root}.{slot}{extension}"
+        lock_file = open(f"{slot_path}.lock", "w")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        return slot_path, lock_file
+    return None
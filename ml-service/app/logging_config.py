@@ -0,0 +1,135 @@
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from typing import Optional
+
+import structlog
+
+from .config import settings
+from .metrics import LOG_RECORDS_DROPPED
+
+# Decisión de muestreo del request actual (la fija el middleware de logging)
+_request_sampled: ContextVar[bool] = ContextVar("request_sampled", default=True)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola el registro sin formatearlo y lo descarta si la cola está llena
+    El renderizado (JSON) ocurre en el hilo del QueueListener, fuera del event loop
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Bloqueante: con la cola llena el sentinel no se puede descartar
+        self.queue.put(self._sentinel)
+
+
+def _renderer():
+    if settings.LOG_FORMAT == "json":
+        return structlog.processors.JSONRenderer()
+    return structlog.dev.ConsoleRenderer(colors=False)
+
+
+def _sink_handlers():
+    """Handlers de salida: LOG_FILE y, opcionalmente, stdout"""
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processor=_renderer(),
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+        ],
+    )
+
+    handlers = [logging.FileHandler(settings.LOG_FILE, encoding="utf-8")]
+    if settings.LOG_TO_STDOUT:
+        handlers.append(logging.StreamHandler(sys.stdout))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging():
+    """
+    Configura structlog sobre logging estándar
+    Con LOG_ASYNC los registros pasan por una cola acotada a un hilo escritor; si no, se escriben en línea
+    """
+    global _listener
+
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            # El event dict se entrega sin renderizar; lo renderiza el formatter del handler
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        wrapper_class=structlog.stdlib.BoundLogger,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        cache_logger_on_first_use=True,
+    )
+
+    stop_logging()
+
+    root = logging.getLogger()
+    for handler in root.handlers:
+        handler.close()
+    root.handlers.clear()
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    if settings.LOG_ASYNC:
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        root.addHandler(DroppingQueueHandler(log_queue))
+        _listener = _QueueListener(log_queue, *_sink_handlers(), respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in _sink_handlers():
+            root.addHandler(handler)
+
+
+def stop_logging():
+    """Vacía la cola y detiene el hilo escritor"""
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def sample_request(path: str) -> bool:
+    """
+    Decide si se registra el request según LOG_SAMPLE_RATES[path] (o LOG_SAMPLE_RATE)
+    La decisión queda disponible para el handler con `request_sampled()`
+    """
+    rate = settings.LOG_SAMPLE_RATES.get(path, settings.LOG_SAMPLE_RATE)
+    sampled = rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+    _request_sampled.set(sampled)
+    return sampled
+
+
+def request_sampled() -> bool:
+    """True si el request actual fue muestreado para logging"""
+    return _request_sampled.get()
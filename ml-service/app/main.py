@@ -1,65 +1,398 @@
-import logging
+import asyncio
+import os
 import time
 from contextlib import asynccontextmanager
-from typing import Dict, Any
+from typing import Optional
 
 import structlog
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess, CONTENT_TYPE_LATEST
 from fastapi import Response
 
+from .features.risk_tables import RiskTables, get_risk_tables, reload_if_changed, risk_tables_directory, set_risk_tables
+from .features.velocity import VelocityStore, claim_snapshot_slot
+from .metrics import (
+    ADMISSION_IN_FLIGHT,
+    DRIFT_KS,
+    DRIFT_OBSERVATIONS,
+    DRIFT_PSI,
+    PREDICTION_COUNTER,
+    PREDICTION_DURATION,
+    RISK_TABLES_RELOADS,
+    VELOCITY_KEYS,
+)
+from .models.drift import RISK_SCORE_COLUMN, DriftMonitor
 from .models.fraud_detector import FraudDetector
-from .schemas.prediction import PredictionRequest, PredictionResponse
-from .config import settings
-
-# Configurar logging estructurado
-structlog.configure(
-    processors=[
-        structlog.stdlib.add_logger_name,
-        structlog.stdlib.add_log_level,
-        structlog.stdlib.PositionalArgumentsFormatter(),
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.processors.StackInfoRenderer(),
-        structlog.processors.format_exc_info,
-        structlog.processors.UnicodeDecoder(),
-        structlog.processors.JSONRenderer()
-    ],
-    wrapper_class=structlog.stdlib.BoundLogger,
-    logger_factory=structlog.stdlib.LoggerFactory(),
-    cache_logger_on_first_use=True,
+from .models.registry import ModelRegistry, ModelNotFoundError
+from .services.admission import (
+    ADMISSION_ROUTES,
+    ADMIT,
+    EXPIRED,
+    FALLBACK,
+    FALLBACK_WEIGHTS,
+    AdmissionController,
+    fallback_prediction,
+)
+from .services.micro_batcher import MicroBatcher
+from .services.prediction_cache import PredictionCache
+from .services.shadow import ShadowScorer
+from .services.stream_scoring import NDJSONStreamingResponse, score_ndjson_stream
+from .services.training_jobs import TrainingJobManager
+from .schemas.prediction import (
+    PredictionRequest,
+    PredictionResponse,
+    BatchPredictionRequest,
+    BatchPredictionResponse,
+    BatchPredictionItem,
+    BatchTooLargeError,
 )
+from .config import settings
+from .logging_config import configure_logging, request_sampled, sample_request, stop_logging
+from .profiling import CPROFILE, PROFILE_FORMATS, PROFILED_ROUTES, RequestProfiler
+from .timing import current_timer, start_request_timer
 
 logger = structlog.get_logger()
 
-# Métricas de Prometheus
-PREDICTION_COUNTER = Counter('ml_predictions_total', 'Total number of predictions made', ['result'])
-PREDICTION_DURATION = Histogram('ml_prediction_duration_seconds', 'Time spent on predictions')
-MODEL_LOAD_COUNTER = Counter('ml_model_loads_total', 'Total number of model loads')
+# Registro de modelos; el detector activo se lee con get_active_detector()
+model_registry: ModelRegistry = None
+
+# Control de admisión opcional de /predict y /predict/batch
+admission_controller: AdmissionController = None
+
+# Profiling bajo demanda y continuo de /predict y /predict/batch
+request_profiler: RequestProfiler = None
+
+# Micro-batcher opcional para /predict
+micro_batcher: MicroBatcher = None
+
+# Cache opcional de predicciones de /predict
+prediction_cache: PredictionCache = None
+
+# Reentrenamientos en segundo plano
+training_jobs: TrainingJobManager = None
+
+# Con varios workers, tarea que sigue el puntero CURRENT del registro
+model_sync_task: asyncio.Task = None
+
+# Recarga en caliente de las tablas de riesgo
+risk_tables_task: asyncio.Task = None
+
+# Velocity features opcionales, el snapshot propio del worker (ruta y lock del slot) y su tarea
+velocity_store: VelocityStore = None
+velocity_snapshot_path: Optional[str] = None
+velocity_snapshot_lock = None
+velocity_snapshot_task: asyncio.Task = None
+
+# Shadow scoring opcional de un modelo challenger
+shadow_scorer: ShadowScorer = None
+
+# Monitor de drift de la versión activa (se reemplaza cuando cambia la versión)
+drift_monitor: DriftMonitor = None
+
+def get_active_detector() -> Optional[FraudDetector]:
+    """Detector activo; cada request lo lee una sola vez para no mezclar versiones"""
+    return model_registry.active if model_registry is not None else None
+
+def _score_micro_batch(fraud_detector: FraudDetector, features_list):
+    """Evalúa un micro-lote con el detector que codificó sus filas, aunque ya no sea el activo"""
+    return fraud_detector.predict_batch(features_list)
+
+def get_drift_monitor(fraud_detector: FraudDetector) -> Optional[DriftMonitor]:
+    """Monitor de drift del detector activo; None si está deshabilitado o el modelo no tiene perfil de referencia"""
+    global drift_monitor
+    if not settings.DRIFT_MONITOR_ENABLED or fraud_detector.drift_reference is None:
+        return None
+    
+    monitor = drift_monitor
+    if monitor is None or monitor.model_version != fraud_detector.model_version:
+        # Las ventanas de otra versión no se comparan con este perfil
+        monitor = DriftMonitor(
+            fraud_detector.drift_reference,
+            fraud_detector.model_version,
+            window_size=settings.DRIFT_WINDOW_SIZE,
+            min_observations=settings.DRIFT_MIN_OBSERVATIONS
+        )
+        drift_monitor = monitor
+        DRIFT_PSI.clear()
+        DRIFT_KS.clear()
+    return monitor
+
+def _export_drift_metrics():
+    """Actualiza los gauges de drift con el reporte del monitor vigente"""
+    fraud_detector = get_active_detector()
+    monitor = get_drift_monitor(fraud_detector) if fraud_detector is not None else None
+    if monitor is None:
+        return None
+    
+    report = monitor.report()
+    DRIFT_OBSERVATIONS.set(report['observations'])
+    if report['ready']:
+        for name, values in [*report['features'].items(), (RISK_SCORE_COLUMN, report['risk_score'])]:
+            DRIFT_PSI.labels(feature=name).set(values['psi'])
+            DRIFT_KS.labels(feature=name).set(values['ks'])
+    return report
+
+def _shed_exception(decision: str) -> HTTPException:
+    """Respuesta de un request descartado por el control de admisión"""
+    if decision == EXPIRED:
+        return HTTPException(status_code=504, detail="El deadline del caller venció antes del scoring")
+    return HTTPException(status_code=503, detail="Servicio saturado", headers={"Retry-After": "1"})
+
+def _fallback_response(request: PredictionRequest, timer) -> PredictionResponse:
+    """Score de reglas sin evaluar el modelo; la transacción se registra igual en el velocity store"""
+    if velocity_store is not None:
+        velocity_store.update(request)
+    result = fallback_prediction(request)
+    timer.mark("fallback")
+    return PredictionResponse(**result, features_used=list(FALLBACK_WEIGHTS), fallback=True)
+
+async def start_shadow(version: str) -> ShadowScorer:
+    """
+    Inicia (o reemplaza) el challenger en shadow con una versión registrada
+    Lanza ModelNotFoundError si no existe y ValueError si no puede recibir las filas del champion
+    """
+    global shadow_scorer
+    fraud_detector = get_active_detector()
+    if fraud_detector is not None and version == fraud_detector.model_version:
+        raise ValueError(f"La versión {version} es el modelo activo")
+    
+    log_path = settings.SHADOW_LOG_FILE or None
+    if log_path is not None and os.path.dirname(log_path):
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    
+    # La carga valida la versión y puede leer un artefacto del disco: fuera del event loop
+    scorer = await run_in_threadpool(
+        ShadowScorer,
+        model_registry,
+        version,
+        batch_size=settings.SHADOW_BATCH_SIZE,
+        queue_size=settings.SHADOW_QUEUE_SIZE,
+        flush_interval_ms=settings.SHADOW_FLUSH_INTERVAL_MS,
+        log_path=log_path,
+        log_max_bytes=int(settings.SHADOW_LOG_MAX_MB * 1024 * 1024)
+    )
+    if fraud_detector is not None and not scorer.compatible_with(fraud_detector.feature_names):
+        raise ValueError(f"La versión {version} usa features distintas a las del modelo activo")
+    
+    await stop_shadow()
+    await scorer.start()
+    shadow_scorer = scorer
+    return scorer
+
+async def stop_shadow():
+    """Detiene el challenger en shadow, si hay uno"""
+    global shadow_scorer
+    scorer, shadow_scorer = shadow_scorer, None
+    if scorer is not None:
+        await scorer.stop()
+
+async def _sync_model_version(interval_seconds: float):
+    """Activa en este worker las versiones publicadas por otro worker (reentrenamiento o rollback)"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await run_in_threadpool(model_registry.sync_with_pointer)
+        except Exception as e:
+            logger.error("Error sincronizando versión del modelo", error=str(e))
+
+async def _reload_risk_tables(interval_seconds: float):
+    """Recarga las tablas de riesgo cuando cambian sus archivos; si fallan, se conservan las vigentes"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            if await run_in_threadpool(reload_if_changed):
+                RISK_TABLES_RELOADS.labels(result="success").inc()
+                logger.info("Tablas de riesgo recargadas", **get_risk_tables().summary())
+        except Exception as e:
+            RISK_TABLES_RELOADS.labels(result="error").inc()
+            logger.error("Error recargando tablas de riesgo", error=str(e))
+
+def _claim_velocity_snapshot():
+    """
+    Toma el slot de snapshot de este worker: cada worker tiene su propio store, así que cada uno
+    guarda y restaura su archivo en lugar de sobrescribir el de los demás
+    """
+    global velocity_snapshot_path, velocity_snapshot_lock
+    if not settings.VELOCITY_SNAPSHOT_FILE:
+        return
+    claimed = claim_snapshot_slot(
+        os.path.join(settings.DATA_PATH, settings.VELOCITY_SNAPSHOT_FILE), max(settings.WORKERS, 1)
+    )
+    if claimed is None:
+        logger.warning("Sin slot libre para el snapshot de velocity: este worker no guarda snapshots")
+        return
+    velocity_snapshot_path, velocity_snapshot_lock = claimed
 
-# Variable global para el detector de fraude
-fraud_detector: FraudDetector = None
+def _release_velocity_snapshot():
+    global velocity_snapshot_path, velocity_snapshot_lock
+    if velocity_snapshot_lock is not None:
+        velocity_snapshot_lock.close()
+    velocity_snapshot_path = velocity_snapshot_lock = None
+
+async def _save_velocity_snapshot():
+    """Copia el estado en el event loop (único escritor) y lo escribe a disco en un hilo"""
+    state = velocity_store.snapshot()
+    await run_in_threadpool(VelocityStore.write_snapshot, state, velocity_snapshot_path)
+    for key_type, count in velocity_store.key_counts().items():
+        VELOCITY_KEYS.labels(key_type=key_type).set(count)
+
+async def _snapshot_velocity(interval_seconds: float):
+    """Guarda periódicamente el velocity store para que sobreviva reinicios"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await _save_velocity_snapshot()
+        except Exception as e:
+            logger.error("Error guardando snapshot de velocity", error=str(e))
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Protege los endpoints administrativos cuando ADMIN_TOKEN está configurado"""
+    if settings.ADMIN_TOKEN and x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Como require_admin, pero sin ADMIN_TOKEN el endpoint no existe: expone código y pilas del worker"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Requiere ADMIN_TOKEN configurado")
+    await require_admin(x_admin_token)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gestiona el ciclo de vida de la aplicación"""
-    global fraud_detector
+    global model_registry, admission_controller, request_profiler, micro_batcher, prediction_cache, training_jobs, model_sync_task
+    global velocity_store, velocity_snapshot_task, risk_tables_task
     
     # Startup
+    configure_logging()
     logger.info("Iniciando servicio de ML...")
     try:
-        fraud_detector = FraudDetector()
-        MODEL_LOAD_COUNTER.inc()
-        logger.info("Modelo de detección de fraude cargado exitosamente")
+        # Antes del modelo: las usa la codificación de features de cada request
+        set_risk_tables(RiskTables.load(risk_tables_directory()))
+        logger.info("Tablas de riesgo cargadas", **get_risk_tables().summary())
+    except Exception as e:
+        logger.error("Error cargando tablas de riesgo", error=str(e))
+        raise
+    if settings.RISK_TABLES_RELOAD_INTERVAL_SECONDS > 0:
+        risk_tables_task = asyncio.create_task(_reload_risk_tables(settings.RISK_TABLES_RELOAD_INTERVAL_SECONDS))
+    
+    try:
+        model_registry = ModelRegistry()
+        # Solo carga un modelo ya publicado; sin modelo el servicio arranca igual pero no está listo
+        if model_registry.bootstrap() is not None:
+            logger.info(
+                "Modelo de detección de fraude cargado exitosamente",
+                model_version=model_registry.active.model_version
+            )
+        else:
+            logger.warning("Sin modelo publicado: /health/ready responde 503 hasta que se publique uno")
     except Exception as e:
         logger.error("Error cargando modelo", error=str(e))
         raise
     
+    if settings.ADMISSION_CONTROL_ENABLED:
+        admission_controller = AdmissionController(
+            max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+            deadline_header=settings.ADMISSION_DEADLINE_HEADER,
+            default_timeout_ms=settings.ADMISSION_DEFAULT_TIMEOUT_MS,
+            min_remaining_ms=settings.ADMISSION_MIN_REMAINING_MS,
+            overload_mode=settings.ADMISSION_OVERLOAD_MODE
+        )
+        logger.info("Control de admisión habilitado", **admission_controller.stats())
+    
+    request_profiler = RequestProfiler(settings.PROFILING_SAMPLE_EVERY)
+    if settings.PROFILING_SAMPLE_EVERY > 0:
+        logger.info("Profiling continuo habilitado", sample_every=settings.PROFILING_SAMPLE_EVERY)
+    
+    if settings.MICRO_BATCHING_ENABLED:
+        micro_batcher = MicroBatcher(
+            _score_micro_batch,
+            max_batch_size=settings.MICRO_BATCH_MAX_SIZE,
+            max_wait_ms=settings.MICRO_BATCH_MAX_WAIT_MS,
+            max_queue_size=settings.MICRO_BATCH_QUEUE_SIZE
+        )
+        await micro_batcher.start()
+        logger.info("Micro-batching habilitado", max_batch_size=settings.MICRO_BATCH_MAX_SIZE)
+    
+    if settings.PREDICTION_CACHE_ENABLED:
+        prediction_cache = PredictionCache(
+            max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.PREDICTION_CACHE_TTL_SECONDS,
+            amount_bucket=settings.PREDICTION_CACHE_AMOUNT_BUCKET
+        )
+        logger.info("Cache de predicciones habilitado", max_entries=settings.PREDICTION_CACHE_MAX_ENTRIES)
+    
+    if settings.VELOCITY_ENABLED:
+        velocity_store = VelocityStore(settings.VELOCITY_MAX_KEYS)
+        _claim_velocity_snapshot()
+        if velocity_snapshot_path is not None:
+            try:
+                restored = velocity_store.load_snapshot(velocity_snapshot_path)
+                logger.info("Velocity store habilitado", keys_restored=restored, snapshot=velocity_snapshot_path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("No se pudo restaurar el snapshot de velocity", error=str(e))
+            if settings.VELOCITY_SNAPSHOT_INTERVAL_SECONDS > 0:
+                velocity_snapshot_task = asyncio.create_task(
+                    _snapshot_velocity(settings.VELOCITY_SNAPSHOT_INTERVAL_SECONDS)
+                )
+    
+    training_jobs = TrainingJobManager(model_registry)
+    if settings.RETRAIN_INTERVAL_HOURS > 0:
+        training_jobs.start_scheduler(settings.RETRAIN_INTERVAL_HOURS)
+    if model_registry.active is None and settings.BOOTSTRAP_TRAINING:
+        # En un proceso aparte: el arranque no espera al entrenamiento
+        training_jobs.submit_bootstrap()
+    
+    if settings.SHADOW_MODEL_VERSION:
+        try:
+            await start_shadow(settings.SHADOW_MODEL_VERSION)
+        except Exception as e:
+            # El servicio arranca igual: el shadow no es necesario para atender
+            logger.error("Error iniciando shadow scoring", challenger_version=settings.SHADOW_MODEL_VERSION, error=str(e))
+    
+    # Sin modelo también se revisa el puntero: lo publica el job inicial de este u otro worker
+    if settings.WORKERS > 1 or model_registry.active is None:
+        model_sync_task = asyncio.create_task(_sync_model_version(settings.MODEL_SYNC_INTERVAL_SECONDS))
+    
     yield
     
     # Shutdown
     logger.info("Deteniendo servicio de ML...")
+    if model_sync_task is not None:
+        model_sync_task.cancel()
+        model_sync_task = None
+    if risk_tables_task is not None:
+        risk_tables_task.cancel()
+        risk_tables_task = None
+    await training_jobs.shutdown()
+    await stop_shadow()
+    admission_controller = None
+    request_profiler.stop()
+    request_profiler = None
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+        micro_batcher = None
+    if prediction_cache is not None:
+        prediction_cache.clear()
+        prediction_cache = None
+    if velocity_store is not None:
+        if velocity_snapshot_task is not None:
+            velocity_snapshot_task.cancel()
+            velocity_snapshot_task = None
+        if velocity_snapshot_path is not None:
+            try:
+                await _save_velocity_snapshot()
+            except Exception as e:
+                logger.error("Error guardando snapshot de velocity", error=str(e))
+            _release_velocity_snapshot()
+        velocity_store = None
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
+    stop_logging()
 
 app = FastAPI(
     title="SMAF ML Service",
@@ -77,50 +410,105 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    """Middleware para logging de requests"""
-    start_time = time.time()
-    
-    # Log de request
-    logger.info(
-        "Request iniciado",
-        method=request.method,
-        url=str(request.url),
-        client_ip=request.client.host
-    )
-    
-    try:
-        response = await call_next(request)
-        process_time = time.time() - start_time
+@app.exception_handler(BatchTooLargeError)
+async def batch_too_large_handler(request: Request, exc: BatchTooLargeError):
+    """Lote por encima de MAX_BATCH_SIZE, detectado al validar el body antes de cada transacción"""
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+class RequestLoggingMiddleware:
+    """
+    Middleware ASGI para logging de requests
+    Se registra un solo evento por request, muestreado por ruta; los errores se registran siempre
+    Es ASGI puro y no BaseHTTPMiddleware: la respuesta pasa directo al servidor, sin la cola intermedia
+    que bloquea a /predict/stream cuando lee el body mientras envía resultados
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+
+        # scope["path"] evita construir el objeto URL completo
+        path = scope["path"]
+
+        # Profiling bajo demanda o continuo: cubre el resto del middleware, incluido el log
+        profiler = request_profiler if path in PROFILED_ROUTES else None
+        profile = profiler.begin() if profiler is not None else None
+        try:
+            await self._handle(scope, receive, send, path, start_time)
+        finally:
+            if profile is not None:
+                profiler.end(profile)
+
+    async def _handle(self, scope: Scope, receive: Receive, send: Send, path: str, start_time: float):
+        sampled = sample_request(path)
+        timer = start_request_timer(path)
+        status_code = 500
         
+        # Requests en vuelo y deadline del caller, contados desde la llegada
+        admission = admission_controller if path in ADMISSION_ROUTES else None
+        ticket = None
+        if admission is not None:
+            ticket = admission.enter(scope, start_time)
+            # /predict evalúa el modelo sin ceder el event loop: se cede una vez para que los requests
+            # ya recibidos entren y se cuenten antes de que empiece el scoring
+            await asyncio.sleep(0)
+
+        async def send_with_headers(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                if timer is not None:
+                    # Desde la última marca del handler: validación de la respuesta y serialización JSON
+                    timer.mark("serialize")
+                    timer.observe(path)
+                    headers["Server-Timing"] = timer.server_timing()
+                headers["X-Process-Time"] = str(time.perf_counter() - start_time)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        except Exception as e:
+            process_time = time.perf_counter() - start_time
+            logger.error(
+                "Request falló",
+                method=scope["method"],
+                path=path,
+                error=str(e),
+                process_time=process_time
+            )
+            raise
+        finally:
+            if ticket is not None:
+                admission.leave(ticket)
+
+        # Incluye el envío completo del body (relevante en respuestas en streaming)
+        process_time = time.perf_counter() - start_time
+
         # Log de response
-        logger.info(
-            "Request completado",
-            method=request.method,
-            url=str(request.url),
-            status_code=response.status_code,
-            process_time=process_time
-        )
-        
-        response.headers["X-Process-Time"] = str(process_time)
-        return response
-        
-    except Exception as e:
-        process_time = time.time() - start_time
-        logger.error(
-            "Request falló",
-            method=request.method,
-            url=str(request.url),
-            error=str(e),
-            process_time=process_time
-        )
-        raise
+        if sampled or status_code >= 500:
+            client = scope.get("client")
+            logger.info(
+                "Request completado",
+                method=scope["method"],
+                path=path,
+                status_code=status_code,
+                client_ip=client[0] if client else None,
+                process_time=process_time
+            )
+
+app.add_middleware(RequestLoggingMiddleware)
 
 @app.get("/health")
 async def health_check():
     """Endpoint de salud del servicio"""
-    global fraud_detector
+    fraud_detector = get_active_detector()
     
     if fraud_detector is None:
         raise HTTPException(status_code=503, detail="Modelo no está disponible")
@@ -130,12 +518,53 @@ async def health_check():
         "service": "SMAF ML Service",
         "version": "1.0.0",
         "model_loaded": fraud_detector is not None,
+        "model_version": fraud_detector.model_version,
+        "model_load_ms": fraud_detector.load_time_ms,
+        "artifact_format": fraud_detector.artifact_format,
+        "risk_tables": get_risk_tables().summary(),
+        "timestamp": time.time()
+    }
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: el proceso responde; no depende del modelo"""
+    return {"status": "alive", "timestamp": time.time()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness: 200 solo con un modelo activo
+    Sin modelo responde 503 con el estado del entrenamiento inicial, sin entrenar en el request
+    """
+    fraud_detector = get_active_detector()
+    
+    if fraud_detector is None:
+        bootstrap_job = training_jobs.bootstrap_job if training_jobs is not None else None
+        raise HTTPException(status_code=503, detail={
+            "status": "not_ready",
+            "reason": "Modelo no está disponible",
+            "bootstrap_job": bootstrap_job.to_dict() if bootstrap_job is not None else None
+        })
+    
+    return {
+        "status": "ready",
+        "model_version": fraud_detector.model_version,
+        "artifact_format": fraud_detector.artifact_format,
         "timestamp": time.time()
     }
 
 @app.get("/metrics")
 async def metrics():
     """Endpoint de métricas para Prometheus"""
+    _export_drift_metrics()
+    if admission_controller is not None:
+        ADMISSION_IN_FLIGHT.labels(admitted="true").set(admission_controller.admitted)
+        ADMISSION_IN_FLIGHT.labels(admitted="false").set(admission_controller.in_flight - admission_controller.admitted)
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Modo multi-worker: se agregan los valores escritos por todos los procesos
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.post("/predict", response_model=PredictionResponse)
@@ -143,68 +572,234 @@ async def predict_fraud(request: PredictionRequest):
     """
     Predice la probabilidad de fraude para una transacción
     """
-    global fraud_detector
+    # Lectura del body, parseo y validación de Pydantic (desde el inicio del middleware)
+    timer = current_timer()
+    timer.mark("validation")
+    
+    fraud_detector = get_active_detector()
     
     if fraud_detector is None:
         PREDICTION_COUNTER.labels(result="error").inc()
         raise HTTPException(status_code=503, detail="Modelo no está disponible")
     
+    # Control de admisión: con el deadline vencido o el servicio saturado no se evalúa el modelo
+    if admission_controller is not None:
+        decision = admission_controller.decide("/predict", fallback=True)
+        if decision == FALLBACK:
+            return _fallback_response(request, timer)
+        if decision != ADMIT:
+            raise _shed_exception(decision)
+    
     try:
         with PREDICTION_DURATION.time():
-            # Convertir request a features
-            features = request.to_features()
+            # Registrar la transacción en el velocity store (aunque el modelo activo no use sus features)
+            velocity = None
+            if velocity_store is not None:
+                velocity = velocity_store.update(request)
+                timer.mark("velocity")
+            
+            # Codificar request directo en el vector del modelo
+            encoder = fraud_detector.feature_encoder
+            features = encoder.encode_row(request, velocity=velocity)
+            timer.mark("encode")
+            
+            # Buscar en el cache (la llave incluye la versión del modelo)
+            cache_key = None
+            prediction_result = None
+            if prediction_cache is not None:
+                lookup_start = time.perf_counter()
+                cache_key = prediction_cache.key(features, encoder, fraud_detector.model_version)
+                prediction_result = prediction_cache.get(cache_key)
+                if prediction_result is not None:
+                    prediction_result["model_version"] = fraud_detector.model_version
+                    prediction_result["processing_time_ms"] = (time.perf_counter() - lookup_start) * 1000
+                timer.mark("cache")
             
             # Realizar predicción
-            prediction_result = fraud_detector.predict(features)
+            if prediction_result is None:
+                scoring_start = time.perf_counter()
+                if micro_batcher is not None:
+                    try:
+                        prediction_result = await micro_batcher.submit(fraud_detector, features)
+                    except asyncio.QueueFull:
+                        PREDICTION_COUNTER.labels(result="error").inc()
+                        raise HTTPException(status_code=503, detail="Cola de predicción llena")
+                    timer.mark("micro_batch")
+                else:
+                    prediction_result = fraud_detector.predict(features, timer)
+                if admission_controller is not None:
+                    admission_controller.observe_scoring(time.perf_counter() - scoring_start)
+                
+                if cache_key is not None:
+                    prediction_cache.put(cache_key, prediction_result)
             
-            # Log de predicción
-            logger.info(
-                "Predicción realizada",
-                transaction_features=features,
-                risk_score=prediction_result["risk_score"],
-                fraud_probability=prediction_result["fraud_probability"],
-                model_version=prediction_result["model_version"]
-            )
+            # Histogramas de drift: un incremento por columna, tamaño fijo
+            monitor = get_drift_monitor(fraud_detector)
+            if monitor is not None:
+                monitor.observe(features, prediction_result["risk_score"])
+                timer.mark("drift")
+            
+            # Shadow: solo se copia la fila a un buffer; el challenger la evalúa en otro proceso
+            scorer = shadow_scorer
+            if scorer is not None and scorer.accepts(fraud_detector):
+                scorer.submit(features, prediction_result)
+                timer.mark("shadow")
+            
+            # Log de predicción (solo si el request fue muestreado, para no construir el registro)
+            if request_sampled():
+                logger.info(
+                    "Predicción realizada",
+                    transaction_features=encoder.to_dict(features),
+                    risk_score=prediction_result["risk_score"],
+                    fraud_probability=prediction_result["fraud_probability"],
+                    risk_level=prediction_result["risk_level"],
+                    decision_reason=prediction_result["decision_reason"],
+                    model_version=prediction_result["model_version"]
+                )
+                timer.mark("log")
             
             PREDICTION_COUNTER.labels(result="success").inc()
             
-            return PredictionResponse(
+            response = PredictionResponse(
                 risk_score=prediction_result["risk_score"],
                 fraud_probability=prediction_result["fraud_probability"],
                 confidence=prediction_result["confidence"],
                 model_version=prediction_result["model_version"],
-                features_used=list(features.keys()),
-                processing_time_ms=prediction_result["processing_time_ms"]
+                features_used=encoder.feature_names,
+                processing_time_ms=prediction_result["processing_time_ms"],
+                risk_level=prediction_result["risk_level"],
+                decision_reason=prediction_result["decision_reason"]
             )
+            timer.mark("response")
             
+            return response
+            
+    except HTTPException:
+        raise
     except Exception as e:
         PREDICTION_COUNTER.labels(result="error").inc()
         logger.error("Error en predicción", error=str(e), request_data=request.dict())
         raise HTTPException(status_code=500, detail=f"Error en predicción: {str(e)}")
 
-@app.post("/retrain")
-async def retrain_model():
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_fraud_batch(request: BatchPredictionRequest):
     """
-    Endpoint para reentrenar el modelo (solo para desarrollo/testing)
+    Predice la probabilidad de fraude para un lote de transacciones
+    Evalúa cada modelo una sola vez sobre la matriz completa del lote
     """
-    global fraud_detector
+    timer = current_timer()
+    timer.mark("validation")
+    
+    fraud_detector = get_active_detector()
+    
+    batch_size = len(request.transactions)
+    
+    if fraud_detector is None:
+        PREDICTION_COUNTER.labels(result="error").inc(batch_size)
+        raise HTTPException(status_code=503, detail="Modelo no está disponible")
+    
+    if admission_controller is not None:
+        decision = admission_controller.decide("/predict/batch")
+        if decision != ADMIT:
+            raise _shed_exception(decision)
     
     try:
-        logger.info("Iniciando reentrenamiento de modelo")
+        start_time = time.perf_counter()
+        
+        with PREDICTION_DURATION.time():
+            # Codificar el lote columna por columna
+            encoder = fraud_detector.feature_encoder
+            velocity = None
+            if velocity_store is not None and encoder.uses_velocity:
+                # Re-scoring: se consulta el store sin registrar las transacciones
+                velocity = velocity_store.lookup_batch(request.transactions)
+            features_matrix = encoder.encode_batch(request.transactions, velocity=velocity)
+            timer.mark("encode")
+            
+            # Realizar predicción vectorizada fuera del event loop
+            prediction_results = await run_in_threadpool(fraud_detector.predict_batch, features_matrix, timer)
+        
+        processing_time = (time.perf_counter() - start_time) * 1000  # ms
+        
+        if request_sampled():
+            logger.info(
+                "Predicción por lote realizada",
+                batch_size=batch_size,
+                processing_time_ms=processing_time,
+                model_version=fraud_detector.get_model_version()
+            )
+            timer.mark("log")
+        
+        PREDICTION_COUNTER.labels(result="success").inc(batch_size)
+        
+        response = BatchPredictionResponse(
+            predictions=[
+                BatchPredictionItem(
+                    risk_score=result["risk_score"],
+                    fraud_probability=result["fraud_probability"],
+                    confidence=result["confidence"],
+                    anomaly_score=result["anomaly_score"],
+                    is_outlier=result["is_outlier"],
+                    risk_level=result["risk_level"],
+                    decision_reason=result["decision_reason"]
+                )
+                for result in prediction_results
+            ],
+            model_version=prediction_results[0]["model_version"],
+            features_used=encoder.feature_names,
+            batch_size=batch_size,
+            processing_time_ms=processing_time
+        )
+        timer.mark("response")
         
-        if fraud_detector is None:
-            fraud_detector = FraudDetector()
+        return response
         
-        # Simular reentrenamiento
-        fraud_detector.retrain()
-        MODEL_LOAD_COUNTER.inc()
+    except Exception as e:
+        PREDICTION_COUNTER.labels(result="error").inc(batch_size)
+        logger.error("Error en predicción por lote", error=str(e), batch_size=batch_size)
+        raise HTTPException(status_code=500, detail=f"Error en predicción por lote: {str(e)}")
+
+@app.post("/predict/stream")
+async def predict_fraud_stream(request: Request):
+    """
+    Scoring masivo en streaming: recibe transacciones NDJSON (una por línea) y responde NDJSON
+    Las filas se validan y evalúan por bloques a medida que llegan; todo el stream usa la misma
+    versión del modelo y las líneas inválidas se reportan sin cortar el stream
+    """
+    fraud_detector = get_active_detector()
+    
+    if fraud_detector is None:
+        raise HTTPException(status_code=503, detail="Modelo no está disponible")
+    
+    return NDJSONStreamingResponse(
+        score_ndjson_stream(
+            request.stream(),
+            fraud_detector,
+            velocity_store=velocity_store,
+            chunk_size=settings.STREAM_CHUNK_SIZE,
+            max_line_bytes=settings.STREAM_MAX_LINE_BYTES
+        )
+    )
+
+@app.post("/retrain", status_code=202, dependencies=[Depends(require_admin)])
+async def retrain_model(activate: bool = True):
+    """
+    Endpoint para reentrenar el modelo (solo para desarrollo/testing)
+    El entrenamiento corre en un proceso aparte; el artefacto resultante se registra y se
+    publica con un cambio atómico mientras el modelo activo sigue atendiendo
+    Con `activate=false` la versión solo se registra, para evaluarla en shadow antes de activarla
+    """
+    try:
+        job = training_jobs.submit(trigger="api", activate=activate)
         
-        logger.info("Modelo reentrenado exitosamente")
+        logger.info("Reentrenamiento solicitado", job_id=job.job_id, model_version=job.model_version)
         
         return {
-            "status": "success",
-            "message": "Modelo reentrenado exitosamente",
-            "model_version": fraud_detector.get_model_version(),
+            "status": job.status,
+            "message": "Reentrenamiento en curso",
+            "job_id": job.job_id,
+            "model_version": job.model_version,
+            "status_url": f"/retrain/{job.job_id}",
             "timestamp": time.time()
         }
         
@@ -212,12 +807,176 @@ async def retrain_model():
         logger.error("Error en reentrenamiento", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error reentrenando modelo: {str(e)}")
 
+@app.get("/retrain/{job_id}")
+async def get_retrain_job(job_id: str):
+    """
+    Estado de un job de reentrenamiento
+    """
+    job = training_jobs.get(job_id)
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job de reentrenamiento no encontrado")
+    
+    return job.to_dict()
+
+@app.get("/model/versions")
+async def list_model_versions():
+    """
+    Versiones registradas del modelo
+    """
+    return {"versions": model_registry.list_versions()}
+
+@app.post("/model/versions/{version}/activate", dependencies=[Depends(require_admin)])
+async def activate_model_version(version: str):
+    """
+    Activa una versión registrada (rollback o roll-forward) sin reiniciar el servicio
+    """
+    try:
+        fraud_detector = await run_in_threadpool(model_registry.activate, version)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error("Error activando versión del modelo", model_version=version, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error activando versión: {str(e)}")
+    
+    return {
+        "status": "success",
+        "model_version": fraud_detector.model_version,
+        "timestamp": time.time()
+    }
+
+@app.get("/model/shadow")
+async def get_model_shadow():
+    """
+    Estado del challenger en shadow: filas evaluadas y descartadas, acuerdo y diferencias de score con el champion
+    """
+    scorer = shadow_scorer
+    if scorer is None:
+        return {"enabled": False}
+    return {"enabled": True, **scorer.stats()}
+
+@app.post("/model/shadow/{version}", dependencies=[Depends(require_admin)])
+async def start_model_shadow(version: str):
+    """
+    Evalúa una versión registrada en shadow con el tráfico de /predict (reemplaza al challenger actual)
+    """
+    try:
+        scorer = await start_shadow(version)
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Error iniciando shadow scoring", challenger_version=version, error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error iniciando shadow: {str(e)}")
+    
+    return {"status": "success", "challenger_version": scorer.version, "timestamp": time.time()}
+
+@app.delete("/model/shadow", dependencies=[Depends(require_admin)])
+async def stop_model_shadow():
+    """
+    Detiene el challenger en shadow
+    """
+    await stop_shadow()
+    return {"status": "success", "timestamp": time.time()}
+
+@app.get("/debug/profile", dependencies=[Depends(require_admin_token)])
+async def get_profile():
+    """
+    Estado de la sesión de profiling y del profile continuo de este worker
+    """
+    if request_profiler is None:
+        raise HTTPException(status_code=503, detail="Servicio iniciándose")
+    return request_profiler.status()
+
+@app.post("/debug/profile", dependencies=[Depends(require_admin_token)])
+async def start_profile(
+    mode: str = CPROFILE,
+    requests: int = Query(100, ge=1),
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, ge=1),
+    all_threads: bool = False
+):
+    """
+    Perfila este worker: cProfile de los próximos `requests` a /predict* o muestreo de pilas durante `seconds`
+    """
+    if requests > settings.PROFILING_MAX_REQUESTS or seconds > settings.PROFILING_MAX_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {settings.PROFILING_MAX_REQUESTS} requests y {settings.PROFILING_MAX_SECONDS:g} segundos por sesión"
+        )
+    try:
+        request_profiler.start(mode, requests, seconds, interval_ms, all_threads)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    logger.info("Sesión de profiling iniciada", mode=mode)
+    return {"status": "success", **request_profiler.status(), "timestamp": time.time()}
+
+@app.get("/debug/profile/result", dependencies=[Depends(require_admin_token)])
+async def get_profile_result(source: str = "session", output_format: Optional[str] = Query(None, alias="format")):
+    """
+    Resultado de la sesión o del profile continuo: texto o pstats (cprofile), pilas colapsadas (sampling)
+    Se puede leer con la sesión en curso
+    """
+    if source not in ("session", "continuous"):
+        raise HTTPException(status_code=400, detail="source debe ser session o continuous")
+    profile = request_profiler.session if source == "session" else request_profiler.continuous
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Sin profile ({source})")
+    
+    formats = PROFILE_FORMATS[profile.mode]
+    output_format = output_format or formats[0]
+    if output_format not in formats:
+        raise HTTPException(status_code=400, detail=f"Formatos de {profile.mode}: {', '.join(formats)}")
+    
+    # En el event loop: cProfile se deshabilita y habilita por hilo
+    content = profile.result(output_format)
+    if output_format == "pstats":
+        return Response(
+            content,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.pstats"'}
+        )
+    return Response(content, media_type="text/plain")
+
+@app.delete("/debug/profile", dependencies=[Depends(require_admin_token)])
+async def stop_profile():
+    """
+    Detiene y descarta la sesión de profiling y reinicia el profile continuo
+    """
+    request_profiler.stop()
+    return {"status": "success", "timestamp": time.time()}
+
+@app.get("/model/drift")
+async def get_model_drift():
+    """
+    Drift del tráfico reciente de /predict frente al perfil de entrenamiento del modelo activo (PSI y KS)
+    """
+    fraud_detector = get_active_detector()
+    
+    if fraud_detector is None:
+        raise HTTPException(status_code=503, detail="Modelo no está disponible")
+    if not settings.DRIFT_MONITOR_ENABLED:
+        raise HTTPException(status_code=404, detail="Monitoreo de drift deshabilitado")
+    if fraud_detector.drift_reference is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"La versión {fraud_detector.model_version} no tiene perfil de referencia (reentrenar para generarlo)"
+        )
+    
+    report = _export_drift_metrics()
+    report["timestamp"] = time.time()
+    return report
+
 @app.get("/model/info")
 async def get_model_info():
     """
     Información sobre el modelo actual
     """
-    global fraud_detector
+    fraud_detector = get_active_detector()
     
     if fraud_detector is None:
         raise HTTPException(status_code=503, detail="Modelo no está disponible")
@@ -238,23 +997,25 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
+            "health_live": "/health/live",
+            "health_ready": "/health/ready",
             "predict": "/predict",
+            "predict_batch": "/predict/batch",
+            "predict_stream": "/predict/stream",
             "metrics": "/metrics",
             "model_info": "/model/info",
+            "model_drift": "/model/drift",
+            "model_shadow": "/model/shadow",
+            "model_versions": "/model/versions",
+            "debug_profile": "/debug/profile",
             "docs": "/docs"
         }
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=settings.PORT,
-        log_level=settings.LOG_LEVEL.lower(),
-        reload=settings.DEBUG
-    )
+    from .server import main
+    
+    main()
 
 
 
@@ -0,0 +1,121 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Métricas de predicción
+PREDICTION_COUNTER = Counter('ml_predictions_total', 'Total number of predictions made', ['result'])
+PREDICTION_DURATION = Histogram('ml_prediction_duration_seconds', 'Time spent on predictions')
+MODEL_LOAD_COUNTER = Counter('ml_model_loads_total', 'Total number of model loads')
+PREDICTION_STAGE_DURATION = Histogram(
+    'ml_prediction_stage_duration_seconds',
+    'Time spent in each stage of a prediction request',
+    ['route', 'stage'],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0)
+)
+
+# Métricas del micro-batching
+MICRO_BATCH_SIZE = Histogram(
+    'ml_micro_batch_size',
+    'Number of predictions coalesced into a single micro-batch',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+MICRO_BATCH_QUEUE_WAIT = Histogram(
+    'ml_micro_batch_queue_wait_seconds',
+    'Time a prediction waits in the micro-batch queue before scoring',
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+# Logging asíncrono
+LOG_RECORDS_DROPPED = Counter(
+    'ml_log_records_dropped_total',
+    'Log records dropped because the log queue was full'
+)
+
+# Cache de predicciones
+PREDICTION_CACHE_REQUESTS = Counter(
+    'ml_prediction_cache_requests_total',
+    'Prediction cache lookups',
+    ['result']
+)
+PREDICTION_CACHE_EVICTIONS = Counter(
+    'ml_prediction_cache_evictions_total',
+    'Prediction cache entries removed',
+    ['reason']
+)
+# livesum: con varios workers se suman las entradas de los procesos vivos
+PREDICTION_CACHE_ENTRIES = Gauge(
+    'ml_prediction_cache_entries',
+    'Entries currently held in the prediction cache',
+    multiprocess_mode='livesum'
+)
+
+# Tablas de riesgo
+RISK_TABLES_RELOADS = Counter(
+    'ml_risk_tables_reloads_total',
+    'Risk table hot reloads',
+    ['result']
+)
+
+# Velocity store
+VELOCITY_KEYS = Gauge(
+    'ml_velocity_keys',
+    'Keys currently tracked by the velocity store',
+    ['key_type'],
+    multiprocess_mode='livesum'
+)
+VELOCITY_EVICTIONS = Counter(
+    'ml_velocity_evictions_total',
+    'Keys evicted from the velocity store to make room',
+    ['key_type']
+)
+
+# Drift del tráfico de /predict frente al perfil de entrenamiento (se actualiza en cada scrape)
+# livemax: con varios workers se reporta el peor worker vivo
+DRIFT_PSI = Gauge(
+    'ml_drift_psi',
+    'Population stability index of live /predict traffic against the training reference',
+    ['feature'],
+    multiprocess_mode='livemax'
+)
+DRIFT_KS = Gauge(
+    'ml_drift_ks',
+    'Kolmogorov-Smirnov statistic of live /predict traffic against the training reference',
+    ['feature'],
+    multiprocess_mode='livemax'
+)
+DRIFT_OBSERVATIONS = Gauge(
+    'ml_drift_observations',
+    'Predictions in the drift comparison windows',
+    multiprocess_mode='livesum'
+)
+
+# Shadow scoring del modelo challenger
+SHADOW_PREDICTIONS = Counter(
+    'ml_shadow_predictions_total',
+    'Predictions handed to the shadow challenger by outcome',
+    ['result']
+)
+SHADOW_AGREEMENTS = Counter(
+    'ml_shadow_agreements_total',
+    'Shadow predictions where champion and challenger assign the same risk level'
+)
+SHADOW_SCORE_DELTA = Counter(
+    'ml_shadow_score_delta_abs_total',
+    'Sum of absolute risk score differences between challenger and champion'
+)
+
+# Control de admisión de /predict y /predict/batch
+ADMISSION_SHED = Counter(
+    'ml_admission_shed_total',
+    'Requests rejected or dropped before scoring by admission control',
+    ['route', 'reason']
+)
+ADMISSION_FALLBACK = Counter(
+    'ml_admission_fallback_total',
+    '/predict requests answered with the rule-based fallback score instead of the model',
+    ['reason']
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    'ml_admission_in_flight',
+    'Requests in flight on admission-controlled routes by admission to the model (updated on each scrape)',
+    ['admitted'],
+    multiprocess_mode='livesum'
+)
@@ -0,0 +1,189 @@
+"""
+Scoring en cascada: un árbol poco profundo resuelve las transacciones claramente legítimas
+
+Junto al ensemble se entrena un árbol de decisión de CASCADE_MAX_DEPTH niveles sobre las features
+sin escalar. El conjunto de validación, ya evaluado por el ensemble completo, se divide en dos
+mitades. Con la primera se calibra: para cada hoja se guarda la media de los scores del ensemble
+y se elige el corte de probabilidad del árbol. Las hojas por debajo del corte cuyo risk_score medio
+queda bajo MEDIUM_RISK_THRESHOLD salen en la primera etapa, siempre que pierdan a lo sumo
+CASCADE_MAX_RECALL_LOSS de las alertas (risk_score >= MEDIUM_RISK_THRESHOLD) del ensemble. Con la
+segunda mitad se mide el efecto: tasa de salida temprana, alertas perdidas y recall de fraude.
+
+Si ninguna hoja califica (p. ej. con la prevalencia de los datos simulados por defecto, donde nada
+queda claramente por debajo del umbral) la etapa se guarda con su reporte pero no se usa al servir.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .compiled_forest import CompiledForest
+from ..config import settings
+
+# Filas mínimas por hoja: las medias por hoja se calculan con pocas filas de validación
+MIN_SAMPLES_LEAF = 20
+
+# Scores que la primera etapa devuelve por hoja (media del ensemble en las filas de calibración)
+LEAF_SCORES = ('risk_score', 'fraud_probability', 'anomaly_score')
+
+
+def _leaf_means(leaves: np.ndarray, values: np.ndarray, n_nodes: int):
+    """(filas por nodo, media de `values` por nodo); 0 en nodos sin filas"""
+    counts = np.bincount(leaves, minlength=n_nodes)
+    sums = np.bincount(leaves, weights=values, minlength=n_nodes)
+    return counts, sums / np.maximum(counts, 1)
+
+
+class CascadeStage:
+    """Primera etapa: árbol compilado y, por nodo, si la fila sale temprano y con qué scores"""
+
+    def __init__(
+        self,
+        tree: CompiledForest,
+        exits: np.ndarray,
+        leaf_scores: Dict[str, np.ndarray],
+        cutoff: float,
+        report: Dict[str, Any]
+    ):
+        self.tree = tree
+        self.exits = np.asarray(exits, dtype=bool)
+        self.leaf_scores = {name: np.asarray(leaf_scores[name], dtype=np.float64) for name in LEAF_SCORES}
+        self.cutoff = cutoff
+        self.report = report
+        # Sin hojas de salida la etapa no resuelve ninguna fila: usarla solo sumaría el árbol a cada request
+        self.has_exits = bool(self.exits.any())
+        # (feature, umbral, hijo izquierdo, hijo derecho) por nodo para recorrer una fila en Python
+        self._nodes = list(zip(
+            tree.feature.tolist(), tree.threshold.tolist(), tree.children[0::2].tolist(), tree.children[1::2].tolist()
+        ))
+
+    @classmethod
+    def fit(
+        cls,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
+        X_validation: np.ndarray,
+        y_validation: np.ndarray,
+        validation_scores: Dict[str, np.ndarray],
+        max_depth: int,
+        max_recall_loss: float,
+        seed: int = 42
+    ) -> "CascadeStage":
+        """
+        Entrena el árbol y calibra el corte con los scores del ensemble completo sobre validación
+        `validation_scores` es la salida de `_score_matrix` sin cascada
+        """
+        # Solo se entrena fuera del camino de inferencia: sklearn no se importa al servir
+        from sklearn.tree import DecisionTreeClassifier
+        
+        model = DecisionTreeClassifier(
+            max_depth=max_depth,
+            min_samples_leaf=MIN_SAMPLES_LEAF,
+            class_weight='balanced',
+            random_state=seed
+        )
+        model.fit(X_train, y_train)
+
+        fraud_class = int(np.flatnonzero(model.classes_ == 1)[0])
+        counts = model.tree_.value[:, 0, :]
+        tree = CompiledForest.from_trees([model.tree_], [counts[:, fraud_class] / counts.sum(axis=1)])
+        n_nodes = len(tree.value)
+
+        # Mitad para calibrar y mitad para medir, en orden aleatorio
+        order = np.random.default_rng(seed).permutation(len(X_validation))
+        calibration, evaluation = order[:len(order) // 2], order[len(order) // 2:]
+        leaves = tree.apply(X_validation)[0]
+        y_validation = np.asarray(y_validation, dtype=bool)
+        alerts = np.asarray(validation_scores['risk_score']) >= settings.MEDIUM_RISK_THRESHOLD * 100
+
+        leaf_scores = {}
+        for name in LEAF_SCORES:
+            rows, leaf_scores[name] = _leaf_means(leaves[calibration], validation_scores[name][calibration], n_nodes)
+        # Solo pueden salir hojas con filas de calibración y risk_score medio bajo el umbral medio
+        eligible = (rows > 0) & (leaf_scores['risk_score'] < settings.MEDIUM_RISK_THRESHOLD * 100)
+
+        # Alertas perdidas por hoja; el corte más alto cuya pérdida acumulada no supera el máximo
+        lost = np.bincount(leaves[calibration], weights=alerts[calibration], minlength=n_nodes)
+        total_alerts = max(int(alerts[calibration].sum()), 1)
+        cutoff = -np.inf
+        for candidate in np.unique(tree.value[eligible]):
+            if lost[eligible & (tree.value <= candidate)].sum() / total_alerts > max_recall_loss:
+                break
+            cutoff = float(candidate)
+        exits = eligible & (tree.value <= cutoff)
+
+        report = cls._evaluate(exits[leaves[evaluation]], alerts[evaluation], y_validation[evaluation])
+        report.update({
+            'depth': int(tree.max_depth),
+            'cutoff': cutoff if np.isfinite(cutoff) else None,
+            'max_recall_loss': max_recall_loss,
+            'exit_leaves': int(exits.sum()),
+        })
+        return cls(tree, exits, leaf_scores, cutoff, report)
+
+    @staticmethod
+    def _evaluate(exited: np.ndarray, alerts: np.ndarray, labels: np.ndarray) -> Dict[str, Any]:
+        """Efecto de la salida temprana en filas de validación no usadas para calibrar"""
+        frauds = max(int(labels.sum()), 1)
+        return {
+            'evaluation_rows': int(len(exited)),
+            'early_exit_rate': float(exited.mean()) if len(exited) else 0.0,
+            # Alertas del ensemble que la primera etapa resuelve como riesgo bajo
+            'alert_recall_loss': float((exited & alerts).sum() / max(int(alerts.sum()), 1)),
+            # Fraudes con alerta (risk_score >= umbral medio) con el ensemble solo y con la cascada
+            'fraud_recall_full': float((alerts & labels).sum() / frauds),
+            'fraud_recall_cascade': float((alerts & ~exited & labels).sum() / frauds),
+            'exited_fraud_rate': float(labels[exited].mean()) if exited.any() else 0.0,
+        }
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.tree.feature, self.tree.threshold, self.tree.children, self.tree.value, self.exits)
+        return sum(array.nbytes for array in arrays) + sum(values.nbytes for values in self.leaf_scores.values())
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Hoja de la primera etapa de cada fila sin escalar, forma (n_samples,)"""
+        if len(X) != 1:
+            return self.tree.apply(X)[0]
+
+        # Una fila: unos pocos niveles en Python cuestan menos que el costo fijo de NumPy por nivel
+        row = np.asarray(X[0], dtype=np.float32).tolist()
+        node = 0
+        for _ in range(self.tree.max_depth):
+            feature, threshold, left, right = self._nodes[node]
+            node = right if row[feature] > threshold else left
+        return np.array([node], dtype=np.intp)
+
+    def scores(self, leaves: np.ndarray) -> Dict[str, np.ndarray]:
+        """risk_score, fraud_probability y anomaly_score de filas que salen en la primera etapa"""
+        return {name: values[leaves] for name, values in self.leaf_scores.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'feature': self.tree.feature.tolist(),
+            'threshold': self.tree.threshold.tolist(),
+            'children': self.tree.children.tolist(),
+            'value': self.tree.value.tolist(),
+            'max_depth': self.tree.max_depth,
+            'exits': self.exits.tolist(),
+            'leaf_scores': {name: values.tolist() for name, values in self.leaf_scores.items()},
+            'cutoff': self.cutoff if np.isfinite(self.cutoff) else None,
+            'report': self.report,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CascadeStage":
+        tree = CompiledForest(
+            feature=np.asarray(data['feature'], dtype=np.intp),
+            threshold=np.asarray(data['threshold'], dtype=np.float64),
+            children=np.asarray(data['children'], dtype=np.intp),
+            value=np.asarray(data['value'], dtype=np.float64),
+            roots=np.zeros(1, dtype=np.intp),
+            max_depth=data['max_depth']
+        )
+        cutoff = data['cutoff'] if data['cutoff'] is not None else -np.inf
+        return cls(tree, data['exits'], data['leaf_scores'], cutoff, data['report'])
+
+
+def cascade_from_metadata(data: Optional[Dict[str, Any]]) -> Optional[CascadeStage]:
+    """Primera etapa guardada con el artefacto; None en modelos entrenados antes de la cascada"""
+    return CascadeStage.from_dict(data) if data else None
@@ -0,0 +1,296 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Marcador de hoja usado por sklearn en children_left / children_right
+TREE_LEAF = -1
+
+# Formato en disco: un .npy por arreglo + manifiesto JSON con los escalares
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+
+def _average_path_length(n_samples: np.ndarray) -> np.ndarray:
+    """Longitud promedio de camino en un iTree de n muestras (misma fórmula que sklearn)"""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    average_path_length = np.zeros_like(n_samples)
+
+    mask_2 = n_samples == 2
+    not_mask = n_samples > 2
+
+    average_path_length[mask_2] = 1.0
+    average_path_length[not_mask] = (
+        2.0 * (np.log(n_samples[not_mask] - 1.0) + np.euler_gamma)
+        - 2.0 * (n_samples[not_mask] - 1.0) / n_samples[not_mask]
+    )
+    return average_path_length
+
+
+def _node_depths(children_left: np.ndarray, children_right: np.ndarray) -> np.ndarray:
+    """Profundidad de cada nodo (sklearn numera los hijos siempre después del padre)"""
+    depths = np.zeros(len(children_left), dtype=np.int64)
+    for node in range(len(children_left)):
+        if children_left[node] != TREE_LEAF:
+            depths[children_left[node]] = depths[node] + 1
+            depths[children_right[node]] = depths[node] + 1
+    return depths
+
+
+class CompiledForest:
+    """
+    Conjunto de árboles aplanado en arreglos contiguos de NumPy
+    Las hojas apuntan a sí mismas, por lo que todas las filas avanzan `max_depth` pasos sin ramas
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        children: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int
+    ):
+        self.feature = feature        # (n_nodes,) índice de feature de cada split
+        self.threshold = threshold    # (n_nodes,) umbral del split (x <= umbral va a la izquierda)
+        self.children = children      # (2 * n_nodes,) hijo izquierdo en 2i, derecho en 2i + 1
+        self.value = value            # (n_nodes,) valor de hoja
+        self.roots = roots            # (n_trees,) nodo raíz de cada árbol
+        self.max_depth = max_depth
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_trees(
+        cls,
+        trees: Sequence,
+        leaf_values: Sequence[np.ndarray],
+        feature_maps: Optional[Sequence[Optional[np.ndarray]]] = None
+    ) -> "CompiledForest":
+        """
+        Aplana una lista de `tree_` de sklearn
+        `leaf_values[i]` es el valor por nodo del árbol i; `feature_maps[i]` traduce índices locales a globales
+        """
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for i, tree in enumerate(trees):
+            n_nodes = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            is_leaf = left == TREE_LEAF
+            node_ids = np.arange(n_nodes)
+
+            # En las hojas la feature es irrelevante, se usa 0 para que el gather sea válido
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.int64)
+            if feature_maps is not None and feature_maps[i] is not None:
+                feature = np.asarray(feature_maps[i], dtype=np.int64)[feature]
+
+            # Las hojas apuntan a sí mismas
+            tree_children = np.empty(2 * n_nodes, dtype=np.int64)
+            tree_children[0::2] = np.where(is_leaf, node_ids, left) + offset
+            tree_children[1::2] = np.where(is_leaf, node_ids, right) + offset
+
+            features.append(feature)
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            children.append(tree_children)
+            values.append(np.asarray(leaf_values[i], dtype=np.float64))
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, int(tree.max_depth))
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children=np.ascontiguousarray(np.concatenate(children), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth
+        )
+
+    def apply(self, X: np.ndarray, n_trees: Optional[int] = None) -> np.ndarray:
+        """
+        Índice de la hoja alcanzada por cada fila en cada árbol, forma (n_trees, n_samples)
+        Con `n_trees` solo se recorren los primeros árboles
+        """
+
+        # sklearn evalúa los árboles en float32
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])
+        roots = self.roots if n_trees is None else self.roots[:n_trees]
+        nodes = np.repeat(roots[:, None], X.shape[0], axis=1)
+
+        for _ in range(self.max_depth):
+            go_right = X[rows, self.feature[nodes]] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + go_right]
+
+        return nodes
+
+    def leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Valor de hoja de cada árbol para cada fila, forma (n_trees, n_samples)"""
+        return self.value[self.apply(X)]
+
+
+class CompiledEnsemble:
+    """
+    Evaluador del ensemble (StandardScaler + RandomForest + IsolationForest) sin sklearn en tiempo de request
+    Los árboles de ambos bosques se recorren juntos en un único bucle vectorizado
+    """
+
+    def __init__(
+        self,
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        forest: CompiledForest,
+        n_rf_trees: int,
+        iso_offset: float,
+        iso_denominator: float
+    ):
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.forest = forest
+        self.n_rf_trees = n_rf_trees
+        self.iso_offset = iso_offset
+        self.iso_denominator = iso_denominator
+
+    @classmethod
+    def from_estimators(cls, scaler, random_forest, isolation_forest) -> "CompiledEnsemble":
+        """Exporta los modelos entrenados de sklearn a arreglos planos"""
+        trees: List = []
+        leaf_values: List[np.ndarray] = []
+        feature_maps: List[Optional[np.ndarray]] = []
+
+        # Random Forest: probabilidad normalizada de la clase fraude en cada nodo
+        fraud_class = int(np.flatnonzero(random_forest.classes_ == 1)[0])
+        for estimator in random_forest.estimators_:
+            tree = estimator.tree_
+            counts = tree.value[:, 0, :]
+            normalizer = counts.sum(axis=1)
+            normalizer[normalizer == 0] = 1.0
+            trees.append(tree)
+            leaf_values.append(counts[:, fraud_class] / normalizer)
+            feature_maps.append(None)
+
+        # Isolation Forest: profundidad de la hoja + longitud esperada del subárbol no construido
+        n_features = isolation_forest.n_features_in_
+        for estimator, features in zip(isolation_forest.estimators_, isolation_forest.estimators_features_):
+            tree = estimator.tree_
+            depths = _node_depths(tree.children_left, tree.children_right)
+            trees.append(tree)
+            leaf_values.append(depths + _average_path_length(tree.n_node_samples))
+            feature_maps.append(features if len(features) != n_features else None)
+
+        n_iso_trees = len(isolation_forest.estimators_)
+        iso_denominator = n_iso_trees * float(_average_path_length(np.array([isolation_forest.max_samples_]))[0])
+
+        return cls(
+            scaler_mean=np.asarray(scaler.mean_, dtype=np.float64),
+            scaler_scale=np.asarray(scaler.scale_, dtype=np.float64),
+            forest=CompiledForest.from_trees(trees, leaf_values, feature_maps),
+            n_rf_trees=len(random_forest.estimators_),
+            iso_offset=float(isolation_forest.offset_),
+            iso_denominator=iso_denominator
+        )
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Arreglos que componen el ensemble, por nombre de archivo"""
+        return {
+            'scaler_mean': self.scaler_mean,
+            'scaler_scale': self.scaler_scale,
+            'feature': self.forest.feature,
+            'threshold': self.forest.threshold,
+            'children': self.forest.children,
+            'value': self.forest.value,
+            'roots': self.forest.roots,
+        }
+
+    def save(self, directory: str, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Guarda el ensemble como arreglos .npy crudos y un manifiesto JSON
+        `metadata` (versión, features, métricas...) se guarda en el manifiesto junto a los escalares
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        for name, array in self.arrays().items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'n_rf_trees': self.n_rf_trees,
+            'iso_offset': self.iso_offset,
+            'iso_denominator': self.iso_denominator,
+            'max_depth': self.forest.max_depth,
+            'metadata': metadata or {},
+        }
+        with open(os.path.join(directory, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> Tuple["CompiledEnsemble", Dict[str, Any]]:
+        """
+        Carga un ensemble guardado con `save`; retorna (ensemble, metadata)
+        Con `mmap_mode='r'` los arreglos se mapean de solo lectura: la carga no copia datos y los
+        procesos que abren el mismo artefacto comparten las páginas del page cache
+        """
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Formato de artefacto no soportado: {manifest.get('format_version')}")
+
+        # np.asarray descarta la subclase np.memmap (misma memoria) para que la indexación no pase por ella
+        arrays = {
+            name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+            for name in ('scaler_mean', 'scaler_scale', 'feature', 'threshold', 'children', 'value', 'roots')
+        }
+
+        forest = CompiledForest(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            children=arrays['children'],
+            value=arrays['value'],
+            roots=arrays['roots'],
+            max_depth=manifest['max_depth']
+        )
+        ensemble = cls(
+            scaler_mean=arrays['scaler_mean'],
+            scaler_scale=arrays['scaler_scale'],
+            forest=forest,
+            n_rf_trees=manifest['n_rf_trees'],
+            iso_offset=manifest['iso_offset'],
+            iso_denominator=manifest['iso_denominator']
+        )
+        return ensemble, manifest['metadata']
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """Equivalente a StandardScaler.transform"""
+        return (np.asarray(X, dtype=np.float64) - self.scaler_mean) / self.scaler_scale
+
+    def apply(self, X: np.ndarray, n_trees: Optional[int] = None) -> np.ndarray:
+        """Hojas alcanzadas por cada fila de X sin escalar, forma (n_trees, n_samples); los del RF van primero"""
+        return self.forest.apply(self.transform(X), n_trees)
+
+    def score(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (fraud_probability, anomaly_score) para cada fila de X sin escalar"""
+        return self.score_leaves(self.apply(X))
+
+    def score_leaves(self, leaves: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(fraud_probability, anomaly_score) a partir de las hojas de `apply` (sirve para reusarlas al explicar)"""
+        leaf_values = self.forest.value[leaves]
+
+        fraud_probability = leaf_values[:self.n_rf_trees].mean(axis=0)
+
+        path_lengths = leaf_values[self.n_rf_trees:].sum(axis=0)
+        if self.iso_denominator != 0:
+            scores = -(2 ** (-path_lengths / self.iso_denominator))
+        else:
+            scores = -np.ones_like(path_lengths)
+        anomaly_score = scores - self.iso_offset
+
+        return fraud_probability, anomaly_score
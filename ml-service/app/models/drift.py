@@ -0,0 +1,209 @@
+"""
+Monitoreo de drift del tráfico en vivo frente a los datos de entrenamiento
+
+Al entrenar se guarda con el artefacto un perfil de referencia: para cada feature y para
+risk_score, cortes por cuantiles (a lo sumo DRIFT_BINS intervalos) y la proporción de filas de
+entrenamiento en cada intervalo. En el servicio, cada predicción suma 1 al intervalo de cada
+columna; el tamaño de los histogramas es fijo, así que la memoria no depende del tráfico.
+PSI y KS se calculan bajo demanda comparando los histogramas en vivo con la referencia.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+RISK_SCORE_COLUMN = 'risk_score'
+
+# Filas de entrenamiento muestreadas para el perfil de referencia
+REFERENCE_MAX_ROWS = 200_000
+
+# Umbrales habituales de PSI: < 0.1 estable, 0.1 - 0.25 drift moderado, >= 0.25 drift significativo
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+
+# Proporción mínima al calcular PSI, para que los intervalos vacíos no den log(0)
+PSI_EPSILON = 1e-4
+
+# Estado de cada columna mientras no hay DRIFT_MIN_OBSERVATIONS observaciones
+INSUFFICIENT_DATA = 'insufficient_data'
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Population stability index por fila de dos matrices de proporciones (columnas, intervalos)"""
+    expected = np.maximum(expected, PSI_EPSILON)
+    actual = np.maximum(actual, PSI_EPSILON)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+def ks(expected: np.ndarray, actual: np.ndarray) -> np.ndarray:
+    """Estadístico de Kolmogorov-Smirnov por fila, sobre los cortes de los intervalos"""
+    return np.abs(np.cumsum(actual, axis=1) - np.cumsum(expected, axis=1)).max(axis=1)
+
+
+def drift_status(value: float) -> str:
+    if value >= PSI_SIGNIFICANT:
+        return 'significant'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+class DriftReference:
+    """Perfil de referencia: cortes y proporciones por columna (features + risk_score)"""
+
+    def __init__(self, columns: Sequence[str], edges: Sequence[Sequence[float]], proportions: np.ndarray, rows: int):
+        self.columns = list(columns)
+        self.rows = rows
+        n_bins = max(len(column_edges) for column_edges in edges) + 1
+
+        # Cortes rellenos con +inf para comparar todas las columnas de una vez: x > inf nunca se cumple
+        self.edges = np.full((len(self.columns), n_bins - 1), np.inf, dtype=np.float64)
+        for i, column_edges in enumerate(edges):
+            self.edges[i, :len(column_edges)] = column_edges
+        self.proportions = np.asarray(proportions, dtype=np.float64)
+
+    @property
+    def n_bins(self) -> int:
+        return self.proportions.shape[1]
+
+    @classmethod
+    def from_data(
+        cls,
+        X: np.ndarray,
+        risk_scores: np.ndarray,
+        feature_names: Sequence[str],
+        n_bins: int,
+        seed: int = 42
+    ) -> "DriftReference":
+        """Construye el perfil a partir de la matriz de entrenamiento y de los risk_score de validación"""
+        X = np.asarray(X, dtype=np.float64)
+        if len(X) > REFERENCE_MAX_ROWS:
+            X = X[np.random.default_rng(seed).choice(len(X), REFERENCE_MAX_ROWS, replace=False)]
+
+        columns = [*feature_names, RISK_SCORE_COLUMN]
+        values = [X[:, i] for i in range(X.shape[1])] + [np.asarray(risk_scores, dtype=np.float64)]
+        quantiles = np.linspace(0, 1, n_bins + 1)[1:-1]
+
+        edges: List[np.ndarray] = []
+        proportions = np.zeros((len(columns), n_bins), dtype=np.float64)
+        for i, column in enumerate(values):
+            # Cuantiles repetidos (features binarias o muy concentradas) se colapsan en un solo corte
+            column_edges = np.unique(np.quantile(column, quantiles))
+            # Mismo criterio que bin_indices: cantidad de cortes estrictamente menores que el valor
+            counts = np.bincount(np.searchsorted(column_edges, column, side='left'), minlength=n_bins)
+            proportions[i] = counts / len(column)
+            edges.append(column_edges)
+
+        return cls(columns, edges, proportions, rows=len(X))
+
+    def bin_indices(self, values: np.ndarray) -> np.ndarray:
+        """Intervalo de cada valor, forma (n_samples, columnas); `values` incluye risk_score al final"""
+        return (values[:, :, None] > self.edges[None, :, :]).sum(axis=2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'columns': self.columns,
+            'edges': [[float(edge) for edge in row if np.isfinite(edge)] for row in self.edges],
+            'proportions': self.proportions.tolist(),
+            'rows': self.rows,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DriftReference":
+        return cls(data['columns'], data['edges'], np.asarray(data['proportions']), data['rows'])
+
+
+class DriftMonitor:
+    """
+    Histogramas en vivo de tamaño fijo por columna para una versión del modelo
+    Cuenta en ventanas de `window_size` observaciones y compara la ventana anterior completa más la
+    actual, así el drift refleja el tráfico reciente y no todo el tráfico desde el arranque
+    """
+
+    def __init__(self, reference: DriftReference, model_version: str, window_size: int, min_observations: int):
+        self.reference = reference
+        self.model_version = model_version
+        self.window_size = max(1, window_size)
+        self.min_observations = min_observations
+
+        shape = (len(reference.columns), reference.n_bins)
+        self._current = np.zeros(shape, dtype=np.int64)
+        self._previous = np.zeros(shape, dtype=np.int64)
+        self._current_count = 0
+        # Posición de cada columna en los histogramas aplanados
+        self._offsets = np.arange(shape[0]) * shape[1]
+        # Solo protege la suma y la rotación de ventanas; el cálculo de intervalos va fuera del lock
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._current.nbytes + self._previous.nbytes + self.reference.edges.nbytes + self.reference.proportions.nbytes
+
+    def observe(self, X: np.ndarray, risk_scores: np.ndarray):
+        """Registra filas ya codificadas (n, n_features) con su risk_score"""
+        values = np.column_stack([np.atleast_2d(X), np.atleast_1d(risk_scores)])
+        bins = self.reference.bin_indices(values) + self._offsets
+        if len(values) == 1:
+            increments = None
+        else:
+            increments = np.bincount(bins.ravel(), minlength=self._current.size).reshape(self._current.shape)
+
+        with self._lock:
+            if increments is None:
+                # Una fila: cada columna cae en un único intervalo, sin índices repetidos
+                self._current.ravel()[bins[0]] += 1
+            else:
+                self._current += increments
+            self._current_count += len(values)
+            if self._current_count >= self.window_size:
+                self._previous, self._current = self._current, np.zeros_like(self._current)
+                self._current_count = 0
+
+    def reset(self):
+        with self._lock:
+            self._current[:] = 0
+            self._previous[:] = 0
+            self._current_count = 0
+
+    def report(self) -> Dict[str, Any]:
+        """PSI y KS por columna de las dos últimas ventanas frente a la referencia"""
+        with self._lock:
+            counts = self._current + self._previous
+        observations = int(counts[0].sum())
+
+        ready = observations >= self.min_observations
+
+        if ready:
+            actual = counts / max(observations, 1)
+            psi_values = psi(self.reference.proportions, actual)
+            ks_values = ks(self.reference.proportions, actual)
+            columns = {
+                name: {'psi': float(psi_value), 'ks': float(ks_value), 'status': drift_status(psi_value)}
+                for name, psi_value, ks_value in zip(self.reference.columns, psi_values, ks_values)
+            }
+        else:
+            # Con pocas observaciones el PSI es ruido (una sola fila da PSI ~ 8): no se reporta
+            columns = {
+                name: {'psi': None, 'ks': None, 'status': INSUFFICIENT_DATA}
+                for name in self.reference.columns
+            }
+        risk_score = columns.pop(RISK_SCORE_COLUMN)
+
+        return {
+            'model_version': self.model_version,
+            'ready': ready,
+            'observations': observations,
+            'window_size': self.window_size,
+            'reference_rows': self.reference.rows,
+            'risk_score': risk_score,
+            'features': columns,
+            'drifted_features': sorted(
+                (name for name, values in columns.items() if values['status'] != 'stable'),
+                key=lambda name: -columns[name]['psi']
+            ) if ready else [],
+        }
+
+
+def reference_from_metadata(data: Optional[Dict[str, Any]]) -> Optional[DriftReference]:
+    """Perfil guardado con el artefacto; None en modelos entrenados antes del monitoreo de drift"""
+    return DriftReference.from_dict(data) if data else None
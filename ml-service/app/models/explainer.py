@@ -0,0 +1,191 @@
+"""
+Explicaciones por predicción del Random Forest compilado
+
+Contribuciones por feature al estilo Saabas: en cada split, el cambio de la probabilidad de fraude
+del nodo padre al hijo se atribuye a la feature del split. Sumadas a lo largo del camino dan
+probabilidad de la hoja = probabilidad de la raíz + contribuciones, y promediadas sobre los
+árboles dan fraud_probability = bias + suma de contribuciones.
+
+Las contribuciones acumuladas de cada hoja se precalculan una vez por modelo, así que explicar una
+predicción es sumar una fila por árbol de las hojas que el evaluador compilado ya encontró.
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from ..config import settings
+from ..features.velocity import VELOCITY_FEATURES
+from .compiled_forest import CompiledEnsemble
+
+# Factores que se nombran en decision_reason y contribución mínima (en probabilidad) para nombrarlos
+MAX_REASON_FACTORS = 3
+MIN_REASON_CONTRIBUTION = 0.01
+
+OUTLIER_REASON = "Comportamiento atípico"
+NO_RISK_REASON = "Sin factores de riesgo relevantes"
+
+# Factores de decision_reason: (features que agrupa, reglas, frase por defecto)
+# Las contribuciones de las features de un factor se suman. Cada regla es (feature, si su valor es
+# distinto de 0, frase) y se usa la frase de la primera que cumple la transacción
+REASON_FACTORS = (
+    (('amount', 'amount_log', 'is_high_amount', 'is_round_amount'),
+     (('is_high_amount', True, "Monto alto"), ('is_round_amount', True, "Monto redondo")),
+     "Monto de la transacción"),
+    (('hour', 'is_night', 'is_business_hours'),
+     (('is_night', True, "Horario nocturno"), ('is_business_hours', False, "Fuera de horario laboral")),
+     "Hora de la transacción"),
+    (('dayOfWeek', 'is_weekend', 'is_friday'),
+     (('is_weekend', True, "Fin de semana"), ('is_friday', True, "Viernes")),
+     "Día de la semana"),
+    (('mcc_numeric', 'mcc_high_risk', 'mcc_medium_risk'),
+     (('mcc_high_risk', True, "MCC de alto riesgo"), ('mcc_medium_risk', True, "MCC de riesgo medio")),
+     "Tipo de comercio"),
+    (('country_high_risk', 'country_medium_risk', 'country_domestic'),
+     (('country_high_risk', True, "País de alto riesgo"), ('country_medium_risk', True, "País de riesgo medio"),
+      ('country_domestic', False, "Transacción internacional")),
+     "País de la transacción"),
+    (('bin_numeric', 'bin_high_risk'),
+     (('bin_high_risk', True, "BIN de alto riesgo"),),
+     "Emisor de la tarjeta"),
+) + tuple(
+    (tuple(name for name in VELOCITY_FEATURES if name.startswith(f'{key}_')), (), f"Actividad reciente de {label}")
+    for key, label in (('card', 'la tarjeta'), ('bin', 'el BIN'), ('device', 'el dispositivo'), ('ip', 'la IP'))
+)
+
+
+RISK_LEVELS = ('low', 'medium', 'high')
+_RISK_LEVEL_NAMES = np.array(RISK_LEVELS)
+
+
+def risk_level_indices(risk_scores: np.ndarray) -> np.ndarray:
+    """Posición en RISK_LEVELS de cada risk_score (0-100) según los umbrales configurados"""
+    probabilities = np.asarray(risk_scores) / 100
+    return np.where(
+        probabilities >= settings.HIGH_RISK_THRESHOLD, 2,
+        np.where(probabilities >= settings.MEDIUM_RISK_THRESHOLD, 1, 0)
+    )
+
+
+def risk_levels(risk_scores: np.ndarray) -> np.ndarray:
+    """Nivel de riesgo (low/medium/high) de cada risk_score (0-100)"""
+    return _RISK_LEVEL_NAMES[risk_level_indices(risk_scores)]
+
+
+class ForestExplainer:
+    """Contribuciones por feature precalculadas por hoja para los árboles del Random Forest compilado"""
+
+    def __init__(self, ensemble: CompiledEnsemble, feature_names: Sequence[str]):
+        forest = ensemble.forest
+        n_trees = ensemble.n_rf_trees
+        n_features = len(feature_names)
+        # Los nodos del Random Forest van primero y son contiguos
+        n_nodes = int(forest.roots[n_trees]) if n_trees < forest.n_trees else len(forest.feature)
+
+        nodes = np.arange(n_nodes)
+        left = np.asarray(forest.children[0:2 * n_nodes:2])
+        right = np.asarray(forest.children[1:2 * n_nodes:2])
+        value = np.asarray(forest.value[:n_nodes])
+        feature = np.asarray(forest.feature[:n_nodes])
+        is_leaf = left == nodes
+
+        # Contribución acumulada desde la raíz, un nivel del árbol a la vez
+        path = np.zeros((n_nodes, n_features), dtype=np.float64)
+        level = np.asarray(forest.roots[:n_trees])
+        while level.size:
+            parents = level[~is_leaf[level]]
+            children = np.concatenate([left[parents], right[parents]])
+            parents = np.concatenate([parents, parents])
+            path[children] = path[parents]
+            path[children, feature[parents]] += value[children] - value[parents]
+            level = children
+
+        # Solo se guardan las hojas, ya divididas por el número de árboles
+        self.leaf_slot = np.full(n_nodes, -1, dtype=np.intp)
+        self.leaf_slot[is_leaf] = np.arange(int(is_leaf.sum()))
+        self.leaf_contributions = np.ascontiguousarray(path[is_leaf] / n_trees, dtype=np.float32)
+        self.bias = float(value[np.asarray(forest.roots[:n_trees])].mean())
+
+        self.n_trees = n_trees
+        self.feature_names = list(feature_names)
+
+        # Matriz (n_features, n_factors) que suma las contribuciones de cada factor; las features
+        # que no pertenecen a ningún factor forman uno propio con su nombre
+        index = {name: i for i, name in enumerate(self.feature_names)}
+        factors = [
+            (features, rules, phrase) for features, rules, phrase in REASON_FACTORS
+            if any(name in index for name in features)
+        ]
+        grouped = {name for features, _, _ in factors for name in features}
+        factors += [((name,), (), name) for name in self.feature_names if name not in grouped]
+
+        self._factor_matrix = np.zeros((n_features, len(factors)), dtype=np.float64)
+        # Reglas por factor como (posición en _rule_columns, valor esperado, frase)
+        self._factor_rules = []
+        rule_columns: List[int] = []
+        for j, (features, rules, phrase) in enumerate(factors):
+            self._factor_matrix[[index[name] for name in features if name in index], j] = 1.0
+            factor_rules = []
+            for name, truthy, rule_phrase in rules:
+                if name in index:
+                    factor_rules.append((len(rule_columns), truthy, rule_phrase))
+                    rule_columns.append(index[name])
+            self._factor_rules.append((factor_rules, phrase))
+        # Solo las columnas que usan las reglas se convierten a valores de Python
+        self._rule_columns = np.array(rule_columns, dtype=np.intp)
+
+    @property
+    def nbytes(self) -> int:
+        return self.leaf_slot.nbytes + self.leaf_contributions.nbytes
+
+    def contributions(self, leaves: np.ndarray) -> np.ndarray:
+        """
+        Contribución de cada feature a fraud_probability, forma (n_samples, n_features)
+        `leaves` son los índices de hoja del Random Forest, forma (n_trees, n_samples)
+        """
+        slots = self.leaf_slot[leaves]
+        if slots.shape[1] == 1:
+            return self.leaf_contributions[slots[:, 0]].sum(axis=0, dtype=np.float64)[None, :]
+
+        # Por árbol, para no materializar (n_trees, n_samples, n_features)
+        total = np.zeros((slots.shape[1], self.leaf_contributions.shape[1]), dtype=np.float64)
+        for tree_slots in slots:
+            total += self.leaf_contributions[tree_slots]
+        return total
+
+    def reasons(
+        self,
+        X: np.ndarray,
+        contributions: np.ndarray,
+        is_outlier: Optional[np.ndarray] = None
+    ) -> List[str]:
+        """
+        decision_reason de cada fila: los factores que más suben la probabilidad de fraude unidos con " + "
+        Si el Isolation Forest marca la fila como anómala se agrega OUTLIER_REASON
+        """
+        factor_contributions = contributions @ self._factor_matrix
+        top = min(MAX_REASON_FACTORS, factor_contributions.shape[1])
+        order = np.argsort(-factor_contributions, axis=1)[:, :top]
+        top_contributions = np.take_along_axis(factor_contributions, order, axis=1)
+        outliers = np.zeros(len(X), dtype=bool) if is_outlier is None else np.asarray(is_outlier, dtype=bool)
+
+        reasons = []
+        rule_values = (X[:, self._rule_columns] != 0).tolist()
+        for values, row_order, row_contributions, outlier in zip(
+            rule_values, order.tolist(), top_contributions.tolist(), outliers.tolist()
+        ):
+            factors = [
+                self._phrase(factor, values)
+                for factor, contribution in zip(row_order, row_contributions)
+                if contribution >= MIN_REASON_CONTRIBUTION
+            ]
+            if outlier:
+                factors.append(OUTLIER_REASON)
+            reasons.append(" + ".join(factors) if factors else NO_RISK_REASON)
+        return reasons
+
+    def _phrase(self, factor: int, values: List[bool]) -> str:
+        rules, phrase = self._factor_rules[factor]
+        for position, truthy, rule_phrase in rules:
+            if values[position] == truthy:
+                return rule_phrase
+        return phrase
@@ -1,34 +1,86 @@
 import os
+import threading
 import time
-import joblib
 import numpy as np
-import pandas as pd
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from sklearn.ensemble import IsolationForest, RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Union
 
+from .cascade import CascadeStage, cascade_from_metadata
+from .compiled_forest import CompiledEnsemble
+from .drift import DriftReference, reference_from_metadata
+from .explainer import NO_RISK_REASON, OUTLIER_REASON, ForestExplainer, risk_levels
+from ..timing import NULL_TIMER
+from ..features.encoder import FeatureEncoder
 from ..config import settings
 
+# joblib, pandas, sklearn y el código de entrenamiento se importan dentro de los métodos que los usan:
+# un worker que sirve un artefacto compilado no los carga (arranque en frío más corto)
+if TYPE_CHECKING:
+    import pandas as pd
+    from sklearn.ensemble import IsolationForest, RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
 class FraudDetector:
     """
     Detector de fraude usando algoritmos de Machine Learning
     Combina Isolation Forest para detección de anomalías y Random Forest para clasificación
     """
     
-    def __init__(self):
-        self.isolation_forest: Optional[IsolationForest] = None
-        self.random_forest: Optional[RandomForestClassifier] = None
-        self.scaler: Optional[StandardScaler] = None
+    def __init__(self, auto_load: bool = True):
+        self.isolation_forest: Optional["IsolationForest"] = None
+        self.random_forest: Optional["RandomForestClassifier"] = None
+        self.scaler: Optional["StandardScaler"] = None
         self.feature_names: List[str] = []
         self.model_version: str = "1.0.0"
         self.training_date: Optional[datetime] = None
         self.model_metrics: Dict[str, float] = {}
+        self.training_source: Optional[str] = None
+        self.compiled_ensemble: Optional[CompiledEnsemble] = None
+        # Contribuciones por hoja para decision_reason; se precalculan en el primer uso
+        self.explainer: Optional[ForestExplainer] = None
+        # Perfil de los datos de entrenamiento para el monitoreo de drift (None en modelos anteriores)
+        self.drift_reference: Optional[DriftReference] = None
+        # Primera etapa del scoring en cascada (None en modelos anteriores)
+        self.cascade: Optional[CascadeStage] = None
+        # Filas evaluadas con la cascada activa y cuántas salieron en la primera etapa
+        # Se actualizan desde los hilos del threadpool, siempre bajo _cascade_lock
+        self.cascade_rows = 0
+        self.cascade_early_exits = 0
+        self._cascade_lock = threading.Lock()
+        self.feature_encoder: Optional[FeatureEncoder] = None
+        self.artifact_format: Optional[str] = None
+        self.load_time_ms: Optional[float] = None
+        # Artefacto joblib con los estimadores de sklearn cuando se cargan de forma diferida
+        self._estimators_path: Optional[str] = None
         
         # Cargar modelo existente o entrenar uno nuevo
-        self._load_or_train_model()
+        if auto_load:
+            self._load_or_train_model()
+    
+    @classmethod
+    def from_artifact(cls, model_path: str) -> "FraudDetector":
+        """Crea un detector a partir de un artefacto guardado; lanza excepción si no se puede cargar"""
+        detector = cls(auto_load=False)
+        detector.load(model_path)
+        return detector
+    
+    @classmethod
+    def from_compiled(cls, directory: str, estimators_path: Optional[str] = None) -> "FraudDetector":
+        """
+        Crea un detector a partir del ensemble compilado mapeado en memoria
+        Los estimadores de sklearn solo se cargan desde `estimators_path` si se llegan a necesitar
+        """
+        detector = cls(auto_load=False)
+        detector.load_compiled(directory, estimators_path)
+        return detector
+    
+    @classmethod
+    def train_new(cls, model_version: str) -> "FraudDetector":
+        """Crea y entrena un detector nuevo con la versión indicada"""
+        detector = cls(auto_load=False)
+        detector.model_version = model_version
+        detector._train()
+        return detector
     
     def _load_or_train_model(self):
         """Carga modelo existente o entrena uno nuevo si no existe"""
@@ -37,61 +89,177 @@ class FraudDetector:
         if os.path.exists(model_path):
             self._load_model(model_path)
         else:
-            # Entrenar modelo con datos simulados
-            self._train_with_simulated_data()
+            # Entrenar modelo con datos reales o simulados
+            self._train()
             self._save_model(model_path)
     
     def _load_model(self, model_path: str):
         """Carga modelo desde archivo"""
         try:
-            model_data = joblib.load(model_path)
-            
-            self.isolation_forest = model_data['isolation_forest']
-            self.random_forest = model_data['random_forest']
-            self.scaler = model_data['scaler']
-            self.feature_names = model_data['feature_names']
-            self.model_version = model_data.get('model_version', '1.0.0')
-            self.training_date = model_data.get('training_date')
-            self.model_metrics = model_data.get('model_metrics', {})
-            
+            self.load(model_path)
             print(f"Modelo cargado exitosamente desde {model_path}")
             
         except Exception as e:
             print(f"Error cargando modelo: {e}")
-            self._train_with_simulated_data()
+            self._train()
+    
+    def load(self, model_path: str):
+        """Carga el modelo desde archivo sin capturar errores"""
+        import joblib
+        
+        start_time = time.perf_counter()
+        model_data = joblib.load(model_path)
+        
+        self.isolation_forest = model_data['isolation_forest']
+        self.random_forest = model_data['random_forest']
+        self.scaler = model_data['scaler']
+        self.feature_names = model_data['feature_names']
+        self.feature_encoder = FeatureEncoder(self.feature_names)
+        self.model_version = model_data.get('model_version', '1.0.0')
+        self.training_date = model_data.get('training_date')
+        self.model_metrics = model_data.get('model_metrics', {})
+        self.training_source = model_data.get('training_source')
+        self.drift_reference = reference_from_metadata(model_data.get('drift_reference'))
+        self.cascade = cascade_from_metadata(model_data.get('cascade'))
+        
+        self.compile_ensemble()
+        self.artifact_format = 'joblib'
+        self.load_time_ms = (time.perf_counter() - start_time) * 1000
+    
+    def load_compiled(self, directory: str, estimators_path: Optional[str] = None):
+        """Carga el ensemble compilado (arreglos .npy con mmap) sin deserializar sklearn"""
+        start_time = time.perf_counter()
+        
+        mmap_mode = 'r' if settings.MODEL_ARTIFACT_MMAP else None
+        self.compiled_ensemble, metadata = CompiledEnsemble.load(directory, mmap_mode=mmap_mode)
+        self.explainer = None
+        
+        self.feature_names = metadata['feature_names']
+        self.feature_encoder = FeatureEncoder(self.feature_names)
+        self.model_version = metadata.get('model_version', '1.0.0')
+        training_date = metadata.get('training_date')
+        self.training_date = datetime.fromisoformat(training_date) if training_date else None
+        self.model_metrics = metadata.get('model_metrics', {})
+        self.training_source = metadata.get('training_source')
+        self.drift_reference = reference_from_metadata(metadata.get('drift_reference'))
+        self.cascade = cascade_from_metadata(metadata.get('cascade'))
+        self._estimators_path = estimators_path
+        
+        self.artifact_format = 'compiled-mmap' if mmap_mode else 'compiled'
+        self.load_time_ms = (time.perf_counter() - start_time) * 1000
+    
+    def save_compiled(self, directory: str):
+        """Guarda el ensemble compilado y la metadata del modelo en `directory`"""
+        if self.compiled_ensemble is None:
+            self.compile_ensemble()
+        
+        self.compiled_ensemble.save(directory, metadata={
+            'feature_names': self.feature_names,
+            'model_version': self.model_version,
+            'training_date': self.training_date.isoformat() if self.training_date else None,
+            'training_source': self.training_source,
+            'model_metrics': self.model_metrics,
+            'drift_reference': self.drift_reference.to_dict() if self.drift_reference else None,
+            'cascade': self.cascade.to_dict() if self.cascade else None
+        })
+    
+    def _ensure_estimators(self):
+        """Carga los estimadores de sklearn bajo demanda (detectores creados con from_compiled)"""
+        if self.random_forest is not None or self._estimators_path is None:
+            return
+        
+        import joblib
+        
+        model_data = joblib.load(self._estimators_path)
+        self.isolation_forest = model_data['isolation_forest']
+        self.random_forest = model_data['random_forest']
+        self.scaler = model_data['scaler']
     
     def _save_model(self, model_path: str):
         """Guarda modelo en archivo"""
         try:
-            model_data = {
-                'isolation_forest': self.isolation_forest,
-                'random_forest': self.random_forest,
-                'scaler': self.scaler,
-                'feature_names': self.feature_names,
-                'model_version': self.model_version,
-                'training_date': self.training_date,
-                'model_metrics': self.model_metrics
-            }
-            
-            joblib.dump(model_data, model_path)
+            self.save(model_path)
             print(f"Modelo guardado en {model_path}")
             
         except Exception as e:
             print(f"Error guardando modelo: {e}")
     
+    def save(self, model_path: str):
+        """Guarda el modelo en archivo sin capturar errores"""
+        import joblib
+        
+        self._ensure_estimators()
+        
+        model_data = {
+            'isolation_forest': self.isolation_forest,
+            'random_forest': self.random_forest,
+            'scaler': self.scaler,
+            'feature_names': self.feature_names,
+            'model_version': self.model_version,
+            'training_date': self.training_date,
+            'training_source': self.training_source,
+            'model_metrics': self.model_metrics,
+            'drift_reference': self.drift_reference.to_dict() if self.drift_reference else None,
+            'cascade': self.cascade.to_dict() if self.cascade else None
+        }
+        
+        joblib.dump(model_data, model_path)
+    
+    def _train(self):
+        """Entrena con el export de transacciones etiquetadas si existe, si no con datos simulados"""
+        training_data_path = os.path.join(settings.DATA_PATH, settings.TRAINING_DATA_FILE)
+        
+        if os.path.exists(training_data_path):
+            self._train_from_file(training_data_path)
+        else:
+            self._train_with_simulated_data()
+    
+    def _train_from_file(self, path: str):
+        """Entrena modelo con transacciones reales etiquetadas (CSV o Parquet)"""
+        from ..training.ingestion import load_training_data
+        from ..training.simulated_data import LABEL_COLUMN
+        
+        print(f"Entrenando modelo con datos de {path}...")
+        
+        train_data, report = load_training_data(
+            path,
+            chunk_size=settings.TRAINING_CHUNK_SIZE,
+            max_rows=settings.TRAINING_MAX_ROWS or None,
+            label_column=settings.TRAINING_LABEL_COLUMN,
+            sample_rows=settings.TRAINING_SAMPLE_ROWS or None
+        )
+        if settings.TRAINING_LABEL_COLUMN != LABEL_COLUMN:
+            train_data = train_data.rename(columns={settings.TRAINING_LABEL_COLUMN: LABEL_COLUMN})
+        
+        self.training_source = path
+        self._fit(train_data)
+        self.model_metrics['ingestion_peak_rss_mb'] = report['peak_rss_mb']
+    
     def _train_with_simulated_data(self):
         """Entrena modelo con datos simulados"""
         print("Entrenando modelo con datos simulados...")
         
         # Generar datos simulados
-        train_data = self._generate_simulated_data(10000)
+        train_data = self._generate_simulated_data(settings.SIMULATED_TRAINING_SAMPLES)
+        
+        self.training_source = 'simulated'
+        self._fit(train_data)
+    
+    def _fit(self, train_data: "pd.DataFrame"):
+        """Entrena el ensemble sobre un DataFrame de features + columna is_fraud"""
+        from sklearn.ensemble import IsolationForest, RandomForestClassifier
+        from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+        from sklearn.model_selection import train_test_split
+        from sklearn.preprocessing import StandardScaler
+        from ..training.simulated_data import LABEL_COLUMN
         
         # Preparar features y targets
-        feature_columns = [col for col in train_data.columns if col != 'is_fraud']
+        feature_columns = [col for col in train_data.columns if col != LABEL_COLUMN]
         X = train_data[feature_columns]
-        y = train_data['is_fraud']
+        y = train_data[LABEL_COLUMN]
         
         self.feature_names = feature_columns
+        self.feature_encoder = FeatureEncoder(self.feature_names)
         
         # Dividir datos
         X_train, X_test, y_train, y_test = train_test_split(
@@ -127,114 +295,88 @@ class FraudDetector:
             'accuracy': accuracy_score(y_test, y_pred),
             'precision': precision_score(y_test, y_pred),
             'recall': recall_score(y_test, y_pred),
-            'f1_score': f1_score(y_test, y_pred)
+            'f1_score': f1_score(y_test, y_pred),
+            'training_samples': len(train_data)
         }
         
         self.training_date = datetime.now()
         
+        self.compile_ensemble()
+        
+        # Scores del ensemble completo sobre validación, para el drift y para calibrar la cascada
+        X_train_matrix = X_train.to_numpy(dtype=np.float64)
+        X_test_matrix = X_test.to_numpy(dtype=np.float64)
+        validation_scores = self._score_matrix(X_test_matrix, cascade=False)
+        
+        # Perfil de referencia del drift: features de entrenamiento y risk_score sobre validación
+        self.drift_reference = DriftReference.from_data(
+            X_train_matrix,
+            validation_scores['risk_score'],
+            self.feature_names,
+            n_bins=settings.DRIFT_BINS
+        )
+        
+        # Primera etapa de la cascada, sobre las features sin escalar
+        self.cascade = CascadeStage.fit(
+            X_train_matrix, y_train.to_numpy(), X_test_matrix, y_test.to_numpy(), validation_scores,
+            max_depth=settings.CASCADE_MAX_DEPTH,
+            max_recall_loss=settings.CASCADE_MAX_RECALL_LOSS
+        )
+        if not self.cascade.has_exits:
+            print("Cascada sin hojas de salida: la primera etapa no se usará con esta versión")
+        
         print(f"Modelo entrenado - Accuracy: {self.model_metrics['accuracy']:.3f}")
     
-    def _generate_simulated_data(self, n_samples: int) -> pd.DataFrame:
+    def compile_ensemble(self) -> CompiledEnsemble:
+        """Exporta los 200 árboles del ensemble a arreglos planos para inferencia sin sklearn"""
+        self._ensure_estimators()
+        self.compiled_ensemble = CompiledEnsemble.from_estimators(
+            self.scaler, self.random_forest, self.isolation_forest
+        )
+        self.explainer = None
+        return self.compiled_ensemble
+    
+    def get_explainer(self) -> ForestExplainer:
+        """Explicador del Random Forest (lo construye warm_up antes de publicar la versión)"""
+        if self.explainer is None:
+            self.explainer = ForestExplainer(self.compiled_ensemble, self.feature_names)
+        return self.explainer
+    
+    def _generate_simulated_data(self, n_samples: int) -> "pd.DataFrame":
         """Genera datos simulados para entrenamiento"""
-        np.random.seed(42)
-        
-        data = []
-        
-        for _ in range(n_samples):
-            # Generar transacción base
-            transaction = {
-                'amount': np.random.lognormal(10, 2),  # Distribución log-normal para montos
-                'hour': np.random.randint(0, 24),
-                'dayOfWeek': np.random.randint(0, 7),
-                'mcc_high_risk': np.random.choice([0, 1], p=[0.9, 0.1]),
-                'mcc_medium_risk': np.random.choice([0, 1], p=[0.8, 0.2]),
-                'mcc_numeric': np.random.randint(1000, 9999),
-                'country_high_risk': np.random.choice([0, 1], p=[0.95, 0.05]),
-                'country_medium_risk': np.random.choice([0, 1], p=[0.85, 0.15]),
-                'country_domestic': np.random.choice([0, 1], p=[0.3, 0.7]),
-                'bin_high_risk': np.random.choice([0, 1], p=[0.98, 0.02]),
-                'bin_numeric': np.random.randint(100000, 999999),
-                'is_night': 0,
-                'is_business_hours': 0,
-                'is_weekend': 0,
-                'is_friday': 0,
-                'amount_log': 0,
-                'is_high_amount': 0,
-                'is_round_amount': 0,
-            }
-            
-            # Calcular features derivadas
-            transaction['is_night'] = 1 if transaction['hour'] >= 22 or transaction['hour'] <= 6 else 0
-            transaction['is_business_hours'] = 1 if 8 <= transaction['hour'] <= 18 else 0
-            transaction['is_weekend'] = 1 if transaction['dayOfWeek'] in [0, 6] else 0
-            transaction['is_friday'] = 1 if transaction['dayOfWeek'] == 5 else 0
-            transaction['amount_log'] = np.log(transaction['amount'] + 1)
-            transaction['is_high_amount'] = 1 if transaction['amount'] >= 1000000 else 0
-            transaction['is_round_amount'] = 1 if transaction['amount'] % 10000 == 0 else 0
-            
-            # Determinar si es fraude basado en reglas de riesgo
-            fraud_score = 0
-            
-            # Factores de riesgo
-            if transaction['country_high_risk']:
-                fraud_score += 30
-            if transaction['mcc_high_risk']:
-                fraud_score += 25
-            if transaction['is_night']:
-                fraud_score += 15
-            if transaction['is_high_amount']:
-                fraud_score += 20
-            if transaction['bin_high_risk']:
-                fraud_score += 35
-            
-            # Agregar ruido aleatorio
-            fraud_score += np.random.normal(0, 10)
-            
-            # Determinar etiqueta de fraude
-            fraud_probability = 1 / (1 + np.exp(-fraud_score / 20))  # Función sigmoidea
-            transaction['is_fraud'] = 1 if fraud_probability > 0.5 else 0
-            
-            data.append(transaction)
+        from ..training.simulated_data import generate_simulated_data
         
-        return pd.DataFrame(data)
+        return generate_simulated_data(n_samples, seed=42, include_velocity=settings.VELOCITY_ENABLED)
     
-    def predict(self, features: Dict[str, float]) -> Dict[str, Any]:
-        """Realiza predicción de fraude para una transacción"""
-        start_time = time.time()
+    def predict(self, features: Union[Dict[str, float], np.ndarray], timer=NULL_TIMER) -> Dict[str, Any]:
+        """
+        Realiza predicción de fraude para una transacción
+        Acepta un diccionario de features o un vector ya codificado por feature_encoder
+        `timer` (StageTimer) recibe una marca por etapa de la evaluación
+        """
+        start_time = time.perf_counter()
         
         try:
             # Convertir features a array numpy
-            feature_vector = self._prepare_features(features)
-            
-            # Escalar features
-            feature_vector_scaled = self.scaler.transform(feature_vector.reshape(1, -1))
-            
-            # Predicción con Isolation Forest (detección de anomalías)
-            anomaly_score = self.isolation_forest.decision_function(feature_vector_scaled)[0]
-            is_outlier = self.isolation_forest.predict(feature_vector_scaled)[0] == -1
-            
-            # Predicción con Random Forest (clasificación)
-            fraud_probability = self.random_forest.predict_proba(feature_vector_scaled)[0][1]
-            fraud_prediction = self.random_forest.predict(feature_vector_scaled)[0]
-            
-            # Combinar scores
-            risk_score = self._calculate_combined_risk_score(
-                fraud_probability, anomaly_score, is_outlier
-            )
+            if isinstance(features, np.ndarray):
+                feature_vector = features
+            else:
+                feature_vector = self._prepare_features(features)
             
-            # Calcular confianza basada en la consistencia de los modelos
-            confidence = self._calculate_confidence(fraud_probability, is_outlier)
+            scores = self._score_matrix(feature_vector.reshape(1, -1), timer, explain=True)
             
-            processing_time = (time.time() - start_time) * 1000  # ms
+            processing_time = (time.perf_counter() - start_time) * 1000  # ms
             
             result = {
-                'risk_score': float(risk_score),
-                'fraud_probability': float(fraud_probability),
-                'confidence': float(confidence),
+                'risk_score': float(scores['risk_score'][0]),
+                'fraud_probability': float(scores['fraud_probability'][0]),
+                'confidence': float(scores['confidence'][0]),
                 'model_version': self.model_version,
                 'processing_time_ms': float(processing_time),
-                'anomaly_score': float(anomaly_score),
-                'is_outlier': bool(is_outlier)
+                'anomaly_score': float(scores['anomaly_score'][0]),
+                'is_outlier': bool(scores['is_outlier'][0]),
+                'risk_level': str(scores['risk_level'][0]),
+                'decision_reason': scores['decision_reason'][0]
             }
             
             return result
@@ -242,69 +384,279 @@ class FraudDetector:
         except Exception as e:
             raise Exception(f"Error en predicción: {str(e)}")
     
-    def _prepare_features(self, features: Dict[str, float]) -> np.ndarray:
-        """Prepara features para predicción"""
-        feature_vector = []
+    def predict_batch(
+        self, 
+        features_matrix: Union[List[Dict[str, float]], List[np.ndarray], np.ndarray],
+        timer=NULL_TIMER
+    ) -> List[Dict[str, Any]]:
+        """
+        Realiza predicción de fraude para un lote de transacciones
+        Acepta diccionarios de features, vectores codificados o una matriz 2-D en el orden de feature_names
+        """
+        start_time = time.perf_counter()
+        
+        try:
+            if isinstance(features_matrix, np.ndarray):
+                X = np.asarray(features_matrix, dtype=np.float64)
+            elif len(features_matrix) and isinstance(features_matrix[0], np.ndarray):
+                X = np.vstack(features_matrix)
+            else:
+                X = np.array([self._prepare_features(features) for features in features_matrix], dtype=np.float64)
+            
+            if X.ndim != 2 or X.shape[1] != len(self.feature_names):
+                raise ValueError(
+                    f"Se esperaba una matriz (n, {len(self.feature_names)}), se recibió {X.shape}"
+                )
+            
+            scores = self._score_matrix(X, timer, explain=True)
+            
+            # Tiempo amortizado por transacción
+            processing_time = (time.perf_counter() - start_time) * 1000 / max(len(X), 1)  # ms
+            
+            results = [
+                {
+                    'risk_score': float(scores['risk_score'][i]),
+                    'fraud_probability': float(scores['fraud_probability'][i]),
+                    'confidence': float(scores['confidence'][i]),
+                    'model_version': self.model_version,
+                    'processing_time_ms': float(processing_time),
+                    'anomaly_score': float(scores['anomaly_score'][i]),
+                    'is_outlier': bool(scores['is_outlier'][i]),
+                    'risk_level': risk_level,
+                    'decision_reason': decision_reason
+                }
+                for i, (risk_level, decision_reason) in enumerate(
+                    zip(scores['risk_level'].tolist(), scores['decision_reason'])
+                )
+            ]
+            timer.mark("results")
+            
+            return results
+            
+        except Exception as e:
+            raise Exception(f"Error en predicción por lote: {str(e)}")
+    
+    def score_matrix(self, X: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Scores por columna de una matriz ya codificada, sin construir un diccionario por fila (scoring offline)
+        En matrices grandes carga los estimadores de sklearn si están disponibles: su recorrido en Cython es
+        más rápido que el evaluador compilado por bloques
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != len(self.feature_names):
+            raise ValueError(f"Se esperaba una matriz (n, {len(self.feature_names)}), se recibió {X.shape}")
+        
+        if len(X) > settings.COMPILED_TREES_MAX_BATCH:
+            self._ensure_estimators()
+        return self._score_matrix(X)
+    
+    def _score_matrix(
+        self,
+        X: np.ndarray,
+        timer=NULL_TIMER,
+        explain: bool = False,
+        cascade: bool = True
+    ) -> Dict[str, np.ndarray]:
+        """
+        Evalúa el ensemble una sola vez sobre todas las filas de X
+        Con `explain` agrega risk_level y decision_reason a partir de las hojas del Random Forest
+        Con CASCADE_ENABLED (y `cascade`) las filas que la primera etapa resuelve no pasan por el ensemble
+        """
+        if cascade and settings.CASCADE_ENABLED and self.cascade is not None and self.cascade.has_exits:
+            return self._score_cascade(X, timer, explain)
+        
+        use_compiled = (
+            settings.USE_COMPILED_TREES
+            and self.compiled_ensemble is not None
+            and (len(X) <= settings.COMPILED_TREES_MAX_BATCH or self.random_forest is None)
+        )
+        
+        if use_compiled:
+            # Evaluador de arreglos planos, sin el bucle por estimador de sklearn
+            # En lotes grandes el recorrido en Cython de sklearn vuelve a ser más rápido; si sklearn
+            # no está cargado (artefacto mmap) se evalúa en bloques para no deserializarlo
+            # Escalado y ambos bosques se evalúan en un solo recorrido
+            fraud_probabilities, anomaly_scores, rf_leaves = self._score_compiled(X)
+            timer.mark("compiled_ensemble")
+        else:
+            fraud_probabilities, anomaly_scores, rf_leaves = self._score_matrix_sklearn(X, timer, explain)
+        
+        # predict() == -1 equivale a decision_function() < 0, se evita recorrer los árboles dos veces
+        is_outlier = anomaly_scores < 0
+        
+        # Combinar scores
+        risk_scores = self._calculate_combined_risk_score(
+            fraud_probabilities, anomaly_scores, is_outlier
+        )
+        
+        # Calcular confianza basada en la consistencia de los modelos
+        confidences = self._calculate_confidence(fraud_probabilities, is_outlier)
+        timer.mark("combine")
+        
+        scores = {
+            'risk_score': risk_scores,
+            'fraud_probability': fraud_probabilities,
+            'confidence': confidences,
+            'anomaly_score': anomaly_scores,
+            'is_outlier': is_outlier
+        }
         
-        for feature_name in self.feature_names:
-            if feature_name in features:
-                feature_vector.append(features[feature_name])
+        if explain:
+            # Contribuciones precalculadas por hoja: una fila por árbol, sin volver a recorrerlos
+            explainer = self.get_explainer()
+            contributions = explainer.contributions(rf_leaves)
+            scores['risk_level'] = risk_levels(risk_scores)
+            scores['decision_reason'] = explainer.reasons(X, contributions, is_outlier)
+            timer.mark("explain")
+        
+        return scores
+    
+    def _score_cascade(self, X: np.ndarray, timer=NULL_TIMER, explain: bool = False) -> Dict[str, np.ndarray]:
+        """Primera etapa sobre todas las filas y ensemble completo solo para las que no salen temprano"""
+        leaves = self.cascade.apply(X)
+        exits = self.cascade.exits[leaves]
+        timer.mark("cascade")
+        
+        n_exits = int(exits.sum())
+        with self._cascade_lock:
+            self.cascade_rows += len(X)
+            self.cascade_early_exits += n_exits
+        if n_exits == 0:
+            return self._score_matrix(X, timer, explain, cascade=False)
+        
+        scores = self.cascade.scores(leaves)
+        scores['is_outlier'] = scores['anomaly_score'] < 0
+        scores['confidence'] = self._calculate_confidence(scores['fraud_probability'], scores['is_outlier'])
+        if explain:
+            scores['risk_level'] = risk_levels(scores['risk_score'])
+            scores['decision_reason'] = [
+                OUTLIER_REASON if outlier else NO_RISK_REASON for outlier in scores['is_outlier'].tolist()
+            ]
+        if n_exits == len(X):
+            return scores
+        
+        # Las filas ambiguas pasan por el ensemble y reemplazan los scores de la primera etapa
+        rest = np.flatnonzero(~exits)
+        full = self._score_matrix(X[rest], timer, explain, cascade=False)
+        for name, values in full.items():
+            if name == 'decision_reason':
+                for i, reason in zip(rest.tolist(), values):
+                    scores[name][i] = reason
             else:
-                # Valor por defecto si falta el feature
-                feature_vector.append(0.0)
+                scores[name][rest] = values
+        return scores
+    
+    def _score_compiled(self, X: np.ndarray):
+        """
+        Evalúa el ensemble compilado en bloques de COMPILED_TREES_MAX_BATCH filas
+        Retorna (fraud_probability, anomaly_score, hojas del Random Forest)
+        """
+        block_size = max(1, settings.COMPILED_TREES_MAX_BATCH)
+        n_rf_trees = self.compiled_ensemble.n_rf_trees
+        
+        blocks = []
+        for i in range(0, len(X), block_size):
+            leaves = self.compiled_ensemble.apply(X[i:i + block_size])
+            blocks.append((*self.compiled_ensemble.score_leaves(leaves), leaves[:n_rf_trees]))
+        if len(blocks) == 1:
+            return blocks[0]
+        
+        return (
+            np.concatenate([fraud_probabilities for fraud_probabilities, _, _ in blocks]),
+            np.concatenate([anomaly_scores for _, anomaly_scores, _ in blocks]),
+            np.concatenate([leaves for _, _, leaves in blocks], axis=1)
+        )
+    
+    def _score_matrix_sklearn(self, X: np.ndarray, timer=NULL_TIMER, explain: bool = False):
+        """
+        Evalúa el ensemble con los estimadores de sklearn
+        Con `explain` también retorna las hojas del Random Forest en la numeración del ensemble compilado
+        """
+        self._ensure_estimators()
+        
+        # Escalar features
+        X_scaled = self.scaler.transform(X)
+        timer.mark("scale")
+        
+        # Predicción con Isolation Forest (detección de anomalías)
+        anomaly_scores = self.isolation_forest.decision_function(X_scaled)
+        timer.mark("isolation_forest")
+        
+        # Predicción con Random Forest (clasificación)
+        rf_leaves = None
+        if explain:
+            # Las hojas sirven para la explicación y para la probabilidad (mismo valor que predict_proba),
+            # así los árboles se recorren una sola vez
+            forest = self.compiled_ensemble.forest
+            rf_leaves = self.random_forest.apply(X_scaled).T + forest.roots[:len(self.random_forest.estimators_), None]
+            fraud_probabilities = forest.value[rf_leaves].mean(axis=0)
+        else:
+            fraud_probabilities = self.random_forest.predict_proba(X_scaled)[:, 1]
+        timer.mark("random_forest")
         
-        return np.array(feature_vector)
+        return fraud_probabilities, anomaly_scores, rf_leaves
+    
+    def _prepare_features(self, features: Dict[str, float]) -> np.ndarray:
+        """Prepara features para predicción"""
+        
+        # Valor por defecto 0.0 si falta el feature
+        return np.fromiter(
+            (features.get(feature_name, 0.0) for feature_name in self.feature_names),
+            dtype=np.float64,
+            count=len(self.feature_names)
+        )
     
     def _calculate_combined_risk_score(
         self, 
-        fraud_probability: float, 
-        anomaly_score: float, 
-        is_outlier: bool
-    ) -> float:
-        """Calcula score de riesgo combinado"""
+        fraud_probability: Union[float, np.ndarray], 
+        anomaly_score: Union[float, np.ndarray], 
+        is_outlier: Union[bool, np.ndarray]
+    ) -> Union[float, np.ndarray]:
+        """Calcula score de riesgo combinado (escalar o vectorizado)"""
         
         # Score base del Random Forest (0-100)
-        rf_score = fraud_probability * 100
+        rf_score = np.asarray(fraud_probability) * 100
         
         # Bonus por detección de anomalía
-        anomaly_bonus = 20 if is_outlier else 0
+        anomaly_bonus = np.where(is_outlier, 20, 0)
         
         # Penalización/bonus por anomaly score
         # anomaly_score negativo = más anómalo
-        anomaly_adjustment = max(-10, anomaly_score * 10)
+        anomaly_adjustment = np.maximum(-10, np.asarray(anomaly_score) * 10)
         
         final_score = rf_score + anomaly_bonus - anomaly_adjustment
         
         # Limitar entre 0 y 100
-        return max(0, min(100, final_score))
+        return np.clip(final_score, 0, 100)
     
-    def _calculate_confidence(self, fraud_probability: float, is_outlier: bool) -> float:
-        """Calcula confianza de la predicción"""
+    def _calculate_confidence(
+        self, 
+        fraud_probability: Union[float, np.ndarray], 
+        is_outlier: Union[bool, np.ndarray]
+    ) -> Union[float, np.ndarray]:
+        """Calcula confianza de la predicción (escalar o vectorizado)"""
+        
+        fraud_probability = np.asarray(fraud_probability)
+        is_outlier = np.asarray(is_outlier, dtype=bool)
         
         # Confianza basada en qué tan cerca está de los extremos
-        rf_confidence = 2 * abs(fraud_probability - 0.5)  # 0 = indeciso, 1 = muy seguro
+        rf_confidence = 2 * np.abs(fraud_probability - 0.5)  # 0 = indeciso, 1 = muy seguro
         
         # Si ambos modelos coinciden, aumentar confianza
-        both_agree = (fraud_probability > 0.5 and is_outlier) or (fraud_probability <= 0.5 and not is_outlier)
-        agreement_bonus = 0.2 if both_agree else 0
+        both_agree = ((fraud_probability > 0.5) & is_outlier) | ((fraud_probability <= 0.5) & ~is_outlier)
+        agreement_bonus = np.where(both_agree, 0.2, 0)
         
-        final_confidence = min(1.0, rf_confidence + agreement_bonus)
+        final_confidence = np.minimum(1.0, rf_confidence + agreement_bonus)
         
         return final_confidence
     
-    def retrain(self):
-        """Reentrena el modelo con nuevos datos"""
-        print("Reentrenando modelo...")
-        self._train_with_simulated_data()
-        
-        # Actualizar versión
-        version_parts = self.model_version.split('.')
-        version_parts[-1] = str(int(version_parts[-1]) + 1)
-        self.model_version = '.'.join(version_parts)
-        
-        # Guardar modelo actualizado
-        model_path = os.path.join(settings.MODEL_PATH, settings.MODEL_NAME)
-        self._save_model(model_path)
+    def warm_up(self):
+        """Ejecuta predicciones de prueba para inicializar cachés antes de recibir tráfico"""
+        X = np.zeros((2, len(self.feature_names)), dtype=np.float64)
+        self.predict(X[0])
+        self.predict_batch(X)
+        with self._cascade_lock:
+            self.cascade_rows = self.cascade_early_exits = 0
     
     def get_model_info(self) -> Dict[str, Any]:
         """Retorna información del modelo"""
@@ -312,6 +664,9 @@ class FraudDetector:
             'model_name': 'SMAF Fraud Detector',
             'model_version': self.model_version,
             'training_date': self.training_date.isoformat() if self.training_date else None,
+            'training_source': self.training_source,
+            'artifact_format': self.artifact_format,
+            'load_time_ms': self.load_time_ms,
             'model_type': 'Ensemble (Random Forest + Isolation Forest)',
             'feature_count': len(self.feature_names),
             'features': self.feature_names,
@@ -319,6 +674,26 @@ class FraudDetector:
             'thresholds': {
                 'high_risk': settings.HIGH_RISK_THRESHOLD,
                 'medium_risk': settings.MEDIUM_RISK_THRESHOLD
+            },
+            'cascade': self._cascade_info()
+        }
+    
+    def _cascade_info(self) -> Optional[Dict[str, Any]]:
+        """Calibración de la primera etapa (validación) y salidas tempranas desde que se cargó el modelo"""
+        if self.cascade is None:
+            return None
+        
+        with self._cascade_lock:
+            rows, early_exits = self.cascade_rows, self.cascade_early_exits
+        
+        return {
+            # Sin hojas de salida la primera etapa no se evalúa aunque CASCADE_ENABLED esté activo
+            'enabled': settings.CASCADE_ENABLED and self.cascade.has_exits,
+            **self.cascade.report,
+            'live': {
+                'rows': rows,
+                'early_exits': early_exits,
+                'early_exit_rate': early_exits / rows if rows else None
             }
         }
     
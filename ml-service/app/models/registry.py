@@ -0,0 +1,328 @@
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from .fraud_detector import FraudDetector
+from ..config import settings
+from ..metrics import MODEL_LOAD_COUNTER
+
+logger = structlog.get_logger()
+
+ARTIFACT_FILE = "model.joblib"
+# Ensemble compilado en arreglos .npy (se carga con mmap, compartido entre workers)
+COMPILED_DIR = "compiled"
+METADATA_FILE = "metadata.json"
+CURRENT_POINTER = "CURRENT"
+# Versión más alta asignada a un entrenamiento (puede no estar registrada todavía) y su lock
+LAST_ALLOCATED = ".last_version"
+VERSIONS_LOCK = ".versions.lock"
+DEFAULT_VERSION = "1.0.0"
+
+
+class ModelNotFoundError(Exception):
+    """La versión solicitada no existe en el registro"""
+
+
+def _version_key(version: str):
+    """Orden numérico de versiones tipo 1.0.10"""
+    return tuple(int(part) if part.isdigit() else part for part in version.split('.'))
+
+
+def bump_version(version: str) -> str:
+    """Incrementa el último componente de la versión"""
+    version_parts = version.split('.')
+    version_parts[-1] = str(int(version_parts[-1]) + 1)
+    return '.'.join(version_parts)
+
+
+class ModelRegistry:
+    """
+    Registro de modelos versionados e inmutables bajo `MODEL_PATH/registry`
+    La versión activa se publica con un único cambio de referencia, por lo que cada request
+    que lee `active` usa un modelo completo, nunca una mezcla de dos versiones
+    """
+
+    def __init__(self, base_path: Optional[str] = None, max_loaded: Optional[int] = None):
+        self.base_path = base_path or os.path.join(settings.MODEL_PATH, "registry")
+        self.max_loaded = max_loaded or settings.MODEL_REGISTRY_MAX_LOADED
+        os.makedirs(self.base_path, exist_ok=True)
+
+        self._active: Optional[FraudDetector] = None
+        # Versiones cargadas en memoria (LRU) para rollback instantáneo
+        self._loaded: "OrderedDict[str, FraudDetector]" = OrderedDict()
+        # Serializa registro/activación; las lecturas de `active` no toman el lock
+        self._lock = threading.RLock()
+
+    @property
+    def active(self) -> Optional[FraudDetector]:
+        """Detector activo (lectura atómica de la referencia)"""
+        return self._active
+
+    def current_version(self) -> Optional[str]:
+        """Versión indicada por el puntero CURRENT (la que activan los workers al arrancar)"""
+        return self._read_pointer()
+
+    def version_path(self, version: str) -> str:
+        return os.path.join(self.base_path, version)
+
+    def artifact_path(self, version: str) -> str:
+        return os.path.join(self.version_path(version), ARTIFACT_FILE)
+
+    def compiled_path(self, version: str) -> str:
+        return os.path.join(self.version_path(version), COMPILED_DIR)
+
+    def list_versions(self) -> List[Dict[str, Any]]:
+        """Versiones registradas con su metadata, de la más antigua a la más reciente"""
+        active_version = self._active.model_version if self._active else None
+        versions = []
+
+        for version in sorted(self._registered_versions(), key=_version_key):
+            metadata_path = os.path.join(self.version_path(version), METADATA_FILE)
+            try:
+                with open(metadata_path, encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError):
+                metadata = {}
+
+            versions.append({
+                **metadata,
+                "model_version": version,
+                "active": version == active_version,
+                "loaded": version in self._loaded,
+            })
+
+        return versions
+
+    def next_version(self) -> str:
+        """Siguiente versión libre a partir de la más alta registrada"""
+        versions = self._registered_versions()
+        if not versions:
+            return DEFAULT_VERSION
+        return bump_version(max(versions, key=_version_key))
+
+    @contextlib.contextmanager
+    def versions_lock(self):
+        """
+        flock exclusivo (bloqueante) del registro con el que se asignan versiones
+        Lo comparten todos los workers; dentro de él hay que llamar allocate_version(locked=True)
+        """
+        with open(os.path.join(self.base_path, VERSIONS_LOCK), "w") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def allocate_version(self, locked: bool = False) -> str:
+        """
+        Reserva la versión de un entrenamiento nuevo, única entre los workers que comparten el registro
+        Se calcula bajo versions_lock() e incluye las versiones asignadas a jobs que todavía no terminaron;
+        la versión de un job fallido no se reutiliza. `locked=True` si el llamador ya tiene el lock
+        """
+        if not locked:
+            with self.versions_lock():
+                return self.allocate_version(locked=True)
+
+        versions = self._registered_versions()
+        last_allocated = self._read_file(LAST_ALLOCATED)
+        if last_allocated:
+            versions.append(last_allocated)
+        version = bump_version(max(versions, key=_version_key)) if versions else DEFAULT_VERSION
+        self._write_file(LAST_ALLOCATED, version)
+        return version
+
+    def register(self, detector: FraudDetector, artifact_path: Optional[str] = None) -> str:
+        """
+        Guarda el detector como artefacto inmutable de su versión
+        Se escribe en un directorio temporal y se renombra, así nunca queda un artefacto a medias
+        Si `artifact_path` apunta a un artefacto ya serializado (p. ej. de un job), se mueve en lugar de reescribirlo
+        """
+        version = detector.model_version
+
+        with self._lock:
+            if os.path.exists(self.version_path(version)):
+                raise ValueError(f"La versión {version} ya existe en el registro")
+
+            tmp_path = os.path.join(self.base_path, f".tmp-{version}-{os.getpid()}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            try:
+                if artifact_path is not None:
+                    shutil.move(artifact_path, os.path.join(tmp_path, ARTIFACT_FILE))
+                else:
+                    detector.save(os.path.join(tmp_path, ARTIFACT_FILE))
+                detector.save_compiled(os.path.join(tmp_path, COMPILED_DIR))
+                with open(os.path.join(tmp_path, METADATA_FILE), "w", encoding="utf-8") as f:
+                    json.dump({
+                        "model_version": version,
+                        "training_date": detector.training_date.isoformat() if detector.training_date else None,
+                        "metrics": detector.model_metrics,
+                        "registered_at": time.time(),
+                    }, f)
+                os.rename(tmp_path, self.version_path(version))
+            except Exception:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+                raise
+
+            self._remember(detector)
+
+        logger.info("Modelo registrado", model_version=version)
+        return self.version_path(version)
+
+    def load(self, version: str) -> FraudDetector:
+        """Retorna la versión desde memoria o la carga del disco"""
+        with self._lock:
+            if version in self._loaded:
+                self._loaded.move_to_end(version)
+                return self._loaded[version]
+
+            if not os.path.exists(self.artifact_path(version)):
+                raise ModelNotFoundError(f"La versión {version} no existe en el registro")
+
+            if os.path.exists(self.compiled_path(version)):
+                detector = FraudDetector.from_compiled(
+                    self.compiled_path(version), estimators_path=self.artifact_path(version)
+                )
+            else:
+                # Versiones registradas antes del formato compilado
+                detector = FraudDetector.from_artifact(self.artifact_path(version))
+            detector.model_version = version
+            logger.info(
+                "Modelo cargado",
+                model_version=version,
+                artifact_format=detector.artifact_format,
+                load_time_ms=round(detector.load_time_ms, 2)
+            )
+            self._remember(detector)
+            return detector
+
+    def activate(self, version: str, write_pointer: bool = True) -> FraudDetector:
+        """Carga, precalienta y publica una versión registrada (también sirve para rollback)"""
+        with self._lock:
+            detector = self.load(version)
+            detector.warm_up()
+
+            # Publicación atómica: a partir de aquí los nuevos requests usan esta versión
+            self._active = detector
+            if write_pointer:
+                self._write_pointer(version)
+            MODEL_LOAD_COUNTER.inc()
+
+        logger.info("Modelo activado", model_version=version)
+        return detector
+
+    def sync_with_pointer(self) -> bool:
+        """
+        Activa la versión del puntero CURRENT si otro proceso la cambió (modo multi-worker)
+        Retorna True si cambió el modelo activo
+        """
+        current = self._read_pointer()
+        active_version = self._active.model_version if self._active else None
+        if current is None or current == active_version:
+            return False
+
+        self.activate(current, write_pointer=False)
+        logger.info("Modelo sincronizado con el puntero CURRENT", model_version=current, pid=os.getpid())
+        return True
+
+    def publish(self, detector: FraudDetector) -> FraudDetector:
+        """Registra un detector nuevo y lo activa"""
+        with self._lock:
+            self.register(detector)
+            return self.activate(detector.model_version)
+
+    def publish_artifact(self, artifact_path: str, activate: bool = True) -> FraudDetector:
+        """
+        Carga un artefacto producido fuera del proceso (job de entrenamiento), lo registra y lo activa
+        Con `activate=False` solo se registra (candidato a evaluar en shadow antes de activarlo)
+        """
+        detector = FraudDetector.from_artifact(artifact_path)
+        with self._lock:
+            self.register(detector, artifact_path=artifact_path)
+            if not activate:
+                return detector
+            return self.activate(detector.model_version)
+
+    @property
+    def staging_path(self) -> str:
+        """Directorio donde los jobs escriben artefactos antes de registrarlos"""
+        return os.path.join(self.base_path, ".staging")
+
+    def train_and_publish(self) -> FraudDetector:
+        """Entrena un modelo nuevo fuera del detector activo y lo publica"""
+        detector = FraudDetector.train_new(self.allocate_version())
+        return self.publish(detector)
+
+    def bootstrap(self) -> Optional[FraudDetector]:
+        """
+        Activa el modelo al iniciar el servicio
+        Orden: versión del puntero CURRENT, artefacto legado MODEL_NAME
+        No entrena: sin modelo retorna None y el servicio arranca sin estar listo (/health/ready
+        responde 503) hasta que un job publique la primera versión
+        """
+        current = self._read_pointer()
+        if current:
+            try:
+                return self.activate(current)
+            except Exception as e:
+                logger.error("Error activando la versión actual", model_version=current, error=str(e))
+
+        legacy_path = os.path.join(settings.MODEL_PATH, settings.MODEL_NAME)
+        if os.path.exists(legacy_path):
+            try:
+                detector = FraudDetector.from_artifact(legacy_path)
+                if os.path.exists(self.version_path(detector.model_version)):
+                    return self.activate(detector.model_version)
+                return self.publish(detector)
+            except Exception as e:
+                logger.error("Error importando el modelo legado", path=legacy_path, error=str(e))
+
+        return None
+
+    def _registered_versions(self) -> List[str]:
+        return [
+            name for name in os.listdir(self.base_path)
+            if not name.startswith(".") and os.path.isdir(os.path.join(self.base_path, name))
+        ]
+
+    def _remember(self, detector: FraudDetector):
+        """Mantiene a lo sumo `max_loaded` versiones en memoria, nunca descarta la activa"""
+        self._loaded[detector.model_version] = detector
+        self._loaded.move_to_end(detector.model_version)
+
+        while len(self._loaded) > self.max_loaded:
+            for version, loaded in self._loaded.items():
+                if loaded is not self._active:
+                    del self._loaded[version]
+                    break
+            else:
+                break
+
+    def _read_pointer(self) -> Optional[str]:
+        return self._read_file(CURRENT_POINTER)
+
+    def _write_pointer(self, version: str):
+        self._write_file(CURRENT_POINTER, version)
+
+    def _read_file(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.base_path, name), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _write_file(self, name: str, value: str):
+        """Escribe un archivo del registro de forma atómica (archivo temporal + os.replace)"""
+        path = os.path.join(self.base_path, name)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(value)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
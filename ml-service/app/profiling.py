@@ -0,0 +1,278 @@
+"""
+Profiling del camino de /predict dentro del worker, sin adjuntar un profiler al contenedor
+
+Se controla con /debug/profile. Hay una sesión bajo demanda a la vez:
+
+- `cprofile`: cProfile durante los próximos N requests a /predict y /predict/batch, desde que
+  entran al middleware de logging hasta que registran su log. Se exporta en pstats (snakeviz,
+  gprof2dot o flameprof lo convierten en flame graph) o como texto ordenado.
+- `sampling`: un hilo toma cada `interval_ms` la pila del event loop (o de todos los hilos) con
+  sys._current_frames y cuenta pilas colapsadas ("a;b;c N"), la entrada de flamegraph.pl y
+  speedscope. No instrumenta llamadas: su costo depende del intervalo y no del tráfico.
+
+Con PROFILING_SAMPLE_EVERY=K, además, 1 de cada K requests perfilables corre con cProfile y se
+acumula en un profile continuo; se pausa mientras hay una sesión cprofile.
+
+cProfile mide el hilo del event loop mientras algún request perfilado está en vuelo, así que
+incluye los pasos de otros requests que se intercalan: es el tráfico real del worker. El scoring
+del micro-batcher corre en un executor y queda fuera; el muestreo de todos los hilos lo cubre.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Union
+
+# Rutas perfilables
+PROFILED_ROUTES = frozenset({"/predict", "/predict/batch"})
+
+CPROFILE = "cprofile"
+SAMPLING = "sampling"
+PROFILE_MODES = (CPROFILE, SAMPLING)
+
+# Formatos de resultado por modo; el primero es el de por defecto
+PROFILE_FORMATS = {CPROFILE: ("text", "pstats"), SAMPLING: ("collapsed",)}
+
+# Orden y filas del resultado en texto
+TEXT_SORT = "cumulative"
+TEXT_LIMIT = 60
+
+
+class RequestProfile:
+    """
+    cProfile acumulado de requests perfilados; está habilitado mientras haya alguno en vuelo
+    `limit` acota los requests medidos (None = sin tope)
+    """
+
+    mode = CPROFILE
+
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.requests = 0
+        self.active = 0
+        self.started_at = time.time()
+        self._profile = cProfile.Profile()
+
+    @property
+    def full(self) -> bool:
+        return self.limit is not None and self.requests >= self.limit
+
+    @property
+    def running(self) -> bool:
+        return not self.full or self.active > 0
+
+    def enter(self):
+        self.requests += 1
+        self.active += 1
+        if self.active == 1:
+            self._profile.enable()
+
+    def leave(self):
+        self.active -= 1
+        if self.active == 0:
+            self._profile.disable()
+
+    def reset(self):
+        """Descarta lo medido; los requests en vuelo siguen sobre el profile nuevo"""
+        if self.active:
+            self._profile.disable()
+        self._profile = cProfile.Profile()
+        self.requests = self.active
+        self.started_at = time.time()
+        if self.active:
+            self._profile.enable()
+
+    def stats(self, stream=None) -> pstats.Stats:
+        # create_stats deshabilita el profiler: se vuelve a habilitar si hay requests en vuelo
+        stats = pstats.Stats(self._profile, stream=stream)
+        if self.active:
+            self._profile.enable()
+        return stats
+
+    def result(self, output_format: str) -> bytes:
+        if output_format == "pstats":
+            # Mismo contenido que Stats.dump_stats: se abre con pstats.Stats(<archivo>)
+            return marshal.dumps(self.stats().stats)
+        stream = io.StringIO()
+        self.stats(stream).sort_stats(TEXT_SORT).print_stats(TEXT_LIMIT)
+        return stream.getvalue().encode()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'running': self.running,
+            'requests': self.requests,
+            'limit': self.limit,
+            'started_at': self.started_at,
+        }
+
+
+class StackSampler:
+    """Pilas colapsadas de un hilo (o de todos) tomadas cada `interval` segundos durante `duration`"""
+
+    mode = SAMPLING
+
+    def __init__(self, duration: float, interval: float, thread_id: Optional[int] = None):
+        self.duration = duration
+        self.interval = interval
+        # None = todos los hilos, con el nombre del hilo como raíz de cada pila
+        self.thread_id = thread_id
+        self.samples = 0
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        # Etiqueta por objeto de código: cada función se formatea una sola vez
+        self._labels: Dict[Any, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame) -> str:
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ";".join(labels)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        thread_names: Dict[int, str] = {}
+        deadline = time.perf_counter() + self.duration
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames.get(self.thread_id)}
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == own_id or frame is None:
+                    continue
+                stack = self._stack(frame)
+                if self.thread_id is None:
+                    if ident not in thread_names:
+                        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                        thread_names.setdefault(ident, str(ident))
+                    stack = f"{thread_names[ident]};{stack}"
+                stacks.append(stack)
+            del frames
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+        self.finished_at = time.time()
+
+    def result(self, output_format: str) -> bytes:
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in stacks).encode()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'running': self.running,
+            'samples': self.samples,
+            'interval_ms': self.interval * 1000,
+            'duration_seconds': self.duration,
+            'all_threads': self.thread_id is None,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+ProfileSession = Union[RequestProfile, StackSampler]
+
+
+class RequestProfiler:
+    """
+    Sesión bajo demanda y profile continuo de 1 de cada `sample_every` requests del worker
+    begin/end corren en el event loop (un solo hilo): el contador no necesita lock
+    """
+
+    def __init__(self, sample_every: int = 0):
+        self.sample_every = sample_every
+        self.session: Optional[ProfileSession] = None
+        self.continuous = RequestProfile() if sample_every > 0 else None
+        self._until_sample = sample_every
+
+    def begin(self) -> Optional[RequestProfile]:
+        """Desde el middleware al entrar un request perfilable: el profile que lo mide, o None"""
+        session = self.session
+        if session is not None and session.mode == CPROFILE and session.running:
+            # Un solo cProfile habilitado a la vez: la sesión empieza cuando el continuo no tiene requests
+            if session.full or (self.continuous is not None and self.continuous.active):
+                return None
+            session.enter()
+            return session
+
+        if self.continuous is None:
+            return None
+        self._until_sample -= 1
+        if self._until_sample > 0:
+            return None
+        self._until_sample = self.sample_every
+        self.continuous.enter()
+        return self.continuous
+
+    def end(self, profile: RequestProfile):
+        profile.leave()
+
+    def start(
+        self,
+        mode: str,
+        requests: int = 100,
+        seconds: float = 10.0,
+        interval_ms: float = 5.0,
+        all_threads: bool = False
+    ) -> ProfileSession:
+        """Inicia una sesión; la anterior, si terminó, se descarta"""
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Modo de profiling debe ser uno de {PROFILE_MODES}, se recibió '{mode}'")
+        if self.session is not None and self.session.running:
+            raise RuntimeError("Ya hay una sesión de profiling en curso")
+
+        if mode == CPROFILE:
+            self.session = RequestProfile(limit=requests)
+        else:
+            # Se llama desde el event loop: sin all_threads se muestrea el hilo que atiende los requests
+            thread_id = None if all_threads else threading.get_ident()
+            self.session = StackSampler(seconds, interval_ms / 1000, thread_id)
+            self.session.start()
+        return self.session
+
+    def stop(self):
+        """Descarta la sesión (la detiene si está en curso) y reinicia el profile continuo"""
+        session = self.session
+        self.session = None
+        if session is not None and session.mode == SAMPLING:
+            session.stop()
+        if self.continuous is not None:
+            self.continuous.reset()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'pid': os.getpid(),
+            'session': self.session.status() if self.session is not None else None,
+            'continuous': self.continuous.status() if self.continuous is not None else None,
+            'sample_every': self.sample_every,
+        }
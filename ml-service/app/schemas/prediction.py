@@ -1,7 +1,17 @@
-from typing import Dict, List, Optional
+import math
+from typing import Dict, List, Optional, Sequence
 from pydantic import BaseModel, Field, validator
 import re
 
+from ..config import settings
+from ..features.encoder import (
+    DOMESTIC_COUNTRY,
+    HIGH_AMOUNT,
+    ROUND_AMOUNT,
+)
+from ..features.risk_tables import get_risk_tables
+from ..features.velocity import VELOCITY_FEATURES
+
 class PredictionRequest(BaseModel):
     """Esquema para solicitud de predicción de fraude"""
     
@@ -16,6 +26,7 @@ class PredictionRequest(BaseModel):
     ipAddress: Optional[str] = Field(None, description="Dirección IP del cliente")
     userAgent: Optional[str] = Field(None, description="User Agent del navegador")
     deviceFingerprint: Optional[str] = Field(None, description="Huella digital del dispositivo")
+    cardHash: Optional[str] = Field(None, max_length=128, description="Hash de la tarjeta (nunca el PAN), para velocity features")
     
     @validator('merchantCategoryCode')
     def validate_mcc(cls, v):
@@ -36,8 +47,12 @@ class PredictionRequest(BaseModel):
             raise ValueError('Código de país debe ser 2 o 3 letras')
         return v
     
-    def to_features(self) -> Dict[str, float]:
-        """Convierte el request a features para el modelo ML"""
+    def to_features(self, velocity: Optional[Sequence[float]] = None) -> Dict[str, float]:
+        """
+        Convierte el request a features para el modelo ML
+        El camino de inferencia usa FeatureEncoder, que escribe directo en el vector del modelo
+        `velocity` son las features del VelocityStore en el orden de VELOCITY_FEATURES
+        """
         
         # Features básicas numéricas
         features = {
@@ -55,42 +70,39 @@ class PredictionRequest(BaseModel):
         features.update(self._derive_time_features())
         features.update(self._derive_amount_features())
         
+        if velocity is not None:
+            features.update(zip(VELOCITY_FEATURES, velocity))
+        
         return features
     
     def _encode_mcc(self, mcc: str) -> Dict[str, float]:
-        """Codifica el MCC en features categóricas"""
-        
-        # Categorías de riesgo basadas en MCC
-        high_risk_mccs = ['7995', '7801', '6010', '6011']  # Casinos, ATM, etc.
-        medium_risk_mccs = ['5411', '5541', '5542']  # Gasolineras, etc.
+        """Codifica el MCC en features categóricas (nivel de riesgo desde las tablas de riesgo)"""
         
+        mcc_numeric = int(mcc)
+        tier = get_risk_tables().mcc_tiers_bytes[mcc_numeric]
         return {
-            'mcc_high_risk': 1.0 if mcc in high_risk_mccs else 0.0,
-            'mcc_medium_risk': 1.0 if mcc in medium_risk_mccs else 0.0,
-            'mcc_numeric': float(int(mcc)),
+            'mcc_high_risk': 1.0 if tier == 2 else 0.0,
+            'mcc_medium_risk': 1.0 if tier == 1 else 0.0,
+            'mcc_numeric': float(mcc_numeric),
         }
     
     def _encode_country(self, country: str) -> Dict[str, float]:
         """Codifica el país en features de riesgo"""
         
-        high_risk_countries = ['VE', 'CU', 'IR', 'KP', 'SY']
-        medium_risk_countries = ['BR', 'AR', 'PE', 'EC']
-        
+        tier = get_risk_tables().country_tiers.get(country, 0)
         return {
-            'country_high_risk': 1.0 if country in high_risk_countries else 0.0,
-            'country_medium_risk': 1.0 if country in medium_risk_countries else 0.0,
-            'country_domestic': 1.0 if country == 'CO' else 0.0,
+            'country_high_risk': 1.0 if tier == 2 else 0.0,
+            'country_medium_risk': 1.0 if tier == 1 else 0.0,
+            'country_domestic': 1.0 if country == DOMESTIC_COUNTRY else 0.0,
         }
     
     def _encode_bin(self, bin_code: str) -> Dict[str, float]:
         """Codifica el BIN en features"""
         
-        # Simular clasificación de BINs (en producción viene de BD)
-        high_risk_bins = ['123456', '654321']
-        
+        bin_numeric = int(bin_code)
         return {
-            'bin_high_risk': 1.0 if bin_code in high_risk_bins else 0.0,
-            'bin_numeric': float(int(bin_code)),
+            'bin_high_risk': 1.0 if get_risk_tables().bin_tiers_bytes[bin_numeric] == 2 else 0.0,
+            'bin_numeric': float(bin_numeric),
         }
     
     def _derive_time_features(self) -> Dict[str, float]:
@@ -107,9 +119,9 @@ class PredictionRequest(BaseModel):
         """Deriva features basadas en el monto"""
         
         return {
-            'amount_log': float(self.amount).bit_length(),  # Log aproximado
-            'is_high_amount': 1.0 if self.amount >= 1000000 else 0.0,  # 1M COP
-            'is_round_amount': 1.0 if self.amount % 10000 == 0 else 0.0,  # Múltiplo de 10K
+            'amount_log': math.log(self.amount + 1),  # Mismo cálculo que en entrenamiento
+            'is_high_amount': 1.0 if self.amount >= HIGH_AMOUNT else 0.0,
+            'is_round_amount': 1.0 if self.amount % ROUND_AMOUNT == 0 else 0.0,
         }
 
 class PredictionResponse(BaseModel):
@@ -125,6 +137,7 @@ class PredictionResponse(BaseModel):
     # Información adicional del análisis
     risk_level: str = Field(..., description="Nivel de riesgo: low, medium, high")
     decision_reason: str = Field(..., description="Razón principal de la decisión")
+    fallback: bool = Field(False, description="Score de reglas por saturación del servicio (sin evaluar el modelo)")
     
     class Config:
         schema_extra = {
@@ -136,10 +149,47 @@ class PredictionResponse(BaseModel):
                 "features_used": ["amount", "mcc_high_risk", "country_high_risk"],
                 "processing_time_ms": 12.5,
                 "risk_level": "high",
-                "decision_reason": "Alto monto + MCC de riesgo + País sospechoso"
+                "decision_reason": "Monto alto + MCC de alto riesgo + País de alto riesgo",
+                "fallback": False
             }
         }
 
+class BatchTooLargeError(Exception):
+    """El lote supera MAX_BATCH_SIZE; no es un ValueError para que pydantic no lo convierta en 422"""
+
+
+class BatchPredictionRequest(BaseModel):
+    """Esquema para solicitud de predicción de fraude por lote"""
+    
+    transactions: List[PredictionRequest] = Field(..., min_length=1, description="Transacciones a evaluar")
+    
+    @validator('transactions', pre=True)
+    def validate_batch_size(cls, v):
+        # Antes de validar cada transacción: un lote excedido no cuesta su validación completa
+        if isinstance(v, list) and len(v) > settings.MAX_BATCH_SIZE:
+            raise BatchTooLargeError(f"El lote excede el máximo permitido ({settings.MAX_BATCH_SIZE} transacciones)")
+        return v
+
+class BatchPredictionItem(BaseModel):
+    """Resultado de predicción para una transacción del lote"""
+    
+    risk_score: float = Field(..., ge=0, le=100, description="Score de riesgo (0-100)")
+    fraud_probability: float = Field(..., ge=0, le=1, description="Probabilidad de fraude (0-1)")
+    confidence: float = Field(..., ge=0, le=1, description="Confianza del modelo (0-1)")
+    anomaly_score: float = Field(..., description="Score de anomalía del Isolation Forest")
+    is_outlier: bool = Field(..., description="Si el Isolation Forest considera la transacción anómala")
+    risk_level: str = Field(..., description="Nivel de riesgo: low, medium, high")
+    decision_reason: str = Field(..., description="Razón principal de la decisión")
+
+class BatchPredictionResponse(BaseModel):
+    """Esquema para respuesta de predicción de fraude por lote"""
+    
+    predictions: List[BatchPredictionItem] = Field(..., description="Resultados en el mismo orden de la solicitud")
+    model_version: str = Field(..., description="Versión del modelo utilizado")
+    features_used: List[str] = Field(..., description="Lista de features utilizadas")
+    batch_size: int = Field(..., description="Número de transacciones evaluadas")
+    processing_time_ms: float = Field(..., description="Tiempo total de procesamiento en milisegundos")
+
 class ModelInfo(BaseModel):
     """Información sobre el modelo ML"""
     
@@ -0,0 +1,61 @@
+"""
+Arranque del servicio con uno o varios workers de uvicorn
+
+Con WORKERS > 1 el proceso padre prepara el modelo una sola vez (importa el artefacto legado y
+escribe el ensemble compilado en el registro) antes de lanzar los workers; cada worker solo mapea
+en memoria esa versión, sin deserializar sklearn. Nadie entrena durante el arranque: si el registro
+está vacío los workers arrancan sin estar listos y uno de ellos entrena el primer modelo en segundo
+plano (BOOTSTRAP_TRAINING). Las métricas de Prometheus
+se agregan entre workers con el modo multiproceso de prometheus_client.
+
+Uso (desde ml-service/):
+    python -m app.server
+"""
+import os
+import shutil
+
+import uvicorn
+
+from .config import settings
+
+
+def _prepare_multiprocess_metrics():
+    """
+    Directorio compartido de métricas; debe existir y estar vacío antes de importar prometheus_client
+    en los workers (que lo heredan por la variable de entorno)
+    """
+    shutil.rmtree(settings.PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+    os.makedirs(settings.PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = settings.PROMETHEUS_MULTIPROC_DIR
+
+
+def _prepare_model():
+    """Deja publicada la versión activa en el registro para que los workers solo la carguen"""
+    from .models.registry import ModelRegistry
+
+    detector = ModelRegistry().bootstrap()
+    if detector is None:
+        print(f"Sin modelo publicado: los {settings.WORKERS} workers arrancan sin estar listos")
+        return
+    print(f"Modelo {detector.model_version} listo para {settings.WORKERS} workers")
+
+
+def main():
+    workers = max(1, settings.WORKERS)
+
+    if workers > 1:
+        _prepare_multiprocess_metrics()
+        _prepare_model()
+
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=settings.PORT,
+        log_level=settings.LOG_LEVEL.lower(),
+        reload=settings.DEBUG and workers == 1,
+        workers=workers
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# Services module
+
+
+
+
@@ -0,0 +1,183 @@
+"""
+Control de admisión de /predict y /predict/batch: requests en vuelo y deadline del caller
+
+El caller indica en ADMISSION_DEADLINE_HEADER cuántos ms va a esperar la respuesta (sin header se usa
+ADMISSION_DEFAULT_TIMEOUT_MS; 0 = sin deadline). El plazo corre desde que el request entra al
+middleware, así que incluye la espera en el event loop.
+
+Al llegar, un request se admite al modelo si hay menos de ADMISSION_MAX_IN_FLIGHT requests admitidos
+en vuelo en el worker; si no, queda marcado como excedente. Antes de evaluar el modelo:
+
+- Si el deadline ya venció, el caller abandonó el request: se descarta (504) sin evaluar.
+- Si el request es excedente, o lo que queda del plazo no alcanza para el tiempo de scoring
+  estimado, el servicio está saturado: /predict responde el score de reglas (marcado `fallback`)
+  con ADMISSION_OVERLOAD_MODE=fallback, o 503 con reject. En /predict/batch siempre es 503.
+
+El límite cuenta solo los admitidos: los excedentes en la cola no impiden que las llegadas
+siguientes usen el modelo en cuanto se libera un lugar.
+
+Un request descartado o de respaldo cuesta el parseo del body y unas pocas búsquedas en las tablas
+de riesgo, así la cola se vacía en lugar de crecer con trabajo que el caller ya no espera.
+"""
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ..features.encoder import FeatureEncoder
+from ..metrics import ADMISSION_FALLBACK, ADMISSION_SHED
+from ..models.explainer import NO_RISK_REASON, risk_levels
+
+# Rutas con control de admisión
+ADMISSION_ROUTES = frozenset({"/predict", "/predict/batch"})
+
+# Decisiones antes de evaluar el modelo
+ADMIT = "admit"
+FALLBACK = "fallback"
+SHED = "shed"
+EXPIRED = "expired"
+
+OVERLOAD_MODES = (FALLBACK, "reject")
+
+# Suavizado del promedio móvil del tiempo de scoring de /predict
+SCORING_TIME_SMOOTHING = 0.05
+
+# Score de reglas: pesos de los indicadores de riesgo (los del fraud_score del simulador), con tope 100
+FALLBACK_WEIGHTS = {'mcc_high_risk': 25.0, 'country_high_risk': 30.0, 'bin_high_risk': 35.0, 'is_night': 15.0}
+FALLBACK_MODEL_VERSION = "fallback-rules"
+FALLBACK_REASON_PREFIX = "Score de reglas por saturación"
+_FALLBACK_PHRASES = {
+    'mcc_high_risk': "MCC de alto riesgo",
+    'country_high_risk': "País de alto riesgo",
+    'bin_high_risk': "BIN de alto riesgo",
+    'is_night': "Horario nocturno",
+}
+# Codifica solo los indicadores, con las mismas tablas de riesgo que el modelo
+_fallback_encoder = FeatureEncoder(tuple(FALLBACK_WEIGHTS))
+_fallback_weights = np.array(list(FALLBACK_WEIGHTS.values()))
+
+
+def fallback_prediction(transaction: Any) -> Dict[str, Any]:
+    """Score de reglas de una transacción, sin el modelo; confidence 0 porque no hay modelo detrás"""
+    start_time = perf_counter()
+    flags = _fallback_encoder.encode_row(transaction)
+    risk_score = min(float(flags @ _fallback_weights), 100.0)
+    factors = [_FALLBACK_PHRASES[name] for name, flag in zip(FALLBACK_WEIGHTS, flags) if flag]
+    return {
+        'risk_score': risk_score,
+        'fraud_probability': risk_score / 100,
+        'confidence': 0.0,
+        'model_version': FALLBACK_MODEL_VERSION,
+        'risk_level': str(risk_levels(np.array([risk_score]))[0]),
+        'decision_reason': f"{FALLBACK_REASON_PREFIX}: {' + '.join(factors) if factors else NO_RISK_REASON}",
+        'processing_time_ms': (perf_counter() - start_time) * 1000,
+    }
+
+
+class AdmissionTicket:
+    """Llegada, deadline (reloj monotónico) y admisión al modelo de un request en vuelo"""
+
+    __slots__ = ("arrival", "deadline", "admitted")
+
+    def __init__(self, arrival: float, deadline: Optional[float], admitted: bool):
+        self.arrival = arrival
+        self.deadline = deadline
+        self.admitted = admitted
+
+
+_current_ticket: ContextVar = ContextVar("admission_ticket", default=None)
+
+
+class AdmissionController:
+    """
+    Cuenta los requests en vuelo del worker y decide, antes del scoring, si se evalúa el modelo
+    Corre en el event loop (un solo hilo): los contadores no necesitan lock
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 64,
+        deadline_header: str = "X-Request-Timeout-Ms",
+        default_timeout_ms: float = 0.0,
+        min_remaining_ms: float = 5.0,
+        overload_mode: str = FALLBACK
+    ):
+        if overload_mode not in OVERLOAD_MODES:
+            raise ValueError(f"ADMISSION_OVERLOAD_MODE debe ser uno de {OVERLOAD_MODES}, se recibió '{overload_mode}'")
+        # 0 = sin límite de requests admitidos en vuelo
+        self.max_in_flight = max_in_flight
+        self.deadline_header = deadline_header.lower().encode("latin-1")
+        self.default_timeout = default_timeout_ms / 1000
+        self.min_remaining = min_remaining_ms / 1000
+        self.overload_mode = overload_mode
+        # Requests en vuelo y, de ellos, los admitidos al modelo
+        self.in_flight = 0
+        self.admitted = 0
+        # Promedio móvil del tiempo de scoring de /predict; lo que debe quedar del plazo para admitir
+        self.scoring_time = 0.0
+
+    def enter(self, scope: Dict[str, Any], arrival: float) -> AdmissionTicket:
+        """Registra un request en vuelo (desde el middleware) con el deadline de su header"""
+        timeout = self.default_timeout
+        for name, value in scope["headers"]:
+            if name == self.deadline_header:
+                try:
+                    timeout = float(value) / 1000
+                except ValueError:
+                    pass
+                break
+
+        admitted = not self.max_in_flight or self.admitted < self.max_in_flight
+        ticket = AdmissionTicket(arrival, arrival + timeout if timeout > 0 else None, admitted)
+        self.in_flight += 1
+        self.admitted += admitted
+        _current_ticket.set(ticket)
+        return ticket
+
+    def leave(self, ticket: AdmissionTicket):
+        self.in_flight -= 1
+        self.admitted -= ticket.admitted
+
+    def decide(self, route: str, fallback: bool = False) -> str:
+        """
+        ADMIT, FALLBACK (score de reglas), SHED (503) o EXPIRED (504) para el request actual
+        `fallback` indica si la ruta puede responder con el score de reglas
+        """
+        ticket = _current_ticket.get()
+        if ticket is None:
+            return ADMIT
+
+        reason = None if ticket.admitted else "in_flight"
+        if ticket.deadline is not None:
+            remaining = ticket.deadline - perf_counter()
+            if remaining <= 0:
+                ADMISSION_SHED.labels(route=route, reason=EXPIRED).inc()
+                return EXPIRED
+            # El estimado es de una fila: para un lote es una cota inferior
+            if reason is None and remaining < max(self.min_remaining, self.scoring_time):
+                reason = "deadline"
+        if reason is None:
+            return ADMIT
+
+        if fallback and self.overload_mode == FALLBACK:
+            ADMISSION_FALLBACK.labels(reason=reason).inc()
+            return FALLBACK
+        ADMISSION_SHED.labels(route=route, reason=reason).inc()
+        return SHED
+
+    def observe_scoring(self, seconds: float):
+        """Actualiza el tiempo de scoring estimado con un /predict admitido"""
+        if self.scoring_time == 0.0:
+            self.scoring_time = seconds
+        else:
+            self.scoring_time += SCORING_TIME_SMOOTHING * (seconds - self.scoring_time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'in_flight': self.in_flight,
+            'admitted': self.admitted,
+            'max_in_flight': self.max_in_flight,
+            'overload_mode': self.overload_mode,
+            'scoring_time_ms': self.scoring_time * 1000,
+        }
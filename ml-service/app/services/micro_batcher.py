@@ -0,0 +1,119 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..metrics import MICRO_BATCH_SIZE, MICRO_BATCH_QUEUE_WAIT
+
+
+class MicroBatcher:
+    """
+    Agrupa predicciones concurrentes en lotes para evaluarlas con una sola llamada vectorizada
+    Las solicitudes se encolan y un worker las drena cada `max_wait_ms` o al alcanzar `max_batch_size`
+    Cada solicitud trae el modelo con el que se codificó: un lote se evalúa por modelo, así un cambio
+    de versión con filas en cola no mezcla vectores de una versión con el modelo de otra
+    """
+    
+    def __init__(
+        self,
+        score_batch: Callable[[Any, List[Any]], List[Dict[str, Any]]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 2.0,
+        max_queue_size: int = 10000
+    ):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+        
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+    
+    async def start(self):
+        """Inicia el worker en el event loop actual"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._worker = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Detiene el worker y falla las solicitudes pendientes"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        
+        while self._queue is not None and not self._queue.empty():
+            _, _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher detenido"))
+    
+    async def submit(self, model: Any, features: Any) -> Dict[str, Any]:
+        """
+        Encola las features codificadas de una transacción, con el modelo que las codificó, y espera su resultado
+        Lanza asyncio.QueueFull si la cola está llena
+        """
+        if self._queue is None:
+            raise RuntimeError("Micro-batcher no iniciado")
+        
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((model, features, future, time.perf_counter()))
+        return await future
+    
+    async def _run(self):
+        """Drena la cola en lotes y resuelve el future de cada solicitud"""
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = await self._collect_batch(loop)
+            
+            now = time.perf_counter()
+            for _, _, _, enqueued_at in batch:
+                MICRO_BATCH_QUEUE_WAIT.observe(now - enqueued_at)
+            
+            # Casi siempre hay un solo modelo; tras activar otra versión, el lote se parte por modelo
+            groups: Dict[int, List[Tuple[Any, Any, asyncio.Future, float]]] = {}
+            for request in batch:
+                groups.setdefault(id(request[0]), []).append(request)
+            
+            for group in groups.values():
+                await self._score_group(loop, group)
+    
+    async def _score_group(self, loop: asyncio.AbstractEventLoop, group: List[Tuple[Any, Any, asyncio.Future, float]]):
+        """Evalúa fuera del event loop las solicitudes de un mismo modelo; un error solo falla ese grupo"""
+        MICRO_BATCH_SIZE.observe(len(group))
+        try:
+            results = await loop.run_in_executor(
+                None, self.score_batch, group[0][0], [features for _, features, _, _ in group]
+            )
+        except Exception as e:
+            for _, _, future, _ in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for (_, _, future, _), result in zip(group, results):
+            # El cliente pudo haber cancelado la solicitud mientras esperaba
+            if not future.done():
+                future.set_result(result)
+    
+    async def _collect_batch(self, loop: asyncio.AbstractEventLoop) -> List[Tuple[Any, Any, asyncio.Future, float]]:
+        """Espera la primera solicitud y acumula hasta llenar el lote o agotar la ventana"""
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            # Tomar lo que ya está encolado sin ceder el control
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            
+            timeout = deadline - loop.time()
+            if len(batch) >= self.max_batch_size or timeout <= 0:
+                break
+            
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
@@ -0,0 +1,91 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from ..features.encoder import FeatureEncoder
+from ..metrics import PREDICTION_CACHE_REQUESTS, PREDICTION_CACHE_EVICTIONS, PREDICTION_CACHE_ENTRIES
+
+# Campos propios de cada request; el resto de la predicción se guarda completo
+UNCACHED_FIELDS = frozenset({'model_version', 'processing_time_ms'})
+
+
+class PredictionCache:
+    """
+    Cache LRU + TTL de predicciones indexado por el vector codificado de la transacción
+    La llave incluye `model_version`, así que al activar otro modelo las entradas anteriores dejan
+    de coincidir y expiran solas por LRU/TTL
+    """
+
+    def __init__(self, max_entries: int = 100000, ttl_seconds: float = 300.0, amount_bucket: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # 0 = monto exacto; > 0 agrupa montos en múltiplos de `amount_bucket`
+        self.amount_bucket = amount_bucket
+
+        # llave -> (expira_en, nombres de los campos, valores): tuplas compactas en lugar del diccionario
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()
+        # Una sola tupla de nombres por forma de predicción, compartida por todas las entradas
+        self._layouts: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def key(self, features: np.ndarray, encoder: FeatureEncoder, model_version: str) -> bytes:
+        """Hash compacto (16 bytes) del vector codificado, con el monto agrupado, y la versión del modelo"""
+        if self.amount_bucket > 0 and encoder.amount_index is not None:
+            features = features.copy()
+            features[encoder.amount_index] = round(features[encoder.amount_index] / self.amount_bucket)
+            # amount_log depende solo del monto, no aporta a la llave
+            if encoder.amount_log_index is not None:
+                features[encoder.amount_log_index] = 0.0
+
+        digest = hashlib.blake2b(features.tobytes(), digest_size=16)
+        digest.update(model_version.encode())
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """Predicción guardada para la llave o None (cuenta hit/miss y expira entradas vencidas)"""
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                PREDICTION_CACHE_EVICTIONS.labels(reason="expired").inc()
+                PREDICTION_CACHE_ENTRIES.dec()
+                entry = None
+
+            if entry is None:
+                PREDICTION_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+
+            self._entries.move_to_end(key)
+
+        PREDICTION_CACHE_REQUESTS.labels(result="hit").inc()
+        return dict(zip(entry[1], entry[2]))
+
+    def put(self, key: bytes, prediction: Dict[str, Any]):
+        """Guarda una predicción; descarta la entrada menos usada si se supera `max_entries`"""
+        fields = tuple(field for field in prediction if field not in UNCACHED_FIELDS)
+        values = tuple(prediction[field] for field in fields)
+
+        with self._lock:
+            fields = self._layouts.setdefault(fields, fields)
+            if key not in self._entries:
+                PREDICTION_CACHE_ENTRIES.inc()
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, fields, values)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                PREDICTION_CACHE_EVICTIONS.labels(reason="capacity").inc()
+                PREDICTION_CACHE_ENTRIES.dec()
+
+    def clear(self):
+        with self._lock:
+            PREDICTION_CACHE_ENTRIES.dec(len(self._entries))
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
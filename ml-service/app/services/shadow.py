@@ -0,0 +1,370 @@
+"""
+Shadow scoring: evalúa un modelo challenger con el tráfico en vivo de /predict sin afectar al champion
+
+Después de calcular la respuesta del champion, la fila codificada se copia a un buffer junto con su
+risk_score y fraud_probability. Los bloques llenos (o los parciales, cada SHADOW_FLUSH_INTERVAL_MS)
+se entregan con put_nowait a una cola acotada: si está llena el bloque se descarta, el request nunca
+espera. Un proceso aparte con prioridad mínima (SCHED_IDLE) carga el challenger, evalúa los bloques
+y devuelve resúmenes (acuerdo de risk_level, diferencias de score) y opcionalmente escribe un log
+binario con un registro de 24 bytes por predicción. Al ser otro proceso no compite por el GIL del
+servidor, y con SCHED_IDLE el sistema operativo le da CPU solo cuando el servidor no la usa.
+"""
+import asyncio
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import structlog
+
+from ..metrics import SHADOW_AGREEMENTS, SHADOW_PREDICTIONS, SHADOW_SCORE_DELTA
+from ..models.explainer import RISK_LEVELS, risk_level_indices
+from ..models.fraud_detector import FraudDetector
+from ..models.registry import ModelRegistry
+
+logger = structlog.get_logger()
+
+# Prioridad del proceso challenger si SCHED_IDLE no está disponible (la menor en Linux)
+SHADOW_NICE = 19
+
+# Cortes de |risk_score challenger - risk_score champion| para el histograma de diferencias
+DELTA_BUCKETS = (1.0, 5.0, 10.0, 25.0, 50.0)
+
+# Registro del log de shadow (np.fromfile(path, dtype=SHADOW_LOG_DTYPE) lo lee completo)
+SHADOW_LOG_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('champion_risk_score', '<f4'),
+    ('challenger_risk_score', '<f4'),
+    ('champion_probability', '<f4'),
+    ('challenger_probability', '<f4'),
+])
+
+# Columnas que se agregan a cada fila codificada en el buffer
+_TIMESTAMP, _RISK_SCORE, _PROBABILITY = range(3)
+
+
+def read_shadow_log(path: str) -> np.ndarray:
+    """Registros del log de shadow como arreglo estructurado"""
+    return np.fromfile(path, dtype=SHADOW_LOG_DTYPE)
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {
+        'scored': 0,
+        'agreements': 0,
+        'delta_sum': 0.0,
+        'delta_abs_sum': 0.0,
+        'delta_abs_max': 0.0,
+        'delta_buckets': [0] * (len(DELTA_BUCKETS) + 1),
+        'level_matrix': [[0] * len(RISK_LEVELS) for _ in RISK_LEVELS],
+    }
+
+
+def summarize_pairs(champion: np.ndarray, challenger: np.ndarray) -> Dict[str, Any]:
+    """Resumen de un bloque de pares (risk_score champion, risk_score challenger)"""
+    delta = challenger - champion
+    abs_delta = np.abs(delta)
+    champion_levels = risk_level_indices(champion)
+    challenger_levels = risk_level_indices(challenger)
+    level_matrix = np.bincount(
+        champion_levels * len(RISK_LEVELS) + challenger_levels, minlength=len(RISK_LEVELS) ** 2
+    ).reshape(len(RISK_LEVELS), len(RISK_LEVELS))
+
+    return {
+        'scored': len(delta),
+        'agreements': int((champion_levels == challenger_levels).sum()),
+        'delta_sum': float(delta.sum()),
+        'delta_abs_sum': float(abs_delta.sum()),
+        'delta_abs_max': float(abs_delta.max(initial=0.0)),
+        'delta_buckets': np.bincount(
+            np.searchsorted(DELTA_BUCKETS, abs_delta, side='right'), minlength=len(DELTA_BUCKETS) + 1
+        ).tolist(),
+        'level_matrix': level_matrix.tolist(),
+    }
+
+
+def _load_challenger(model: Dict[str, Optional[str]]) -> FraudDetector:
+    if model['compiled'] is not None:
+        detector = FraudDetector.from_compiled(model['compiled'], estimators_path=model['artifact'])
+    else:
+        detector = FraudDetector.from_artifact(model['artifact'])
+    detector.model_version = model['version']
+    return detector
+
+
+def _lower_priority():
+    """
+    SCHED_IDLE: el proceso solo corre cuando no hay otro listo y cede la CPU apenas el servidor despierta
+    Con nice 19 todavía recibe una porción de CPU y puede demorar la atención de un request unos ms
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+        return
+    except (AttributeError, OSError):
+        pass
+    try:
+        os.nice(SHADOW_NICE)
+    except OSError:
+        pass
+
+
+def _shadow_worker(model, requests, results, log_path: Optional[str], log_max_bytes: int):
+    """Proceso challenger: evalúa bloques hasta recibir None"""
+    _lower_priority()
+
+    try:
+        detector = _load_challenger(model)
+        detector.warm_up()
+    except Exception as e:
+        results.put({'error': f"Error cargando el challenger: {e}", 'fatal': True})
+        return
+    n_features = len(detector.feature_names)
+    results.put({'ready': True})
+
+    log = open(log_path, 'ab') if log_path else None
+    try:
+        while True:
+            batch = requests.get()
+            if batch is None:
+                break
+            try:
+                scores = detector.score_matrix(batch[:, :n_features])
+                extra = batch[:, n_features:]
+                results.put(summarize_pairs(extra[:, _RISK_SCORE], scores['risk_score']))
+
+                if log is not None:
+                    records = np.empty(len(batch), dtype=SHADOW_LOG_DTYPE)
+                    records['timestamp'] = extra[:, _TIMESTAMP]
+                    records['champion_risk_score'] = extra[:, _RISK_SCORE]
+                    records['challenger_risk_score'] = scores['risk_score']
+                    records['champion_probability'] = extra[:, _PROBABILITY]
+                    records['challenger_probability'] = scores['fraud_probability']
+                    records.tofile(log)
+                    log.flush()
+                    if log_max_bytes and log.tell() >= log_max_bytes:
+                        # Una sola rotación: el log anterior queda en <archivo>.1
+                        log.close()
+                        os.replace(log_path, f"{log_path}.1")
+                        log = open(log_path, 'ab')
+            except Exception as e:
+                results.put({'error': str(e), 'rows': len(batch)})
+    finally:
+        if log is not None:
+            log.close()
+
+
+class ShadowScorer:
+    """
+    Envía las filas de /predict a un proceso challenger y agrega los resultados
+    `submit` corre en el event loop (único escritor del buffer); el hilo lector solo toca los totales
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        version: str,
+        batch_size: int = 256,
+        queue_size: int = 8192,
+        flush_interval_ms: float = 200.0,
+        log_path: Optional[str] = None,
+        log_max_bytes: int = 0
+    ):
+        # Valida la versión (ModelNotFoundError si no existe) y obtiene sus features sin evaluarla aquí
+        challenger = registry.load(version)
+        self.version = version
+        self.feature_names = list(challenger.feature_names)
+        self.model = {
+            'compiled': registry.compiled_path(version) if os.path.isdir(registry.compiled_path(version)) else None,
+            'artifact': registry.artifact_path(version),
+            'version': version,
+        }
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+
+        n_features = len(self.feature_names)
+        self._width = n_features + 3
+        self._extra = n_features
+        self._buffer = np.empty((self.batch_size, self._width), dtype=np.float64)
+        self._buffered = 0
+
+        context = multiprocessing.get_context("spawn")
+        # Acotada en bloques: a lo sumo ~queue_size filas esperando al challenger
+        self._requests = context.Queue(maxsize=max(1, queue_size // self.batch_size))
+        self._results = context.Queue()
+        self._process = context.Process(
+            target=_shadow_worker,
+            args=(self.model, self._requests, self._results, log_path, log_max_bytes),
+            name=f"shadow-{version}",
+            daemon=True
+        )
+
+        self.started_at: Optional[float] = None
+        self.ready = False
+        self.error: Optional[str] = None
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0
+        self._totals = _empty_totals()
+        self._totals_lock = threading.Lock()
+        self._champion_version: Optional[str] = None
+        self._accepts = False
+        self._reader: Optional[threading.Thread] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Inicia el proceso challenger, el hilo que lee sus resultados y el vaciado periódico del buffer"""
+        self._process.start()
+        self.started_at = time.time()
+        self._reader = threading.Thread(target=self._read_results, name=f"shadow-reader-{self.version}", daemon=True)
+        self._reader.start()
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        logger.info("Shadow scoring iniciado", challenger_version=self.version, pid=self._process.pid)
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+
+        try:
+            self._requests.put_nowait(None)
+        except queue.Full:
+            pass
+        await asyncio.get_running_loop().run_in_executor(None, self._join)
+        logger.info("Shadow scoring detenido", challenger_version=self.version)
+
+    def _join(self):
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._results.put(None)
+        if self._reader is not None:
+            self._reader.join(timeout=5)
+        # La cola de requests no espera a que el challenger consuma lo pendiente
+        self._requests.cancel_join_thread()
+
+    def compatible_with(self, feature_names) -> bool:
+        """El challenger recibe las filas codificadas del champion: deben tener las mismas features"""
+        return list(feature_names) == self.feature_names
+
+    def accepts(self, champion: FraudDetector) -> bool:
+        """Si las filas de este champion se pueden enviar al challenger (se recalcula solo al cambiar de versión)"""
+        if champion.model_version != self._champion_version:
+            self._champion_version = champion.model_version
+            # Si el challenger pasó a ser el champion, compararlo consigo mismo no aporta nada
+            self._accepts = champion.model_version != self.version and self.compatible_with(champion.feature_names)
+        return self._accepts
+
+    def submit(self, features: np.ndarray, result: Dict[str, Any]):
+        """Copia la fila y el resultado del champion al buffer (no bloquea ni evalúa nada)"""
+        row = self._buffer[self._buffered]
+        row[:self._extra] = features
+        row[self._extra + _TIMESTAMP] = time.time()
+        row[self._extra + _RISK_SCORE] = result['risk_score']
+        row[self._extra + _PROBABILITY] = result['fraud_probability']
+        self._buffered += 1
+        if self._buffered == self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Entrega el buffer al challenger; si la cola está llena el bloque se descarta"""
+        n = self._buffered
+        if not n:
+            return
+        if n == self.batch_size:
+            # La cola serializa el bloque en otro hilo: se entrega el buffer y se usa uno nuevo
+            batch = self._buffer
+            self._buffer = np.empty_like(batch)
+        else:
+            batch = self._buffer[:n].copy()
+        self._buffered = 0
+        self.submitted += n
+
+        if not self._process.is_alive():
+            self.dropped += n
+            SHADOW_PREDICTIONS.labels(result="dropped").inc(n)
+            return
+        try:
+            self._requests.put_nowait(batch)
+        except queue.Full:
+            self.dropped += n
+            SHADOW_PREDICTIONS.labels(result="dropped").inc(n)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def _read_results(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            if message.get('ready'):
+                self.ready = True
+                continue
+            if 'error' in message:
+                self.error = message['error']
+                rows = message.get('rows', 0)
+                self.errors += rows
+                SHADOW_PREDICTIONS.labels(result="error").inc(rows)
+                logger.error("Error en shadow scoring", challenger_version=self.version, error=message['error'])
+                if message.get('fatal'):
+                    return
+                continue
+
+            with self._totals_lock:
+                totals = self._totals
+                totals['scored'] += message['scored']
+                totals['agreements'] += message['agreements']
+                totals['delta_sum'] += message['delta_sum']
+                totals['delta_abs_sum'] += message['delta_abs_sum']
+                totals['delta_abs_max'] = max(totals['delta_abs_max'], message['delta_abs_max'])
+                totals['delta_buckets'] = [a + b for a, b in zip(totals['delta_buckets'], message['delta_buckets'])]
+                totals['level_matrix'] = [
+                    [a + b for a, b in zip(row, other)] for row, other in zip(totals['level_matrix'], message['level_matrix'])
+                ]
+            SHADOW_PREDICTIONS.labels(result="scored").inc(message['scored'])
+            SHADOW_AGREEMENTS.inc(message['agreements'])
+            SHADOW_SCORE_DELTA.inc(message['delta_abs_sum'])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._totals_lock:
+            totals = {
+                **self._totals,
+                'delta_buckets': list(self._totals['delta_buckets']),
+                'level_matrix': [list(row) for row in self._totals['level_matrix']],
+            }
+        scored = totals['scored']
+        bucket_labels = [f"<{edge:g}" for edge in DELTA_BUCKETS] + [f">={DELTA_BUCKETS[-1]:g}"]
+
+        return {
+            'challenger_version': self.version,
+            'ready': self.ready,
+            'alive': self._process.is_alive(),
+            'error': self.error,
+            'started_at': self.started_at,
+            'submitted': self.submitted,
+            'scored': scored,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            # Filas entregadas al challenger que todavía no devolvió
+            'pending': max(0, self.submitted - self.dropped - scored - self.errors),
+            'agreement_rate': totals['agreements'] / scored if scored else None,
+            'score_delta_mean': totals['delta_sum'] / scored if scored else None,
+            'score_delta_abs_mean': totals['delta_abs_sum'] / scored if scored else None,
+            'score_delta_abs_max': totals['delta_abs_max'],
+            'score_delta_abs_histogram': dict(zip(bucket_labels, totals['delta_buckets'])),
+            # Filas: risk_level del champion; columnas: del challenger (low, medium, high)
+            'risk_level_matrix': dict(zip(RISK_LEVELS, (dict(zip(RISK_LEVELS, row)) for row in totals['level_matrix']))),
+            'log_file': self.log_path,
+        }
@@ -0,0 +1,177 @@
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import structlog
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from ..features.velocity import VelocityStore
+from ..metrics import PREDICTION_COUNTER
+from ..models.fraud_detector import FraudDetector
+from ..schemas.prediction import PredictionRequest
+
+logger = structlog.get_logger()
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que no escucha `receive` mientras envía
+    El StreamingResponse de Starlette consume `receive` para detectar desconexiones, lo que compite con
+    la lectura del body en el mismo generador; aquí la desconexión llega como ClientDisconnect al leer
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+
+        if self.background is not None:
+            await self.background()
+
+
+def _error_line(line_number: int, error: str, detail: Any = None) -> bytes:
+    payload: Dict[str, Any] = {"line": line_number, "error": error}
+    if detail is not None:
+        payload["detail"] = detail
+    return json.dumps(payload, ensure_ascii=False).encode() + b"\n"
+
+
+def _validate_line(line_number: int, raw_line: bytes) -> Tuple[Optional[Tuple[int, Any, PredictionRequest]], Optional[bytes]]:
+    """Valida una línea; retorna ((línea, id, request), None) o (None, línea de error)"""
+    try:
+        transaction = PredictionRequest.model_validate_json(raw_line)
+    except ValidationError as e:
+        detail = [
+            {"loc": list(error["loc"]), "msg": error["msg"]}
+            for error in e.errors(include_url=False, include_input=False)
+        ]
+        return None, _error_line(line_number, "validation", detail)
+
+    # Identificador opcional de la fila, se devuelve tal cual para correlacionar resultados
+    transaction_id = None
+    if b'"id"' in raw_line:
+        try:
+            transaction_id = json.loads(raw_line).get("id")
+        except ValueError:
+            pass
+
+    return (line_number, transaction_id, transaction), None
+
+
+async def _score_chunk(
+    fraud_detector: FraudDetector,
+    chunk: List[Tuple[int, Any, PredictionRequest]],
+    velocity_store: Optional[VelocityStore] = None
+) -> bytes:
+    """
+    Codifica y evalúa un bloque con una sola llamada vectorizada; retorna sus líneas NDJSON
+    Si la codificación o el modelo fallan, cada fila del bloque recibe una línea de error
+    `scoring` y el stream continúa con el siguiente bloque
+    """
+    encoder = fraud_detector.feature_encoder
+    transactions = [transaction for _, _, transaction in chunk]
+    try:
+        velocity = None
+        if velocity_store is not None and encoder.uses_velocity:
+            velocity = velocity_store.lookup_batch(transactions)
+        matrix = encoder.encode_batch(transactions, velocity=velocity)
+        results = await run_in_threadpool(fraud_detector.predict_batch, matrix)
+    except Exception as e:
+        logger.error("Error evaluando bloque del stream", error=str(e), rows=len(chunk),
+                     first_line=chunk[0][0], last_line=chunk[-1][0])
+        PREDICTION_COUNTER.labels(result="error").inc(len(chunk))
+        return b"".join(_error_line(line_number, "scoring", str(e)) for line_number, _, _ in chunk)
+
+    lines = []
+    for (line_number, transaction_id, _), result in zip(chunk, results):
+        payload = {
+            "line": line_number,
+            "risk_score": result["risk_score"],
+            "fraud_probability": result["fraud_probability"],
+            "confidence": result["confidence"],
+            "anomaly_score": result["anomaly_score"],
+            "is_outlier": result["is_outlier"],
+            "risk_level": result["risk_level"],
+            "decision_reason": result["decision_reason"],
+            "model_version": result["model_version"],
+        }
+        if transaction_id is not None:
+            payload["id"] = transaction_id
+        lines.append(json.dumps(payload, ensure_ascii=False))
+
+    PREDICTION_COUNTER.labels(result="success").inc(len(chunk))
+    return ("\n".join(lines) + "\n").encode()
+
+
+async def score_ndjson_stream(
+    body: AsyncIterator[bytes],
+    fraud_detector: FraudDetector,
+    velocity_store: Optional[VelocityStore] = None,
+    chunk_size: int = 256,
+    max_line_bytes: int = 65536
+) -> AsyncIterator[bytes]:
+    """
+    Lee transacciones NDJSON de `body` y produce resultados NDJSON por bloques de `chunk_size`
+    Memoria acotada: solo se retiene un bloque y la línea parcial en curso. El siguiente trozo del body
+    se lee cuando el bloque anterior ya se envió, así la contrapresión llega hasta el cliente
+    Las líneas inválidas producen una línea de error con su número y no detienen el stream
+    El velocity store solo se consulta: un re-scoring no registra transacciones
+    """
+    chunk: List[Tuple[int, Any, PredictionRequest]] = []
+    pending = b""
+    line_number = 0
+    # Línea que superó max_line_bytes: se descarta hasta el siguiente salto de línea
+    skipping = False
+
+    def handle_line(raw_line: bytes) -> Optional[bytes]:
+        nonlocal line_number
+        line_number += 1
+        if not raw_line.strip():
+            return None
+        if len(raw_line) > max_line_bytes:
+            PREDICTION_COUNTER.labels(result="error").inc()
+            return _error_line(line_number, "line_too_long")
+
+        valid, error = _validate_line(line_number, raw_line)
+        if error is not None:
+            PREDICTION_COUNTER.labels(result="error").inc()
+            return error
+        chunk.append(valid)
+        return None
+
+    async for data in body:
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+
+        for raw_line in lines:
+            if skipping:
+                skipping = False
+                line_number += 1
+                PREDICTION_COUNTER.labels(result="error").inc()
+                yield _error_line(line_number, "line_too_long")
+                continue
+
+            error = handle_line(raw_line)
+            if error is not None:
+                yield error
+            if len(chunk) >= chunk_size:
+                yield await _score_chunk(fraud_detector, chunk, velocity_store)
+                chunk.clear()
+
+        if len(pending) > max_line_bytes:
+            pending = b""
+            skipping = True
+
+    if skipping:
+        line_number += 1
+        PREDICTION_COUNTER.labels(result="error").inc()
+        yield _error_line(line_number, "line_too_long")
+    elif pending:
+        error = handle_line(pending)
+        if error is not None:
+            yield error
+
+    if chunk:
+        yield await _score_chunk(fraud_detector, chunk, velocity_store)
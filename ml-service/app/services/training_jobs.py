@@ -0,0 +1,325 @@
+import asyncio
+import fcntl
+import json
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from ..models.fraud_detector import FraudDetector
+from ..models.registry import ModelRegistry
+
+logger = structlog.get_logger()
+
+# Estados de un job de entrenamiento
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Estado de los jobs en el registro (un JSON por job): cualquier worker responde /retrain/{job_id}
+JOBS_DIR = ".jobs"
+# flock que retiene el worker cuyo job está en curso; el sistema lo libera si el worker muere
+TRAINING_LOCK = ".training.lock"
+
+
+def _run_training_job(model_version: str, output_dir: str) -> Dict[str, Any]:
+    """Entrena y serializa un modelo; se ejecuta en el proceso de entrenamiento"""
+    started = time.time()
+    detector = FraudDetector.train_new(model_version)
+
+    os.makedirs(output_dir, exist_ok=True)
+    artifact_path = os.path.join(output_dir, f"{model_version}-{os.getpid()}.joblib")
+    detector.save(artifact_path)
+
+    return {
+        "artifact_path": artifact_path,
+        "model_version": model_version,
+        "metrics": detector.model_metrics,
+        "training_seconds": time.time() - started,
+    }
+
+
+class TrainingJob:
+    """Estado de un reentrenamiento en segundo plano"""
+
+    def __init__(self, trigger: str, model_version: str, activate: bool = True):
+        self.job_id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.model_version = model_version
+        self.activate = activate
+        self.status = PENDING
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.metrics: Dict[str, float] = {}
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "trigger": self.trigger,
+            "status": self.status,
+            "model_version": self.model_version,
+            "activate": self.activate,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "metrics": self.metrics,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TrainingJob":
+        job = cls(data["trigger"], data["model_version"], activate=data["activate"])
+        for field in ("job_id", "status", "created_at", "started_at", "finished_at", "metrics", "error"):
+            setattr(job, field, data[field])
+        return job
+
+
+class TrainingJobManager:
+    """
+    Ejecuta reentrenamientos en un proceso aparte y publica el artefacto resultante en el registro
+    El proceso de serving solo carga el artefacto final, así la latencia no se ve afectada por el entrenamiento
+    """
+
+    def __init__(self, registry: ModelRegistry, max_history: int = 50):
+        self.registry = registry
+        self.max_history = max_history
+
+        self._executor = self._new_executor()
+        self._jobs_path = os.path.join(registry.base_path, JOBS_DIR)
+        os.makedirs(self._jobs_path, exist_ok=True)
+        self._current: Optional[TrainingJob] = None
+        self._training_lock = None
+        self._tasks: set = set()
+        self._scheduler: Optional[asyncio.Task] = None
+        self._scheduler_lock = None
+        # Entrenamiento inicial cuando el registro no tiene modelo (None si no hizo falta en este worker)
+        self.bootstrap_job: Optional[TrainingJob] = None
+        self._bootstrap_lock = None
+
+    @staticmethod
+    def _new_executor() -> ProcessPoolExecutor:
+        # spawn: el proceso hijo no hereda hilos ni el event loop del servidor
+        return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, trigger: str = "api", activate: bool = True) -> TrainingJob:
+        """
+        Encola un reentrenamiento; si ya hay uno en curso en cualquier worker retorna ese mismo job
+        Con `activate=False` la versión nueva solo se registra (p. ej. para evaluarla en shadow)
+        """
+        if self._current is not None and self._current.status in (PENDING, RUNNING):
+            return self._current
+
+        # Bajo el lock de versiones del registro: la consulta del job en curso, la reserva de la
+        # versión y el archivo del job nuevo son atómicos entre los workers que comparten el registro
+        with self.registry.versions_lock():
+            training_lock = self._try_lock(TRAINING_LOCK)
+            if training_lock is None:
+                running = self._running_job()
+                if running is not None:
+                    return running
+                raise RuntimeError("Lock de entrenamiento tomado sin un job en curso en el registro")
+
+            job = TrainingJob(trigger, self.registry.allocate_version(locked=True), activate=activate)
+            self._save(job)
+            self._training_lock = training_lock
+        self._prune_history()
+
+        self._current = job
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        logger.info("Job de reentrenamiento encolado", job_id=job.job_id, trigger=trigger)
+        return job
+
+    def submit_bootstrap(self) -> Optional[TrainingJob]:
+        """
+        Entrena y publica el primer modelo en segundo plano cuando el registro está vacío
+        Con varios workers solo entrena el que obtiene el lock; el resto activa la versión nueva
+        al sincronizarse con el puntero CURRENT
+        """
+        lock_file = self._try_lock(".bootstrap.lock")
+        if lock_file is None:
+            logger.info("Entrenamiento inicial a cargo de otro worker", pid=os.getpid())
+            return None
+
+        # Otro worker pudo publicar la primera versión antes de liberar el lock
+        if self.registry.sync_with_pointer():
+            lock_file.close()
+            return None
+
+        self._bootstrap_lock = lock_file
+        job = self.submit(trigger="bootstrap")
+        if job is not self._current:
+            # Otro worker ya está entrenando: su versión se activa al sincronizarse con CURRENT
+            self._release_bootstrap_lock()
+            return job
+        self.bootstrap_job = job
+        return self.bootstrap_job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        """Job de cualquier worker que comparte el registro"""
+        # El id se usa como nombre de archivo: solo ids hexadecimales como los de uuid4().hex
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._job_file(job_id), encoding="utf-8") as f:
+                return TrainingJob.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Jobs de todos los workers, del más reciente al más antiguo"""
+        jobs = []
+        for name in os.listdir(self._jobs_path):
+            if name.endswith(".json"):
+                job = self.get(name[:-len(".json")])
+                if job is not None:
+                    jobs.append(job.to_dict())
+        return sorted(jobs, key=lambda job: job["created_at"], reverse=True)
+
+    def _running_job(self) -> Optional[TrainingJob]:
+        """Job pendiente o en curso más reciente entre los workers que comparten el registro"""
+        for data in self.list_jobs():
+            if data["status"] in (PENDING, RUNNING):
+                return TrainingJob.from_dict(data)
+        return None
+
+    def _job_file(self, job_id: str) -> str:
+        return os.path.join(self._jobs_path, f"{job_id}.json")
+
+    def _save(self, job: TrainingJob):
+        """Escribe el estado del job de forma atómica (archivo temporal + os.replace)"""
+        path = self._job_file(job.job_id)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def _prune_history(self):
+        """Conserva los `max_history` jobs más recientes de todos los workers"""
+        try:
+            entries = sorted(
+                (entry for entry in os.scandir(self._jobs_path) if entry.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+        except OSError:
+            # Otro worker borró un archivo mientras se listaba: se poda en el próximo job
+            return
+        for entry in entries[:max(len(entries) - self.max_history, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    async def _run(self, job: TrainingJob):
+        loop = asyncio.get_running_loop()
+        job.status = RUNNING
+        job.started_at = time.time()
+        self._save(job)
+
+        try:
+            result = await loop.run_in_executor(
+                self._executor, _run_training_job, job.model_version, self.registry.staging_path
+            )
+            # Cargar y publicar el artefacto fuera del event loop
+            await loop.run_in_executor(
+                None, self.registry.publish_artifact, result["artifact_path"], job.activate
+            )
+
+            job.metrics = result["metrics"]
+            job.status = SUCCEEDED
+            logger.info(
+                "Reentrenamiento completado",
+                job_id=job.job_id,
+                model_version=job.model_version,
+                training_seconds=result["training_seconds"]
+            )
+        except BrokenProcessPool as e:
+            # El proceso de entrenamiento murió (p. ej. OOM): el pool queda inutilizable, se reemplaza
+            # para que los próximos reentrenamientos no fallen hasta reiniciar el worker
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            job.status = FAILED
+            job.error = f"El proceso de entrenamiento terminó abruptamente: {e}"
+            logger.error("Proceso de entrenamiento caído, pool reemplazado", job_id=job.job_id, error=str(e))
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            logger.error("Error en reentrenamiento", job_id=job.job_id, error=str(e))
+        finally:
+            job.finished_at = time.time()
+            # El estado final y la liberación del lock se ven juntos desde submit() de otro worker
+            with self.registry.versions_lock():
+                self._save(job)
+                self._release_training_lock()
+            if job is self.bootstrap_job:
+                self._release_bootstrap_lock()
+
+    def start_scheduler(self, interval_hours: float) -> bool:
+        """
+        Programa un reentrenamiento cada `interval_hours` horas
+        Con varios workers solo el que obtiene el lock del registro programa reentrenamientos
+        """
+        self._scheduler_lock = self._try_lock(".scheduler.lock")
+        if self._scheduler_lock is None:
+            logger.info("Reentrenamiento programado por otro worker", pid=os.getpid())
+            return False
+
+        self._scheduler = asyncio.get_running_loop().create_task(self._schedule(interval_hours * 3600))
+        logger.info("Reentrenamiento programado", interval_hours=interval_hours, pid=os.getpid())
+        return True
+
+    def _try_lock(self, name: str):
+        """
+        Lock exclusivo no bloqueante sobre un archivo del registro; retorna el archivo abierto o None
+        El sistema lo libera si el proceso termina
+        """
+        lock_file = open(os.path.join(self.registry.base_path, name), "w")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _release_training_lock(self):
+        if self._training_lock is not None:
+            self._training_lock.close()
+            self._training_lock = None
+
+    def _release_bootstrap_lock(self):
+        if self._bootstrap_lock is not None:
+            self._bootstrap_lock.close()
+            self._bootstrap_lock = None
+
+    async def _schedule(self, interval_seconds: float):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            self.submit(trigger="scheduler")
+
+    async def shutdown(self):
+        """Detiene el scheduler y el proceso de entrenamiento"""
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+
+        if self._scheduler_lock is not None:
+            self._scheduler_lock.close()
+            self._scheduler_lock = None
+        self._release_bootstrap_lock()
+        self._release_training_lock()
+
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,65 @@
+from contextvars import ContextVar
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+from .config import settings
+from .metrics import PREDICTION_STAGE_DURATION
+
+# Rutas instrumentadas por etapa
+TIMED_ROUTES = frozenset({"/predict", "/predict/batch"})
+
+
+class StageTimer:
+    """
+    Cronómetro por etapas con reloj monotónico
+    Cada `mark(stage)` registra el tiempo transcurrido desde la marca anterior
+    """
+
+    __slots__ = ("stages", "_last")
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float]] = []
+        self._last = perf_counter()
+
+    def mark(self, stage: str):
+        now = perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def observe(self, route: str):
+        """Exporta las etapas al histograma de Prometheus"""
+        for stage, duration in self.stages:
+            PREDICTION_STAGE_DURATION.labels(route=route, stage=stage).observe(duration)
+
+    def server_timing(self) -> str:
+        """Valor del header Server-Timing (duraciones en ms)"""
+        return ", ".join(f"{stage};dur={duration * 1000:.3f}" for stage, duration in self.stages)
+
+
+class _NullTimer:
+    """Cronómetro sin efecto para cuando la instrumentación está apagada"""
+
+    __slots__ = ()
+
+    def mark(self, stage: str):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+_current_timer: ContextVar = ContextVar("stage_timer", default=NULL_TIMER)
+
+
+def start_request_timer(path: str) -> Optional[StageTimer]:
+    """Inicia el cronómetro del request si la ruta se instrumenta y STAGE_TIMING_ENABLED está activo"""
+    if not settings.STAGE_TIMING_ENABLED or path not in TIMED_ROUTES:
+        return None
+
+    timer = StageTimer()
+    _current_timer.set(timer)
+    return timer
+
+
+def current_timer():
+    """Cronómetro del request actual (NULL_TIMER si no hay)"""
+    return _current_timer.get()
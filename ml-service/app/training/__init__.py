@@ -0,0 +1,5 @@
+# Training module
+
+
+
+
@@ -0,0 +1,314 @@
+"""
+Ingesta de transacciones etiquetadas para entrenamiento
+
+Lee CSV o Parquet por bloques con dtypes compactos, deriva las mismas features que
+PredictionRequest.to_features de forma vectorizada y reporta el uso de memoria por etapa.
+Las velocity features (VELOCITY_FEATURES) no se pueden derivar de una fila aislada: si el export
+las trae precalculadas se usan tal cual, si no el modelo se entrena sin ellas.
+Sin `sample_rows` el dataset completo queda en memoria; con `sample_rows` se conserva una muestra
+uniforme (reservoir sampling) y la memoria queda acotada por la muestra más un bloque.
+
+Uso (desde ml-service/):
+    python -m app.training.ingestion data/training_data.csv
+"""
+import argparse
+import resource
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import structlog
+
+from ..features.encoder import TRANSACTION_FEATURES, derive_feature_columns
+from ..features.velocity import VELOCITY_FEATURES
+from .simulated_data import LABEL_COLUMN
+
+logger = structlog.get_logger()
+
+DEFAULT_CHUNK_SIZE = 500_000
+
+REQUIRED_COLUMNS = ('amount', 'merchantCategoryCode', 'countryCode', 'bin')
+TIME_COLUMNS = ('hour', 'dayOfWeek')
+# Si el export no trae hour/dayOfWeek se derivan de la fecha de la transacción
+TIMESTAMP_COLUMN = 'createdAt'
+
+# Dtypes de lectura: montos en float32, códigos como categóricos, enteros pequeños anulables
+RAW_DTYPES = {
+    'amount': 'float32',
+    'merchantCategoryCode': 'category',
+    'countryCode': 'category',
+    'bin': 'category',
+    'hour': 'Int8',
+    'dayOfWeek': 'Int8',
+}
+
+# Dtypes del dataset de entrenamiento resultante
+FEATURE_DTYPES = {
+    'amount': np.float32,
+    'hour': np.int8,
+    'dayOfWeek': np.int8,
+    'mcc_numeric': np.int16,
+    'bin_numeric': np.int32,
+    'amount_log': np.float32,
+}
+FLAG_DTYPE = np.int8
+
+
+def _peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso en MB (ru_maxrss está en KB en Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _frame_mb(frame: pd.DataFrame) -> float:
+    return frame.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def iter_raw_chunks(
+    path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    label_column: str = LABEL_COLUMN,
+    extra_columns: Sequence[str] = (),
+    skip_rows: int = 0
+) -> Iterator[pd.DataFrame]:
+    """
+    Lee el archivo por bloques con dtypes compactos, solo con las columnas necesarias
+    `extra_columns` se leen tal cual (p. ej. un identificador); `skip_rows` descarta las primeras filas de datos
+    """
+    wanted = {*REQUIRED_COLUMNS, *TIME_COLUMNS, TIMESTAMP_COLUMN, *VELOCITY_FEATURES, label_column, *extra_columns}
+    dtypes = {**RAW_DTYPES, **{name: 'float32' for name in VELOCITY_FEATURES}, label_column: 'Int8'}
+
+    if path.endswith('.parquet'):
+        yield from _iter_parquet_chunks(path, chunk_size, wanted, dtypes, skip_rows)
+        return
+
+    reader = pd.read_csv(
+        path,
+        usecols=lambda column: column in wanted,
+        dtype={column: dtype for column, dtype in dtypes.items() if column in wanted},
+        chunksize=chunk_size,
+        # El parser de C salta las filas sin convertirlas
+        skiprows=range(1, skip_rows + 1) if skip_rows else None,
+    )
+    for chunk in reader:
+        yield chunk
+
+
+def _iter_parquet_chunks(
+    path: str,
+    chunk_size: int,
+    wanted: set,
+    dtypes: Dict[str, str],
+    skip_rows: int = 0
+) -> Iterator[pd.DataFrame]:
+    """Lee un Parquet por row groups/lotes (requiere pyarrow)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Leer Parquet requiere pyarrow instalado") from e
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [column for column in parquet_file.schema_arrow.names if column in wanted]
+
+    # Los row groups que caen completos dentro de skip_rows no se leen
+    first_group = 0
+    while first_group < parquet_file.num_row_groups:
+        group_rows = parquet_file.metadata.row_group(first_group).num_rows
+        if skip_rows < group_rows:
+            break
+        skip_rows -= group_rows
+        first_group += 1
+    row_groups = list(range(first_group, parquet_file.num_row_groups))
+    if not row_groups:
+        return
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, row_groups=row_groups, columns=columns):
+        if skip_rows:
+            skipped = min(skip_rows, batch.num_rows)
+            batch = batch.slice(skipped)
+            skip_rows -= skipped
+            if batch.num_rows == 0:
+                continue
+        chunk = batch.to_pandas()
+        yield chunk.astype({column: dtype for column, dtype in dtypes.items() if column in chunk.columns})
+
+
+def time_columns(raw: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    """hour y dayOfWeek del bloque; si el export no los trae se derivan de createdAt"""
+    if all(column in raw.columns for column in TIME_COLUMNS):
+        return raw['hour'], raw['dayOfWeek']
+    if TIMESTAMP_COLUMN in raw.columns:
+        created_at = pd.to_datetime(raw[TIMESTAMP_COLUMN], errors='coerce')
+        hour = created_at.dt.hour.astype('Int8')
+        # pandas usa lunes=0; el servicio usa 0=Domingo como Date.getDay()
+        day_of_week = ((created_at.dt.dayofweek + 1) % 7).astype('Int8')
+        return hour, day_of_week
+    raise ValueError(f"Se requieren las columnas {TIME_COLUMNS} o {TIMESTAMP_COLUMN}")
+
+
+def derive_training_features(raw: pd.DataFrame, label_column: str = LABEL_COLUMN) -> pd.DataFrame:
+    """
+    Convierte un bloque crudo en features del modelo (orden de TRANSACTION_FEATURES) + etiqueta
+    Las velocity features presentes en el bloque se agregan al final (vacías = 0)
+    """
+    missing = [column for column in (*REQUIRED_COLUMNS, label_column) if column not in raw.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en los datos de entrenamiento: {missing}")
+
+    hour, day_of_week = time_columns(raw)
+
+    # Descartar filas incompletas
+    valid = raw[list(REQUIRED_COLUMNS)].notna().all(axis=1) & hour.notna() & day_of_week.notna()
+    valid &= raw[label_column].notna()
+    if not valid.all():
+        raw = raw[valid]
+        hour, day_of_week = hour[valid], day_of_week[valid]
+
+    columns = derive_feature_columns(
+        amount=raw['amount'].to_numpy(),
+        merchant_category_code=raw['merchantCategoryCode'],
+        country_code=raw['countryCode'],
+        bin_code=raw['bin'],
+        hour=hour.to_numpy(dtype=np.int64),
+        day_of_week=day_of_week.to_numpy(dtype=np.int64),
+    )
+
+    data = {
+        name: columns[name].astype(FEATURE_DTYPES.get(name, FLAG_DTYPE), copy=False)
+        for name in TRANSACTION_FEATURES
+    }
+    for name in VELOCITY_FEATURES:
+        if name in raw.columns:
+            data[name] = raw[name].fillna(0).to_numpy(dtype=np.float32)
+    data[label_column] = raw[label_column].to_numpy(dtype=np.int8)
+    return pd.DataFrame(data, copy=False)
+
+
+class _Reservoir:
+    """
+    Muestra uniforme de tamaño fijo de las filas vistas (algoritmo R, vectorizado por bloque)
+    Las columnas se preasignan al primer bloque con sus dtypes compactos
+    """
+
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self.seen = 0
+        self.columns: Dict[str, np.ndarray] = {}
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, features: pd.DataFrame):
+        if not self.columns:
+            self.columns = {name: np.empty(self.size, dtype=features[name].dtype) for name in features.columns}
+
+        # Mientras la muestra no está llena las filas entran en orden
+        free = max(self.size - self.seen, 0)
+        head = min(free, len(features))
+        for name, values in self.columns.items():
+            values[self.seen:self.seen + head] = features[name].to_numpy()[:head]
+
+        # La fila i (0-based en el archivo) reemplaza a una posición al azar de [0, i] si cae en la muestra
+        positions = np.arange(self.seen + head, self.seen + len(features))
+        targets = self._rng.integers(0, positions + 1)
+        rows = np.flatnonzero(targets < self.size) + head
+        targets = targets[rows - head]
+        # Si dos filas del bloque caen en la misma posición gana la última, como en el recorrido secuencial
+        last = len(targets) - 1 - np.unique(targets[::-1], return_index=True)[1]
+        for name, values in self.columns.items():
+            values[targets[last]] = features[name].to_numpy()[rows[last]]
+
+        self.seen += len(features)
+
+    def frame(self) -> pd.DataFrame:
+        rows = min(self.seen, self.size)
+        return pd.DataFrame({name: values[:rows] for name, values in self.columns.items()}, copy=False)
+
+
+def load_training_data(
+    path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_rows: Optional[int] = None,
+    label_column: str = LABEL_COLUMN,
+    sample_rows: Optional[int] = None,
+    seed: int = 0
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Carga el dataset de entrenamiento bloque a bloque
+    Sin `sample_rows` se concatenan todas las filas válidas: la memoria crece con el archivo. Con
+    `sample_rows` se conserva una muestra uniforme de ese tamaño de todo el archivo (reservoir)
+    Retorna el DataFrame de features (con la columna `is_fraud`) y un reporte de memoria por etapa
+    """
+    column_chunks: Dict[str, List[np.ndarray]] = {}
+    reservoir = _Reservoir(sample_rows, seed) if sample_rows else None
+    report: Dict[str, Any] = {
+        'source': path,
+        'chunks': 0,
+        'rows_read': 0,
+        'rows_dropped': 0,
+        'raw_chunk_peak_mb': 0.0,
+        'features_chunk_peak_mb': 0.0,
+    }
+
+    for raw in iter_raw_chunks(path, chunk_size, label_column):
+        if max_rows is not None:
+            raw = raw.iloc[:max_rows - report['rows_read']]
+
+        features = derive_training_features(raw, label_column)
+
+        report['chunks'] += 1
+        report['rows_read'] += len(raw)
+        report['rows_dropped'] += len(raw) - len(features)
+        report['raw_chunk_peak_mb'] = max(report['raw_chunk_peak_mb'], _frame_mb(raw))
+        report['features_chunk_peak_mb'] = max(report['features_chunk_peak_mb'], _frame_mb(features))
+
+        if reservoir is not None:
+            reservoir.add(features)
+        else:
+            for name in features.columns:
+                column_chunks.setdefault(name, []).append(features[name].to_numpy())
+
+        del raw, features
+
+        if max_rows is not None and report['rows_read'] >= max_rows:
+            break
+
+    if reservoir is not None:
+        if not reservoir.seen:
+            raise ValueError(f"No hay filas de entrenamiento en {path}")
+        train_data = reservoir.frame()
+    else:
+        if not column_chunks:
+            raise ValueError(f"No hay filas de entrenamiento en {path}")
+
+        # Concatenar columna por columna para no duplicar el dataset completo en memoria
+        dataset = {}
+        for name in list(column_chunks):
+            dataset[name] = np.concatenate(column_chunks.pop(name))
+        train_data = pd.DataFrame(dataset, copy=False)
+
+    report['rows'] = len(train_data)
+    report['dataset_mb'] = _frame_mb(train_data)
+    report['peak_rss_mb'] = _peak_rss_mb()
+
+    logger.info("Datos de entrenamiento cargados", **report)
+    return train_data, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Archivo CSV o Parquet con transacciones etiquetadas")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Filas por bloque")
+    parser.add_argument("--max-rows", type=int, default=None, help="Máximo de filas a leer")
+    parser.add_argument("--label-column", default=LABEL_COLUMN, help="Columna con la etiqueta de fraude")
+    parser.add_argument("--sample-rows", type=int, default=None, help="Tamaño de la muestra uniforme a conservar")
+    args = parser.parse_args()
+
+    train_data, report = load_training_data(
+        args.path, args.chunk_size, args.max_rows, args.label_column, sample_rows=args.sample_rows
+    )
+    for key, value in report.items():
+        print(f"{key:24s} {value:.1f}" if isinstance(value, float) else f"{key:24s} {value}")
+    print(f"{'fraud_rate':24s} {train_data[args.label_column].mean():.4f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Generador vectorizado de datos simulados para entrenamiento
+
+Uso (desde ml-service/):
+    python -m app.training.simulated_data --rows 10000000 --output data/simulated.csv
+"""
+import argparse
+import os
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..features.encoder import HIGH_AMOUNT, ROUND_AMOUNT, TRANSACTION_FEATURES
+from ..features.velocity import VELOCITY_FEATURES, VELOCITY_KEY_FIELDS, VELOCITY_WINDOWS
+
+LABEL_COLUMN = 'is_fraud'
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Por tipo de llave: transacciones previas esperadas en cada ventana (1m, 1h, 24h) y fracción de
+# transacciones que traen la llave
+VELOCITY_PROFILES = {
+    'card': ((0.05, 0.5, 3.0), 0.95),
+    'bin': ((20.0, 1000.0, 20000.0), 1.0),
+    'device': ((0.05, 0.5, 3.0), 0.6),
+    'ip': ((0.1, 1.0, 5.0), 0.8),
+}
+# Fracción de transacciones dentro de una ráfaga (tarjeta probada o cuenta tomada)
+BURST_RATE = 0.03
+
+
+def _simulate_velocity(rng: np.random.Generator, amount: np.ndarray) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Velocity features simuladas y la máscara de ráfagas
+    Las ventanas están anidadas (24h incluye 1h, que incluye 1m) y cuentan la transacción actual
+    """
+    n_samples = len(amount)
+    burst = rng.random(n_samples) < BURST_RATE
+    burst_size = rng.poisson(5, n_samples) * burst
+
+    columns = {}
+    for key_type in VELOCITY_KEY_FIELDS:
+        rates, presence = VELOCITY_PROFILES[key_type]
+        present = rng.random(n_samples) < presence
+        previous = np.zeros(n_samples)
+        if key_type != 'bin':
+            previous += burst_size
+
+        for (window, _, _), rate in zip(VELOCITY_WINDOWS, rates):
+            previous += rng.poisson(rate, n_samples)
+            count = (1 + previous) * present
+            # Montos previos con la misma distribución log-normal de las transacciones
+            amount_sum = (amount + previous * rng.lognormal(10, 1.5, n_samples)) * present
+            columns[f'{key_type}_count_{window}'] = count.astype(np.float32)
+            columns[f'{key_type}_amount_{window}'] = amount_sum.astype(np.float32)
+
+    return columns, burst
+
+
+def _simulate_chunk(
+    rng: np.random.Generator,
+    n_samples: int,
+    include_velocity: bool = False,
+    fraud_threshold: float = 0.0
+) -> pd.DataFrame:
+    """
+    Genera `n_samples` transacciones con todas las columnas como arrays de NumPy
+    `fraud_threshold` sube el corte del fraud_score: mismas features, menos fraudes y concentrados
+    en las transacciones con factores de riesgo
+    """
+    amount = rng.lognormal(10, 2, n_samples)  # Distribución log-normal para montos
+    hour = rng.integers(0, 24, n_samples, dtype=np.int8)
+    day_of_week = rng.integers(0, 7, n_samples, dtype=np.int8)
+
+    mcc_high_risk = (rng.random(n_samples) < 0.1).astype(np.int8)
+    mcc_medium_risk = (rng.random(n_samples) < 0.2).astype(np.int8)
+    mcc_numeric = rng.integers(1000, 9999, n_samples, dtype=np.int16)
+    country_high_risk = (rng.random(n_samples) < 0.05).astype(np.int8)
+    country_medium_risk = (rng.random(n_samples) < 0.15).astype(np.int8)
+    country_domestic = (rng.random(n_samples) < 0.7).astype(np.int8)
+    bin_high_risk = (rng.random(n_samples) < 0.02).astype(np.int8)
+    bin_numeric = rng.integers(100000, 999999, n_samples, dtype=np.int32)
+
+    # Features derivadas
+    is_night = ((hour >= 22) | (hour <= 6)).astype(np.int8)
+    is_business_hours = ((hour >= 8) & (hour <= 18)).astype(np.int8)
+    is_weekend = ((day_of_week == 0) | (day_of_week == 6)).astype(np.int8)
+    is_friday = (day_of_week == 5).astype(np.int8)
+    amount_log = np.log(amount + 1)
+    is_high_amount = (amount >= HIGH_AMOUNT).astype(np.int8)
+    is_round_amount = (amount % ROUND_AMOUNT == 0).astype(np.int8)
+
+    # Determinar si es fraude basado en reglas de riesgo, con ruido aleatorio
+    fraud_score = (
+        30 * country_high_risk
+        + 25 * mcc_high_risk
+        + 15 * is_night
+        + 20 * is_high_amount
+        + 35 * bin_high_risk
+        + rng.normal(0, 10, n_samples)
+    )
+    
+    names = TRANSACTION_FEATURES
+    velocity = {}
+    if include_velocity:
+        velocity, burst = _simulate_velocity(rng, amount)
+        fraud_score = fraud_score + 40 * burst
+        names = TRANSACTION_FEATURES + VELOCITY_FEATURES
+    
+    # sigmoid(fraud_score / 20) > 0.5 equivale a fraud_score > 0
+    is_fraud = (fraud_score > fraud_threshold).astype(np.int8)
+
+    columns = {
+        'amount': amount,
+        'hour': hour,
+        'dayOfWeek': day_of_week,
+        'mcc_high_risk': mcc_high_risk,
+        'mcc_medium_risk': mcc_medium_risk,
+        'mcc_numeric': mcc_numeric,
+        'country_high_risk': country_high_risk,
+        'country_medium_risk': country_medium_risk,
+        'country_domestic': country_domestic,
+        'bin_high_risk': bin_high_risk,
+        'bin_numeric': bin_numeric,
+        'is_night': is_night,
+        'is_business_hours': is_business_hours,
+        'is_weekend': is_weekend,
+        'is_friday': is_friday,
+        'amount_log': amount_log,
+        'is_high_amount': is_high_amount,
+        'is_round_amount': is_round_amount,
+        **velocity,
+        LABEL_COLUMN: is_fraud,
+    }
+    return pd.DataFrame({name: columns[name] for name in (*names, LABEL_COLUMN)}, copy=False)
+
+
+def iter_simulated_chunks(
+    n_samples: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: int = 42,
+    include_velocity: bool = False
+) -> Iterator[pd.DataFrame]:
+    """Genera el dataset en bloques de `chunk_size` filas con un único generador sembrado"""
+    rng = np.random.default_rng(seed)
+    remaining = n_samples
+
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        yield _simulate_chunk(rng, size, include_velocity)
+        remaining -= size
+
+
+def generate_simulated_data(
+    n_samples: int,
+    seed: int = 42,
+    include_velocity: bool = False,
+    fraud_threshold: float = 0.0
+) -> pd.DataFrame:
+    """Genera el dataset completo en memoria (con velocity features si `include_velocity`)"""
+    rng = np.random.default_rng(seed)
+    return _simulate_chunk(rng, n_samples, include_velocity, fraud_threshold)
+
+
+def write_simulated_data(
+    path: str,
+    n_samples: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    seed: int = 42,
+    include_velocity: bool = False
+) -> str:
+    """
+    Escribe el dataset en disco bloque a bloque (CSV o Parquet según la extensión)
+    La memoria usada es la de un solo bloque, así que permite datasets más grandes que la RAM
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.tmp"
+    parquet_writer = None
+
+    try:
+        for i, chunk in enumerate(iter_simulated_chunks(n_samples, chunk_size, seed, include_velocity)):
+            if path.endswith('.parquet'):
+                parquet_writer = _write_parquet_chunk(parquet_writer, tmp_path, chunk)
+            else:
+                chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    os.replace(tmp_path, path)
+    return path
+
+
+def _write_parquet_chunk(writer: Optional[object], path: str, chunk: pd.DataFrame):
+    """Agrega un bloque a un archivo Parquet (requiere pyarrow)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Escribir Parquet requiere pyarrow instalado") from e
+
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema)
+    writer.write_table(table)
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, required=True, help="Número de transacciones a generar")
+    parser.add_argument("--output", required=True, help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Filas por bloque")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del generador")
+    parser.add_argument("--velocity", action="store_true", help="Incluir velocity features simuladas")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    write_simulated_data(args.output, args.rows, args.chunk_size, args.seed, args.velocity)
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.rows} filas escritas en {args.output} en {elapsed:.1f}s ({args.rows / elapsed:,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Control de admisión bajo sobrecarga: respuestas a tiempo con y sin admisión
+
+Publica un modelo en un registro temporal y envía /predict en lazo abierto a cada tasa de --rps,
+llamando a la app ASGI directamente: cada llegada crea su tarea en el instante programado, como
+uvicorn al recibir un request, sin el costo de un cliente HTTP que compita por la CPU. Cada request
+lleva el header de deadline igual a --timeout (el timeout de axios del backend).
+
+Por modo (sin admisión y con ADMISSION_CONTROL_ENABLED) y tasa reporta cuántas respuestas llegaron
+antes del timeout, cuántas con el modelo y cuántas con el score de reglas, los descartes (503/504)
+y la latencia desde la llegada programada. Las respuestas después del timeout son trabajo perdido:
+el caller ya las descartó.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_admission --output admission.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import shutil
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from app.config import settings
+
+from .bench_startup import _prepare_registry
+from .report import environment, summarize_latencies, write_report
+from .synthetic import generate_transactions
+
+
+async def _call(app, body: bytes, headers: List, arrival: float, timeout: float, latencies: List[float], outcomes: Counter):
+    """Un request ASGI completo; clasifica la respuesta y si llegó antes del timeout del caller"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': '/predict', 'raw_path': b'/predict', 'query_string': b'',
+        'root_path': '', 'headers': headers, 'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 80),
+    }
+    response: Dict[str, Any] = {'body': b''}
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+
+    await app(scope, receive, send)
+    latency = time.perf_counter() - arrival
+
+    if latency > timeout:
+        outcomes['late'] += 1
+    elif response['status'] != 200:
+        outcomes[str(response['status'])] += 1
+    else:
+        outcomes['fallback' if json.loads(response['body']).get('fallback') else 'model'] += 1
+        latencies.append(latency)
+
+
+async def _open_loop(args: argparse.Namespace, rps: float, bodies: List[bytes]) -> Dict[str, Any]:
+    """Llegadas a `rps` fijo durante --duration, más el tiempo para terminar las pendientes"""
+    from app.main import app
+
+    headers = [
+        (b'content-type', b'application/json'),
+        (args.deadline_header.lower().encode(), str(args.timeout * 1000).encode()),
+    ]
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+    tasks = set()
+
+    async with app.router.lifespan_context(app):
+        interval = 1.0 / rps
+        started = next_arrival = time.perf_counter()
+        i = 0
+        while next_arrival < started + args.duration:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(
+                _call(app, bodies[i % len(bodies)], headers, next_arrival, args.timeout, latencies, outcomes)
+            )
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            i += 1
+            next_arrival += interval
+        if tasks:
+            await asyncio.gather(*tasks)
+        drained = time.perf_counter() - started
+
+    requests = sum(outcomes.values())
+    on_time = outcomes['model'] + outcomes['fallback']
+    return {
+        'requests': requests,
+        'outcomes': dict(outcomes),
+        'on_time_rate': on_time / requests if requests else 0.0,
+        'model_rate': outcomes['model'] / requests if requests else 0.0,
+        'goodput_rps': on_time / args.duration,
+        'model_goodput_rps': outcomes['model'] / args.duration,
+        # Tiempo hasta responder la última llegada: con la cola acumulada se extiende más allá de la carga
+        'drain_seconds': drained - args.duration,
+        'latency': summarize_latencies(latencies),
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    bodies = [json.dumps(payload).encode() for payload in generate_transactions(args.unique_transactions, seed=args.seed)]
+    model_path = _prepare_registry()
+    settings.ADMISSION_MAX_IN_FLIGHT = args.max_in_flight
+    settings.ADMISSION_DEADLINE_HEADER = args.deadline_header
+
+    results: Dict[str, Any] = {}
+    try:
+        for mode in ('off', 'on'):
+            settings.ADMISSION_CONTROL_ENABLED = mode == 'on'
+            results[f'admission_{mode}'] = {}
+            for rps in (float(rate) for rate in args.rps.split(",") if rate):
+                print(f"Admisión {mode}, {rps:g} rps...", file=sys.stderr)
+                results[f'admission_{mode}'][f'rps_{rps:g}'] = asyncio.run(_open_loop(args, rps, bodies))
+    finally:
+        shutil.rmtree(model_path, ignore_errors=True)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", default="300,1000,2000", help="Tasas de llegada a medir")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de carga por tasa")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Timeout del caller y deadline enviado (s)")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="ADMISSION_MAX_IN_FLIGHT")
+    parser.add_argument("--deadline-header", default="X-Request-Timeout-Ms")
+    parser.add_argument("--unique-transactions", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    # Los mensajes del entrenamiento van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+
+    write_report({'kind': 'admission', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+    for mode, rates in results.items():
+        for rate, summary in rates.items():
+            print(
+                f"{mode} {rate}: a tiempo {summary['on_time_rate']:.1%} (modelo {summary['model_rate']:.1%}) | "
+                f"p99 {summary['latency'].get('p99_ms', float('nan')):.0f} ms | {summary['outcomes']}",
+                file=sys.stderr
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
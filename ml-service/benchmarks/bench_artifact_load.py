@@ -0,0 +1,118 @@
+"""
+Tiempo de carga y memoria por worker: artefacto joblib frente al ensemble compilado con mmap
+
+Lanza N procesos que cargan el mismo artefacto a la vez (como N workers de uvicorn en un host)
+y reporta el tiempo de carga, el tiempo total de arranque del proceso, RSS y PSS. PSS reparte
+las páginas compartidas entre los procesos que las mapean, por lo que refleja el costo real por worker.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_artifact_load --workers 4
+"""
+import argparse
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+
+ARTIFACT_FILE = "model.joblib"
+COMPILED_DIR = "compiled"
+
+
+def _memory_mb() -> Dict[str, float]:
+    """RSS y PSS del proceso actual en MB (PSS solo disponible en Linux)"""
+    memory = {'rss_mb': float('nan'), 'pss_mb': float('nan')}
+    try:
+        with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                if key in ("Rss", "Pss"):
+                    memory[f"{key.lower()}_mb"] = int(value.split()[0]) / 1024
+    except OSError:
+        import resource
+        memory['rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return memory
+
+
+def _worker(artifact_format: str, directory: str, barrier, results):
+    """Carga el artefacto, hace una predicción y reporta memoria con todos los workers vivos"""
+    from app.models.fraud_detector import FraudDetector
+
+    start = time.perf_counter()
+    if artifact_format == "joblib":
+        detector = FraudDetector.from_artifact(os.path.join(directory, ARTIFACT_FILE))
+    else:
+        detector = FraudDetector.from_compiled(os.path.join(directory, COMPILED_DIR))
+    load_ms = (time.perf_counter() - start) * 1000
+
+    # Una predicción toca las páginas del modelo que usa el camino de request
+    detector.predict(np.zeros(len(detector.feature_names)))
+
+    results.put({'ready_at': time.time(), 'load_ms': load_ms})
+    barrier.wait()
+    results.put(_memory_mb())
+    barrier.wait()
+
+
+def _run_workers(artifact_format: str, directory: str, workers: int) -> Dict[str, float]:
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers + 1)
+    results = ctx.Queue()
+
+    started_at = time.time()
+    processes = [
+        ctx.Process(target=_worker, args=(artifact_format, directory, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    ready = [results.get() for _ in range(workers)]
+    barrier.wait()
+    memory = [results.get() for _ in range(workers)]
+    barrier.wait()
+    for process in processes:
+        process.join()
+
+    return {
+        'load_ms': statistics.median(r['load_ms'] for r in ready),
+        'startup_s': max(r['ready_at'] for r in ready) - started_at,
+        'rss_mb': statistics.median(m['rss_mb'] for m in memory),
+        'pss_mb': statistics.median(m['pss_mb'] for m in memory),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="Procesos que cargan el artefacto a la vez")
+    args = parser.parse_args()
+
+    from app.models.fraud_detector import FraudDetector
+
+    with tempfile.TemporaryDirectory() as directory:
+        detector = FraudDetector.train_new("bench")
+        detector.save(os.path.join(directory, ARTIFACT_FILE))
+        detector.save_compiled(os.path.join(directory, COMPILED_DIR))
+
+        joblib_mb = os.path.getsize(os.path.join(directory, ARTIFACT_FILE)) / 1024 ** 2
+        compiled_mb = sum(
+            entry.stat().st_size for entry in os.scandir(os.path.join(directory, COMPILED_DIR))
+        ) / 1024 ** 2
+        print(f"Tamaño en disco: joblib {joblib_mb:.1f} MB | compilado {compiled_mb:.1f} MB")
+
+        print(f"{args.workers} workers (mediana por worker)")
+        for artifact_format in ("joblib", "compiled"):
+            stats = _run_workers(artifact_format, directory, args.workers)
+            print(
+                f"  {artifact_format:8s} | carga {stats['load_ms']:8.1f} ms | arranque {stats['startup_s']:5.2f} s"
+                f" | RSS {stats['rss_mb']:7.1f} MB | PSS {stats['pss_mb']:7.1f} MB"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
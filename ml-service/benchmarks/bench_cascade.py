@@ -0,0 +1,120 @@
+"""
+Scoring en cascada: salida temprana, alertas perdidas y CPU por transacción
+
+Para cada corte del fraud_score del simulador de --fraud-thresholds entrena un modelo con datos
+simulados y, sobre tráfico simulado nuevo con el mismo corte, compara el ensemble completo con la
+cascada: filas que salen en la primera etapa, alertas (risk_score >= MEDIUM_RISK_THRESHOLD)
+perdidas, coincidencia de risk_level, y latencia de una fila y de lotes, medidas intercaladas.
+
+Con el corte por defecto del simulador (0) ~72 % del tráfico es fraude y la mitad sin factores de
+riesgo tiene etiqueta 50/50, con risk_score alrededor del umbral medio: ninguna hoja es claramente
+legítima y la calibración casi no deja salir filas. Con corte 35 (~9 % de fraude, concentrado en las
+transacciones con factores de riesgo) esa mitad queda bien por debajo del umbral.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_cascade --output cascade.json
+"""
+import argparse
+import contextlib
+import sys
+import warnings
+from typing import Any, Dict
+
+import numpy as np
+
+from app.config import settings
+from app.models.explainer import risk_level_indices
+from app.models.fraud_detector import FraudDetector
+from app.training.simulated_data import LABEL_COLUMN, generate_simulated_data
+
+from .bench_explainer import _measure_pair
+from .bench_micro import _cycle
+from .report import environment, write_report
+
+
+def _scenario(args: argparse.Namespace, fraud_threshold: float) -> Dict[str, Any]:
+    detector = FraudDetector(auto_load=False)
+    detector.model_version = "bench"
+    detector.training_source = 'simulated'
+    detector._fit(generate_simulated_data(args.train_rows, seed=42, fraud_threshold=fraud_threshold))
+
+    traffic = generate_simulated_data(args.rows, seed=args.seed, fraud_threshold=fraud_threshold)
+    X = traffic[detector.feature_names].to_numpy(dtype=np.float64)
+    full = detector._score_matrix(X, cascade=False)
+    cascade = detector._score_matrix(X)
+    exited = detector.cascade.exits[detector.cascade.apply(X)]
+    alerts = full['risk_score'] >= settings.MEDIUM_RISK_THRESHOLD * 100
+
+    results: Dict[str, Any] = {
+        'fraud_rate': float(traffic[LABEL_COLUMN].mean()),
+        'calibration': detector.cascade.report,
+        'early_exit_rate': float(exited.mean()),
+        'alert_recall_loss': float((exited & alerts).sum() / max(int(alerts.sum()), 1)),
+        'risk_level_agreement': float(
+            (risk_level_indices(full['risk_score']) == risk_level_indices(cascade['risk_score'])).mean()
+        ),
+    }
+
+    rows = [X[i:i + 1] for i in range(min(len(X), 4096))]
+    next_row = _cycle(rows)
+    full_row, cascade_row = _measure_pair(
+        lambda: detector._score_matrix(next_row(), explain=True, cascade=False),
+        lambda: detector._score_matrix(next_row(), explain=True),
+        args.iterations
+    )
+    results['row_full'], results['row_cascade'] = full_row, cascade_row
+
+    for size in (int(size) for size in args.batch_sizes.split(",") if size):
+        batch = np.resize(X, (size, X.shape[1]))
+        full_batch, cascade_batch = _measure_pair(
+            lambda: detector._score_matrix(batch, explain=True, cascade=False),
+            lambda: detector._score_matrix(batch, explain=True),
+            max(5, args.iterations // size)
+        )
+        results[f'batch_{size}'] = {
+            'full_per_row_us': full_batch['p50_ms'] * 1000 / size,
+            'cascade_per_row_us': cascade_batch['p50_ms'] * 1000 / size,
+            'speedup': full_batch['p50_ms'] / cascade_batch['p50_ms'],
+        }
+    return results
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    settings.CASCADE_ENABLED = True
+    results: Dict[str, Any] = {}
+    for fraud_threshold in (float(threshold) for threshold in args.fraud_thresholds.split(",") if threshold):
+        print(f"Corte del fraud_score {fraud_threshold:g}...", file=sys.stderr)
+        results[f'fraud_threshold_{fraud_threshold:g}'] = _scenario(args, fraud_threshold)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fraud-thresholds", default="0,35", help="Cortes del fraud_score del simulador")
+    parser.add_argument("--train-rows", type=int, default=20000, help="Filas simuladas de entrenamiento")
+    parser.add_argument("--rows", type=int, default=20000, help="Filas simuladas de tráfico")
+    parser.add_argument("--iterations", type=int, default=3000, help="Llamadas por benchmark de una fila")
+    parser.add_argument("--batch-sizes", default="512,5000", help="Tamaños de lote")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    # Los mensajes del entrenamiento van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+
+    write_report({'kind': 'cascade', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+    for name, scenario in results.items():
+        largest = max((key for key in scenario if key.startswith('batch_')), key=lambda key: int(key[6:]))
+        print(
+            f"{name} (fraude {scenario['fraud_rate']:.1%}): salida temprana {scenario['early_exit_rate']:.1%} | alertas perdidas "
+            f"{scenario['alert_recall_loss']:.2%} | {largest} x{scenario[largest]['speedup']:.1f}",
+            file=sys.stderr
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
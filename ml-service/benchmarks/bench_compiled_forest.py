@@ -0,0 +1,79 @@
+"""
+Paridad y benchmark del evaluador de árboles aplanados frente al camino de sklearn
+
+El modelo se entrena en un directorio temporal: no lee ni escribe el artefacto de MODEL_PATH.
+La paridad también se verifica en tests/test_compiled_forest.py.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_compiled_forest --rows 10000 --repeat 200
+"""
+import argparse
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from app.config import settings
+from app.models.fraud_detector import FraudDetector
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    """Tiempo promedio por llamada en milisegundos"""
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="Filas para la prueba de paridad y el lote")
+    parser.add_argument("--repeat", type=int, default=200, help="Repeticiones para medir una sola fila (se reduce con el tamaño)")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="Diferencia máxima permitida")
+    args = parser.parse_args()
+
+    # El scaler se entrenó con un DataFrame; se silencian los avisos de nombres de columnas
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    with tempfile.TemporaryDirectory(prefix="bench-compiled-forest-") as model_path:
+        settings.MODEL_PATH = model_path
+        detector = FraudDetector()
+    ensemble = detector.compiled_ensemble
+
+    data = detector._generate_simulated_data(args.rows)
+    X = data[detector.feature_names].to_numpy(dtype=np.float64)
+
+    # Paridad
+    sk_probability, sk_anomaly, _ = detector._score_matrix_sklearn(X)
+    compiled_probability, compiled_anomaly = ensemble.score(X)
+    probability_diff = float(np.max(np.abs(sk_probability - compiled_probability)))
+    anomaly_diff = float(np.max(np.abs(sk_anomaly - compiled_anomaly)))
+    outlier_mismatch = int(np.sum((sk_anomaly < 0) != (compiled_anomaly < 0)))
+
+    print(f"Paridad sobre {args.rows} filas")
+    print(f"  max |Δ fraud_probability| = {probability_diff:.3e}")
+    print(f"  max |Δ anomaly_score|     = {anomaly_diff:.3e}")
+    print(f"  is_outlier distintos      = {outlier_mismatch}")
+
+    # Latencia por tamaño de lote (define COMPILED_TREES_MAX_BATCH)
+    print("Latencia por llamada")
+    for size in sorted({1, 8, 64, 256, 512, 1024, args.rows}):
+        if size > args.rows:
+            continue
+        batch = X[:size]
+        repeat = max(3, args.repeat // size)
+        sklearn_ms = _time_per_call(lambda: detector._score_matrix_sklearn(batch), repeat)
+        compiled_ms = _time_per_call(lambda: ensemble.score(batch), repeat)
+        print(f"  {size:6d} filas | sklearn {sklearn_ms:9.3f} ms | compilado {compiled_ms:9.3f} ms | x{sklearn_ms / compiled_ms:.1f}")
+
+    if probability_diff > args.tolerance or anomaly_diff > args.tolerance or outlier_mismatch:
+        print("ERROR: el evaluador compilado no coincide con sklearn", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Costo por request y memoria del monitor de drift
+
+Entrena un modelo con datos simulados (que genera el perfil de referencia) y mide: observe de una
+fila y de lotes, report, y la memoria del monitor antes y después de --observations filas. Verifica
+además la sensibilidad: PSI máximo con datos simulados nuevos de la misma distribución (debería
+quedar bajo 0.1) y PSI de amount con los montos multiplicados por --amount-shift.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_drift --output drift.json
+"""
+import argparse
+import contextlib
+import sys
+from typing import Any, Dict
+
+import numpy as np
+
+from app.models.drift import DriftMonitor
+from app.models.fraud_detector import FraudDetector
+from app.training.simulated_data import generate_simulated_data
+
+from .bench_micro import _cycle, _measure
+from .report import environment, rss_mb, write_report
+
+
+def _monitor(detector: FraudDetector, window_size: int) -> DriftMonitor:
+    return DriftMonitor(detector.drift_reference, detector.model_version, window_size=window_size, min_observations=0)
+
+
+def _feed(monitor: DriftMonitor, detector: FraudDetector, X: np.ndarray, batch_size: int = 512):
+    for i in range(0, len(X), batch_size):
+        block = X[i:i + batch_size]
+        monitor.observe(block, detector.score_matrix(block)['risk_score'])
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    detector = FraudDetector.train_new("bench")
+    feature_names = detector.feature_names
+
+    # Tráfico con la misma distribución que el entrenamiento (otra semilla)
+    traffic = generate_simulated_data(args.rows, seed=args.seed)
+    X = traffic[feature_names].to_numpy(dtype=np.float64)
+    risk_scores = detector.score_matrix(X)['risk_score']
+
+    monitor = _monitor(detector, args.window_size)
+    rows = [(X[i], risk_scores[i]) for i in range(min(len(X), 4096))]
+    next_row = _cycle(rows)
+
+    n = args.iterations
+    print("Una fila...", file=sys.stderr)
+    results['observe_row'] = _measure(lambda: monitor.observe(*next_row()), n)
+    results['report'] = _measure(monitor.report, max(100, n // 50))
+
+    print("Lotes...", file=sys.stderr)
+    for size in (int(size) for size in args.batch_sizes.split(",") if size):
+        batch, batch_scores = np.resize(X, (size, X.shape[1])), np.resize(risk_scores, size)
+        summary = _measure(lambda: monitor.observe(batch, batch_scores), max(5, n // size))
+        results[f'observe_batch_{size}'] = {'p50_ms': summary['p50_ms'], 'per_row_us': summary['p50_ms'] * 1000 / size}
+
+    # Memoria: los histogramas no crecen con el tráfico
+    print(f"Memoria con {args.observations:,} observaciones...", file=sys.stderr)
+    monitor = _monitor(detector, args.window_size)
+    nbytes_start, rss_start = monitor.nbytes, rss_mb()
+    block, block_scores = np.resize(X, (1000, X.shape[1])), np.resize(risk_scores, 1000)
+    for _ in range(args.observations // 1000):
+        monitor.observe(block, block_scores)
+    results['memory'] = {
+        'monitor_bytes_start': nbytes_start,
+        'monitor_bytes_end': monitor.nbytes,
+        'rss_growth_mb': rss_mb() - rss_start,
+    }
+
+    # Sensibilidad: misma distribución frente a montos desplazados
+    print("Sensibilidad...", file=sys.stderr)
+    monitor = _monitor(detector, args.window_size)
+    _feed(monitor, detector, X)
+    same = monitor.report()
+    results['psi_same_distribution_max'] = max(values['psi'] for values in same['features'].values())
+    results['psi_same_distribution_risk_score'] = same['risk_score']['psi']
+
+    shifted = X.copy()
+    amount = feature_names.index('amount')
+    shifted[:, amount] *= args.amount_shift
+    shifted[:, feature_names.index('amount_log')] = np.log1p(shifted[:, amount])
+    monitor = _monitor(detector, args.window_size)
+    _feed(monitor, detector, shifted)
+    drifted = monitor.report()
+    results['psi_shifted_amount'] = drifted['features']['amount']['psi']
+    results['psi_shifted_risk_score'] = drifted['risk_score']['psi']
+    results['drifted_features'] = drifted['drifted_features']
+
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000, help="Filas simuladas de tráfico")
+    parser.add_argument("--iterations", type=int, default=20000, help="Llamadas por benchmark de una fila")
+    parser.add_argument("--batch-sizes", default="64,512", help="Tamaños de lote")
+    parser.add_argument("--window-size", type=int, default=10000, help="Observaciones por ventana")
+    parser.add_argument("--observations", type=int, default=1_000_000, help="Filas para medir la memoria")
+    parser.add_argument("--amount-shift", type=float, default=3.0, help="Factor aplicado a los montos")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    # Los mensajes del entrenamiento van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+
+    write_report({'kind': 'drift', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+    print(
+        f"observe por fila: {results['observe_row']['p50_ms'] * 1000:.1f} µs (p50) | "
+        f"PSI misma distribución {results['psi_same_distribution_max']:.3f} | "
+        f"PSI monto x{args.amount_shift:g} {results['psi_shifted_amount']:.2f}",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Costo de las explicaciones (risk_level y decision_reason) por predicción
+
+Entrena un modelo con datos simulados y mide: construcción del explicador (contribuciones por hoja),
+predict de una fila con y sin explicación, contributions + reasons por separado y predict_batch
+con y sin explicación. Verifica además que bias + suma de contribuciones = fraud_probability.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_explainer --output explainer.json
+"""
+import argparse
+import contextlib
+import sys
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+from app.models.explainer import ForestExplainer
+from app.models.fraud_detector import FraudDetector
+from app.schemas.prediction import PredictionRequest
+
+from .bench_micro import _cycle, _measure
+from .report import environment, summarize_latencies, write_report
+from .synthetic import generate_transactions
+
+
+def _measure_pair(plain: Callable[[], Any], explained: Callable[[], Any], iterations: int):
+    """Mide ambas variantes intercaladas para que el ruido de la máquina afecte a las dos por igual"""
+    for _ in range(3):
+        plain()
+        explained()
+
+    latencies: Tuple[List[float], List[float]] = ([], [])
+    for _ in range(iterations):
+        for fn, samples in ((plain, latencies[0]), (explained, latencies[1])):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+    return summarize_latencies(latencies[0]), summarize_latencies(latencies[1])
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    detector = FraudDetector.train_new("bench")
+    ensemble = detector.compiled_ensemble
+    encoder = detector.feature_encoder
+
+    requests = [PredictionRequest(**transaction) for transaction in generate_transactions(1024, seed=args.seed)]
+    matrix = encoder.encode_batch(requests)
+    rows = [matrix[i:i + 1] for i in range(len(matrix))]
+    next_row = _cycle(rows)
+
+    start = time.perf_counter()
+    explainer = ForestExplainer(ensemble, detector.feature_names)
+    results['build_ms'] = (time.perf_counter() - start) * 1000
+    results['explainer_kb'] = explainer.nbytes / 1024
+    detector.explainer = explainer
+
+    leaves = ensemble.apply(matrix)[:ensemble.n_rf_trees]
+    contributions = explainer.contributions(leaves)
+    fraud_probability, _ = ensemble.score(matrix)
+    results['additivity_max_error'] = float(np.abs(explainer.bias + contributions.sum(axis=1) - fraud_probability).max())
+
+    n = args.iterations
+    print("Una fila...", file=sys.stderr)
+    results['score_row'], results['score_row_explained'] = _measure_pair(
+        lambda: detector._score_matrix(next_row()),
+        lambda: detector._score_matrix(next_row(), explain=True),
+        n
+    )
+    row_leaves = [leaves[:, i:i + 1] for i in range(leaves.shape[1])]
+    next_leaves = _cycle(row_leaves)
+    results['contributions_row'] = _measure(lambda: explainer.contributions(next_leaves()), n)
+    row_contributions = [contributions[i:i + 1] for i in range(len(contributions))]
+    next_pair = _cycle(list(zip(rows, row_contributions)))
+    results['reasons_row'] = _measure(lambda: explainer.reasons(*next_pair()), n)
+    results['overhead_row_us'] = (
+        results['score_row_explained']['p50_ms'] - results['score_row']['p50_ms']
+    ) * 1000
+
+    print("Lotes...", file=sys.stderr)
+    for size in (int(size) for size in args.batch_sizes.split(",") if size):
+        batch = np.resize(matrix, (size, matrix.shape[1]))
+        iterations = max(5, n // size)
+        plain, explained = _measure_pair(
+            lambda: detector._score_matrix(batch),
+            lambda: detector._score_matrix(batch, explain=True),
+            iterations
+        )
+        results[f'batch_{size}'] = {
+            'score_ms': plain['p50_ms'],
+            'score_explained_ms': explained['p50_ms'],
+            'overhead_per_row_us': (explained['p50_ms'] - plain['p50_ms']) * 1000 / size,
+        }
+
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000, help="Llamadas por benchmark de una fila")
+    parser.add_argument("--batch-sizes", default="64,512,5000", help="Tamaños de lote")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    # Los mensajes del entrenamiento van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+
+    write_report({'kind': 'explainer', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+    print(
+        f"explicación por fila: +{results['overhead_row_us']:.0f} µs (p50) | "
+        f"error de aditividad {results['additivity_max_error']:.1e}",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
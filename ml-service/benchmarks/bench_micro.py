@@ -0,0 +1,133 @@
+"""
+Micro-benchmarks del camino de predicción, la carga del modelo y el entrenamiento
+
+Mide por llamada: validación de PredictionRequest, to_features, FeatureEncoder.encode_row,
+_prepare_features, predict (compilado y sklearn), predict_batch por tamaño de lote, carga del
+artefacto (joblib y compilado) y entrenamiento con varios tamaños de datos. El reporte es JSON.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_micro --output micro.json
+"""
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import warnings
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from app.config import settings
+from app.models.fraud_detector import FraudDetector
+from app.schemas.prediction import PredictionRequest
+
+from .report import environment, summarize_latencies, write_report
+from .synthetic import generate_transactions
+
+
+def _measure(fn: Callable[[], Any], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """Latencia por llamada (cada llamada se cronometra por separado)"""
+    for _ in range(warmup):
+        fn()
+
+    latencies: List[float] = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    summary = summarize_latencies(latencies)
+    summary['calls_per_second'] = iterations / sum(latencies)
+    return summary
+
+
+def _cycle(items: List[Any]) -> Callable[[], Any]:
+    """Itera los elementos en círculo para no medir siempre la misma entrada"""
+    state = {'i': 0}
+
+    def next_item():
+        state['i'] = (state['i'] + 1) % len(items)
+        return items[state['i']]
+    return next_item
+
+
+def _run_benchmarks(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    transactions = generate_transactions(1024)
+    next_transaction = _cycle(transactions)
+    requests = [PredictionRequest(**transaction) for transaction in transactions]
+    next_request = _cycle(requests)
+
+    detector = FraudDetector.train_new("bench")
+    encoder = detector.feature_encoder
+    vectors = [encoder.encode_row(request) for request in requests]
+    next_vector = _cycle(vectors)
+    feature_dicts = [request.to_features() for request in requests]
+    next_feature_dict = _cycle(feature_dicts)
+
+    n = args.iterations
+    print("Camino de una fila...", file=sys.stderr)
+    results['validate_request'] = _measure(lambda: PredictionRequest(**next_transaction()), n)
+    results['to_features'] = _measure(lambda: next_request().to_features(), n)
+    results['encode_row'] = _measure(lambda: encoder.encode_row(next_request()), n)
+    results['prepare_features'] = _measure(lambda: detector._prepare_features(next_feature_dict()), n)
+    results['predict_compiled'] = _measure(lambda: detector.predict(next_vector()), n)
+
+    use_compiled = settings.USE_COMPILED_TREES
+    settings.USE_COMPILED_TREES = False
+    try:
+        results['predict_sklearn'] = _measure(lambda: detector.predict(next_vector()), max(50, n // 10))
+    finally:
+        settings.USE_COMPILED_TREES = use_compiled
+
+    print("Lotes...", file=sys.stderr)
+    matrix = np.vstack(vectors)
+    for size in (int(size) for size in args.batch_sizes.split(",") if size):
+        batch = np.resize(matrix, (size, matrix.shape[1]))
+        summary = _measure(lambda: detector.predict_batch(batch), max(5, n // size))
+        summary['rows_per_second'] = summary['calls_per_second'] * size
+        results[f'predict_batch_{size}'] = summary
+
+    print("Carga del modelo...", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as directory:
+        joblib_path = os.path.join(directory, "model.joblib")
+        compiled_path = os.path.join(directory, "compiled")
+        detector.save(joblib_path)
+        detector.save_compiled(compiled_path)
+        results['load_joblib'] = _measure(lambda: FraudDetector.from_artifact(joblib_path), 10, warmup=1)
+        results['load_compiled'] = _measure(lambda: FraudDetector.from_compiled(compiled_path), 50, warmup=1)
+
+    print("Entrenamiento...", file=sys.stderr)
+    training_samples = settings.SIMULATED_TRAINING_SAMPLES
+    try:
+        for size in (int(size) for size in args.train_sizes.split(",") if size):
+            settings.SIMULATED_TRAINING_SAMPLES = size
+            results[f'train_{size}'] = _measure(lambda: FraudDetector.train_new("bench"), 1, warmup=0)
+    finally:
+        settings.SIMULATED_TRAINING_SAMPLES = training_samples
+
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000, help="Llamadas por benchmark de una fila")
+    parser.add_argument("--batch-sizes", default="16,128,1024", help="Tamaños de lote para predict_batch")
+    parser.add_argument("--train-sizes", default="1000,10000", help="Filas simuladas para medir entrenamiento")
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    # Los mensajes del entrenamiento van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = _run_benchmarks(args)
+
+    write_report({'kind': 'micro', 'environment': environment(), 'benchmarks': results}, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Profiling en el worker: costo de cada modo sobre la latencia de /predict
+
+Publica un modelo en un registro temporal y envía /predict secuencialmente a la app ASGI en proceso
+(como bench_admission) sin profiling, con el profile continuo de 1 de cada K requests
+(--sample-every), con una sesión cprofile que mide todos los requests y con el muestreo de pilas
+del event loop y de todos los hilos. Los escenarios se alternan en --rounds rondas, rotando el orden,
+para repartir el ruido de la máquina; se reporta la latencia de cada uno y su costo medio frente al
+baseline.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_profiling --output profiling.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import shutil
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.profiling import CPROFILE, SAMPLING
+
+from .bench_admission import _call
+from .bench_startup import _prepare_registry
+from .report import environment, summarize_latencies, write_report
+from .synthetic import generate_transactions
+
+# (PROFILING_SAMPLE_EVERY, sesión: (modo, all_threads) o None)
+Scenario = Tuple[int, Optional[Tuple[str, bool]]]
+
+
+def _scenarios(args: argparse.Namespace) -> Dict[str, Scenario]:
+    scenarios: Dict[str, Scenario] = {'off': (0, None)}
+    for every in (int(every) for every in args.sample_every.split(",") if every):
+        scenarios[f'continuous_1_in_{every}'] = (every, None)
+    scenarios['cprofile_session'] = (0, (CPROFILE, False))
+    scenarios['sampling_loop'] = (0, (SAMPLING, False))
+    scenarios['sampling_all_threads'] = (0, (SAMPLING, True))
+    return scenarios
+
+
+async def _scenario(args: argparse.Namespace, scenario: Scenario, bodies: List[bytes]) -> List[float]:
+    import app.main as service
+
+    sample_every, session = scenario
+    settings.PROFILING_SAMPLE_EVERY = sample_every
+    headers = [(b'content-type', b'application/json')]
+    latencies: List[float] = []
+    outcomes: Counter = Counter()
+
+    async with service.app.router.lifespan_context(service.app):
+        for body in bodies[:args.warmup]:
+            await _call(service.app, body, headers, time.perf_counter(), float('inf'), [], outcomes)
+        if session is not None:
+            mode, all_threads = session
+            service.request_profiler.start(
+                mode, requests=args.requests, seconds=3600.0, interval_ms=args.interval_ms, all_threads=all_threads
+            )
+        for i in range(args.requests):
+            await _call(service.app, bodies[i % len(bodies)], headers, time.perf_counter(), float('inf'), latencies, outcomes)
+
+    if set(outcomes) != {'model'}:
+        raise RuntimeError(f"Respuestas inesperadas: {dict(outcomes)}")
+    return latencies
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    bodies = [json.dumps(payload).encode() for payload in generate_transactions(args.unique_transactions, seed=args.seed)]
+    model_path = _prepare_registry()
+    scenarios = _scenarios(args)
+
+    latencies: Dict[str, List[float]] = {name: [] for name in scenarios}
+    try:
+        for round_index in range(args.rounds):
+            print(f"Ronda {round_index + 1}/{args.rounds}...", file=sys.stderr)
+            # El orden rota en cada ronda: ningún escenario corre siempre primero
+            names = list(scenarios)
+            names = names[round_index % len(names):] + names[:round_index % len(names)]
+            for name in names:
+                latencies[name] += asyncio.run(_scenario(args, scenarios[name], bodies))
+    finally:
+        shutil.rmtree(model_path, ignore_errors=True)
+
+    results = {name: summarize_latencies(values) for name, values in latencies.items()}
+    baseline = results['off']['mean_ms']
+    for summary in results.values():
+        summary['overhead_pct'] = (summary['mean_ms'] / baseline - 1) * 100
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="Requests medidos por escenario y ronda")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=6, help="Rondas alternando los escenarios")
+    parser.add_argument("--sample-every", default="100,10", help="Valores de PROFILING_SAMPLE_EVERY a medir")
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="Intervalo del muestreo de pilas")
+    parser.add_argument("--unique-transactions", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    # Los mensajes del entrenamiento van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+
+    write_report({'kind': 'profiling', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+    for name, summary in results.items():
+        print(
+            f"{name}: media {summary['mean_ms']:.3f} ms | p50 {summary['p50_ms']:.3f} ms | p99 {summary['p99_ms']:.3f} ms | "
+            f"costo {summary['overhead_pct']:+.1f} %",
+            file=sys.stderr
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
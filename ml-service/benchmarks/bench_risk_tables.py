@@ -0,0 +1,123 @@
+"""
+Carga y costo de consulta de las tablas de riesgo (MCC, país y BIN) según su tamaño
+
+Para cada tamaño de --bin-ranges genera tablas aleatorias en un directorio temporal, mide la
+carga (RiskTables.load, lo que cuesta cada recarga en caliente) y, con esas tablas instaladas,
+encode_row por transacción y encode_batch por lote. El costo de consulta debe ser constante.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_risk_tables --output risk_tables.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.features.encoder import TRANSACTION_FEATURES, FeatureEncoder
+from app.features.risk_tables import (
+    BIN_FILE, BIN_SPACE, COUNTRY_FILE, MCC_FILE, MCC_SPACE, RiskTables, get_risk_tables, set_risk_tables
+)
+from app.schemas.prediction import PredictionRequest
+
+from .report import environment, summarize_latencies, write_report
+from .synthetic import generate_transactions
+
+
+def _write_tables(directory: str, bin_ranges: int, seed: int):
+    rng = np.random.default_rng(seed)
+    tiers = np.array(['low', 'medium', 'high'])
+
+    mccs = rng.choice(MCC_SPACE, size=2000, replace=False)
+    with open(os.path.join(directory, MCC_FILE), 'w') as f:
+        f.write('mcc,tier\n')
+        f.writelines(f'{mcc:04d},{tier}\n' for mcc, tier in zip(mccs, rng.choice(tiers, size=len(mccs))))
+
+    countries = {chr(65 + i // 26) + chr(65 + i % 26) for i in rng.integers(0, 26 * 26, size=200)}
+    with open(os.path.join(directory, COUNTRY_FILE), 'w') as f:
+        f.write('country,tier\n')
+        f.writelines(f'{country},{rng.integers(0, 3)}\n' for country in sorted(countries))
+
+    starts = rng.integers(0, BIN_SPACE - 1000, size=bin_ranges)
+    ends = starts + rng.integers(0, 1000, size=bin_ranges)
+    with open(os.path.join(directory, BIN_FILE), 'w') as f:
+        f.write('bin_start,bin_end,tier\n')
+        f.writelines(
+            f'{start:06d},{end:06d},{tier}\n'
+            for start, end, tier in zip(starts, ends, rng.choice(tiers, size=bin_ranges))
+        )
+
+
+def _timed(fn, items: List[Any]) -> Dict[str, float]:
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    summary = summarize_latencies(latencies)
+    summary['calls_per_second'] = len(items) / sum(latencies)
+    return summary
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    encoder = FeatureEncoder(TRANSACTION_FEATURES)
+    requests = [PredictionRequest(**transaction) for transaction in generate_transactions(1024, seed=args.seed)]
+    rows = [requests[i % len(requests)] for i in range(args.iterations)]
+    batches = [requests[:args.batch_size]] * max(5, args.iterations // args.batch_size)
+
+    results: Dict[str, Any] = {}
+    previous = get_risk_tables()
+    try:
+        for bin_ranges in args.bin_ranges:
+            print(f"{bin_ranges:,} rangos de BIN...", file=sys.stderr)
+            with tempfile.TemporaryDirectory() as directory:
+                _write_tables(directory, bin_ranges, args.seed)
+                load_ms = []
+                for _ in range(args.loads):
+                    start = time.perf_counter()
+                    tables = RiskTables.load(directory)
+                    load_ms.append((time.perf_counter() - start) * 1000)
+
+            set_risk_tables(tables)
+            batch = _timed(encoder.encode_batch, batches)
+            batch['rows_per_second'] = batch['calls_per_second'] * args.batch_size
+            results[str(bin_ranges)] = {
+                'load_ms': min(load_ms),
+                'summary': tables.summary(),
+                'encode_row': _timed(encoder.encode_row, rows),
+                f'encode_batch_{args.batch_size}': batch,
+            }
+    finally:
+        set_risk_tables(previous)
+
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bin-ranges", type=int, nargs='+', default=[1000, 100_000, 500_000],
+                        help="Tamaños de la tabla de BIN a medir")
+    parser.add_argument("--loads", type=int, default=3, help="Cargas por tamaño (se reporta la mejor)")
+    parser.add_argument("--iterations", type=int, default=20000, help="Llamadas a encode_row por tamaño")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Filas por encode_batch")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    results = run(args)
+    write_report({'kind': 'risk_tables', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+
+    for bin_ranges, result in results.items():
+        print(
+            f"{int(bin_ranges):>9,} rangos | carga {result['load_ms']:.0f} ms | "
+            f"encode_row p50 {result['encode_row']['p50_ms'] * 1000:.1f} µs",
+            file=sys.stderr
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
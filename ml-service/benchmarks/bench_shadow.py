@@ -0,0 +1,157 @@
+"""
+Latencia del champion con y sin shadow scoring
+
+Registra en un directorio temporal un champion y un challenger (entrenado con otra cantidad de datos
+simulados) y ejecuta la prueba de carga de /predict en proceso alternando rondas sin shadow y con
+shadow. Reporta p50/p99 de cada modo con las latencias de todas sus rondas, las filas evaluadas y
+descartadas por el challenger y el costo de `submit` (lo único que agrega el shadow al request).
+Falla (exit 1) si la mediana, entre rondas, del cociente p99 con shadow / p99 sin shadow empeora
+más que --max-p99-regression: comparar ronda contra ronda descuenta el ruido de la máquina.
+
+Por defecto la carga es de lazo cerrado (CPU saturada): el challenger, con SCHED_IDLE, casi no recibe
+CPU y descarta bloques en lugar de frenar al champion. Con --rps en lazo abierto hay CPU libre y el
+challenger alcanza a evaluar todo.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_shadow --output shadow.json
+    python -m benchmarks.bench_shadow --rps 200 --output shadow_rps.json
+"""
+import argparse
+import asyncio
+import contextlib
+import shutil
+import sys
+import tempfile
+import time
+from statistics import median
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.models.fraud_detector import FraudDetector
+from app.models.registry import ModelRegistry
+
+from .bench_micro import _measure
+from .load_test import LoadStats, _client, _closed_loop, _open_loop, _payloads
+from .report import environment, summarize_latencies, write_report
+
+CHAMPION_VERSION = "1.0.0"
+CHALLENGER_VERSION = "1.0.1"
+
+
+def _prepare_registry(args: argparse.Namespace) -> str:
+    """Registro temporal con el champion activo y el challenger solo registrado"""
+    settings.MODEL_PATH = tempfile.mkdtemp(prefix="bench-shadow-")
+    settings.RETRAIN_INTERVAL_HOURS = 0
+    registry = ModelRegistry()
+    registry.publish(FraudDetector.train_new(CHAMPION_VERSION))
+
+    samples = settings.SIMULATED_TRAINING_SAMPLES
+    settings.SIMULATED_TRAINING_SAMPLES = args.challenger_samples
+    try:
+        registry.register(FraudDetector.train_new(CHALLENGER_VERSION))
+    finally:
+        settings.SIMULATED_TRAINING_SAMPLES = samples
+    return settings.MODEL_PATH
+
+
+async def _phase(args: argparse.Namespace, shadow: bool) -> Tuple[List[float], Dict[str, Any]]:
+    """Una ronda de carga; retorna las latencias y el estado del shadow al cerrar la ventana"""
+    import app.main as service
+
+    settings.SHADOW_MODEL_VERSION = CHALLENGER_VERSION if shadow else ""
+    payloads = _payloads(args)
+    stats = LoadStats()
+    generate = _open_loop if args.rps > 0 else _closed_loop
+
+    async with _client(args) as client:
+        # El calentamiento también da tiempo a que arranque el proceso challenger
+        await generate(client, args, payloads, stats, time.perf_counter() + args.warmup)
+        stats.recording = True
+        started = time.perf_counter()
+        await generate(client, args, payloads, stats, started + args.duration)
+        elapsed = time.perf_counter() - started
+
+        shadow_stats = submit = None
+        scorer = service.shadow_scorer
+        if shadow and scorer is not None:
+            shadow_stats = scorer.stats()
+            # Costo en el request, ya fuera de la ventana (incluye el envío amortizado de cada bloque)
+            row = np.zeros(len(scorer.feature_names))
+            result = {'risk_score': 50.0, 'fraud_probability': 0.5}
+            submit = _measure(lambda: scorer.submit(row, result), args.submit_iterations)
+
+    return stats.latencies, {
+        'requests': len(stats.latencies),
+        'errors': stats.errors,
+        'throughput_rps': len(stats.latencies) / elapsed,
+        'latency': summarize_latencies(stats.latencies),
+        'shadow': shadow_stats,
+        'submit': submit,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: Dict[str, List[float]] = {'off': [], 'on': []}
+    rounds: List[Dict[str, Any]] = []
+
+    for round_index in range(args.rounds):
+        for mode in ('off', 'on'):
+            print(f"Ronda {round_index + 1}: shadow {mode}...", file=sys.stderr)
+            phase_latencies, summary = await _phase(args, shadow=mode == 'on')
+            latencies[mode].extend(phase_latencies)
+            rounds.append({'round': round_index + 1, 'shadow_mode': mode, **summary})
+
+    results: Dict[str, Any] = {mode: summarize_latencies(values) for mode, values in latencies.items()}
+    p99 = {mode: [entry['latency']['p99_ms'] for entry in rounds if entry['shadow_mode'] == mode] for mode in latencies}
+    results['p99_regression'] = median(on / off for off, on in zip(p99['off'], p99['on'])) - 1
+    results['submit'] = rounds[-1]['submit']
+    shadow_rounds = [entry['shadow'] for entry in rounds if entry['shadow']]
+    results['shadow_submitted'] = sum(entry['submitted'] for entry in shadow_rounds)
+    results['shadow_scored'] = sum(entry['scored'] for entry in shadow_rounds)
+    results['shadow_dropped'] = sum(entry['dropped'] for entry in shadow_rounds)
+    results['agreement_rate'] = shadow_rounds[-1]['agreement_rate'] if shadow_rounds else None
+    results['rounds'] = rounds
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5, help="Rondas de cada modo (se alternan)")
+    parser.add_argument("--duration", type=float, default=6.0, help="Segundos de medición por ronda")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Segundos de calentamiento por ronda")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clientes concurrentes / máximo en vuelo")
+    parser.add_argument("--rps", type=float, default=0.0, help="Tasa de llegada fija (0 = lazo cerrado)")
+    parser.add_argument("--challenger-samples", type=int, default=5000, help="Filas simuladas del challenger")
+    parser.add_argument("--max-p99-regression", type=float, default=0.10, help="Empeoramiento máximo del p99")
+    parser.add_argument("--submit-iterations", type=int, default=20000, help="Llamadas para medir submit")
+    parser.add_argument("--unique-transactions", type=int, default=5000)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+    # Campos que espera la prueba de carga
+    args.url, args.endpoint, args.batch_size = None, "/predict", 1
+
+    with contextlib.redirect_stdout(sys.stderr):
+        model_path = _prepare_registry(args)
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            shutil.rmtree(model_path, ignore_errors=True)
+
+    ok = results['p99_regression'] <= args.max_p99_regression
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'url')}
+    write_report({'kind': 'shadow', 'environment': environment(), 'config': config, 'results': results}, args.output)
+    print(
+        f"p99 sin shadow {results['off']['p99_ms']:.2f} ms | con shadow {results['on']['p99_ms']:.2f} ms | "
+        f"mediana por ronda {results['p99_regression']:+.1%} | submit {results['submit']['p50_ms'] * 1000:.1f} µs | "
+        f"challenger: {results['shadow_scored']:,} evaluadas, {results['shadow_dropped']:,} descartadas",
+        file=sys.stderr
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Arranque en frío: import, carga del modelo y primera predicción en procesos nuevos
+
+Publica un modelo en un registro temporal y lanza --runs intérpretes nuevos que importan app.main,
+ejecutan el lifespan (tablas de riesgo y carga de la versión activa desde el registro) y envían dos
+requests a /predict en proceso. Reporta la mediana de cada etapa, el RSS y si el camino de serving
+llegó a importar sklearn o pandas (no debería: solo los usa el entrenamiento).
+
+Con --server-runs además arranca uvicorn y mide el tiempo hasta que /health/ready responde 200 y
+hasta la primera predicción por HTTP. Con el registro vacío mide /health/live (el proceso responde
+sin entrenar) y el tiempo hasta que el entrenamiento inicial en segundo plano deja el servicio listo.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_startup --output startup.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.models.fraud_detector import FraudDetector
+from app.models.registry import ModelRegistry
+
+from .report import environment, write_report
+from .synthetic import generate_transactions
+
+ML_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en un intérprete nuevo; imprime una línea JSON con los tiempos
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.main as service
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+payload = json.loads(sys.argv[1])
+with TestClient(service.app) as client:
+    ready = time.perf_counter()
+    first = client.post("/predict", json=payload)
+    first_done = time.perf_counter()
+    second = client.post("/predict", json=payload)
+    second_done = time.perf_counter()
+    health = client.get("/health").json()
+from benchmarks.report import rss_mb
+print(json.dumps({
+    'import_s': imported - started,
+    'lifespan_s': ready - imported,
+    'model_load_ms': health['model_load_ms'],
+    'artifact_format': health['artifact_format'],
+    'first_prediction_ms': (first_done - ready) * 1000,
+    'second_prediction_ms': (second_done - first_done) * 1000,
+    'status_codes': [first.status_code, second.status_code],
+    'sklearn_loaded': 'sklearn' in sys.modules,
+    'pandas_loaded': 'pandas' in sys.modules,
+    'rss_mb': rss_mb(),
+}))
+"""
+
+
+def _env(model_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        'MODEL_PATH': model_path,
+        'RETRAIN_INTERVAL_HOURS': '0',
+        'LOG_TO_STDOUT': 'false',
+        'PYTHONPATH': ML_SERVICE_DIR,
+        'PYTHONWARNINGS': 'ignore',
+    })
+    return env
+
+
+def _prepare_registry() -> str:
+    """Registro temporal con una versión publicada (ensemble compilado + joblib)"""
+    model_path = tempfile.mkdtemp(prefix="bench-startup-")
+    settings.MODEL_PATH = model_path
+    ModelRegistry().publish(FraudDetector.train_new("1.0.0"))
+    return model_path
+
+
+def _interpreter_s() -> float:
+    """Arranque del intérprete solo, para separarlo del costo del servicio"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+
+def _probe(model_path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE, json.dumps(payload)],
+        cwd=ML_SERVICE_DIR, env=_env(model_path), capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_s'] = time.perf_counter() - started
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(url: str, payload: Optional[Dict[str, Any]] = None) -> Optional[int]:
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=2) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def _wait_for(url: str, started: float, timeout: float) -> Optional[float]:
+    """Segundos desde `started` hasta que `url` responde 200; None si se agota el tiempo"""
+    while time.perf_counter() - started < timeout:
+        if _request(url) == 200:
+            return time.perf_counter() - started
+        time.sleep(0.02)
+    return None
+
+
+def _server(model_path: str, payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """Arranca uvicorn y mide live, ready y la primera predicción por HTTP"""
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ML_SERVICE_DIR, env=_env(model_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        live_s = _wait_for(f"{base_url}/health/live", started, timeout)
+        ready_s = _wait_for(f"{base_url}/health/ready", started, timeout)
+        first_prediction_s = None
+        if ready_s is not None and _request(f"{base_url}/predict", payload) == 200:
+            first_prediction_s = time.perf_counter() - started
+        return {'live_s': live_s, 'ready_s': ready_s, 'first_prediction_s': first_prediction_s}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _median(runs: List[Dict[str, Any]], key: str) -> Optional[float]:
+    values = [run[key] for run in runs if run[key] is not None]
+    return median(values) if values else None
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    payload = generate_transactions(1, seed=args.seed)[0]
+    results: Dict[str, Any] = {'interpreter_s': median(_interpreter_s() for _ in range(3))}
+
+    print("Preparando el registro...", file=sys.stderr)
+    model_path = _prepare_registry()
+    try:
+        runs = []
+        for run_index in range(args.runs):
+            print(f"Proceso {run_index + 1}/{args.runs}...", file=sys.stderr)
+            runs.append(_probe(model_path, payload))
+        results['in_process'] = {
+            key: _median(runs, key)
+            for key in ('import_s', 'lifespan_s', 'model_load_ms', 'first_prediction_ms', 'second_prediction_ms',
+                        'process_s', 'rss_mb')
+        }
+        results['in_process'].update({
+            'artifact_format': runs[-1]['artifact_format'],
+            'sklearn_loaded': any(run['sklearn_loaded'] for run in runs),
+            'pandas_loaded': any(run['pandas_loaded'] for run in runs),
+            'errors': sum(code != 200 for run in runs for code in run['status_codes']),
+            'runs': runs,
+        })
+
+        if args.server_runs > 0:
+            runs = []
+            for run_index in range(args.server_runs):
+                print(f"uvicorn {run_index + 1}/{args.server_runs}...", file=sys.stderr)
+                runs.append(_server(model_path, payload, args.timeout))
+            results['server'] = {key: _median(runs, key) for key in ('live_s', 'ready_s', 'first_prediction_s')}
+            results['server']['runs'] = runs
+
+            # Registro vacío: el proceso está vivo enseguida y listo cuando termina el entrenamiento inicial
+            print("uvicorn con el registro vacío...", file=sys.stderr)
+            empty_path = tempfile.mkdtemp(prefix="bench-startup-empty-")
+            try:
+                results['server_empty_registry'] = _server(empty_path, payload, args.timeout)
+            finally:
+                shutil.rmtree(empty_path, ignore_errors=True)
+    finally:
+        shutil.rmtree(model_path, ignore_errors=True)
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Procesos nuevos medidos en proceso")
+    parser.add_argument("--server-runs", type=int, default=3, help="Arranques de uvicorn (0 = no medir)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Segundos máximos por arranque de uvicorn")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    # Los mensajes del entrenamiento van a stderr para que stdout quede solo con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+
+    write_report({'kind': 'startup', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+    in_process = results['in_process']
+    summary = (
+        f"import {in_process['import_s']:.2f} s | lifespan {in_process['lifespan_s'] * 1000:.0f} ms | "
+        f"primera predicción {in_process['first_prediction_ms']:.1f} ms | RSS {in_process['rss_mb']:.0f} MB | "
+        f"sklearn {'sí' if in_process['sklearn_loaded'] else 'no'}, pandas {'sí' if in_process['pandas_loaded'] else 'no'}"
+    )
+    if 'server' in results and results['server']['ready_s'] is not None:
+        summary += f" | uvicorn listo en {results['server']['ready_s']:.2f} s"
+    print(summary, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Costo por request y memoria del velocity store con millones de llaves
+
+Llena el store con --keys tarjetas y dispositivos distintos (IPs y BINs con menos cardinalidad)
+usando un reloj simulado, y mide: update (llave existente y llave nueva, con evicción si el store
+está lleno), lookup, lookup_batch por fila, memoria (arrays preasignados y RSS) y el costo de
+copiar, escribir y restaurar un snapshot.
+
+Uso (desde ml-service/):
+    python -m benchmarks.bench_velocity --keys 1000000 --output velocity.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from app.features.velocity import VelocityStore
+
+from .report import environment, rss_mb, summarize_latencies, write_report
+from .synthetic import generate_transactions
+
+
+class _SimulatedClock:
+    def __init__(self, start: float = 1_700_000_000.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _transaction(base: Dict[str, Any], i: int, keys: int) -> Dict[str, Any]:
+    transaction = dict(base)
+    transaction['cardHash'] = f'card-{i % keys}'
+    transaction['deviceFingerprint'] = f'device-{i % keys}'
+    transaction['ipAddress'] = f'10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}'
+    return transaction
+
+
+def _timed(fn, items: List[Any]) -> Dict[str, float]:
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    summary = summarize_latencies(latencies)
+    summary['calls_per_second'] = len(items) / sum(latencies)
+    return summary
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    clock = _SimulatedClock()
+    rss_start = rss_mb()
+    store = VelocityStore(args.capacity or args.keys, clock=clock)
+    preallocated_mb = sum(
+        sum(array.nbytes for array in (counters.keys, counters.last_seen, *counters.ticks, *counters.counts,
+                                       *counters.amounts, *counters.total_counts, *counters.total_amounts))
+        for counters in store.counters.values()
+    ) / 1024 ** 2
+
+    samples = generate_transactions(1024, seed=args.seed)
+    results: Dict[str, Any] = {'preallocated_mb': preallocated_mb}
+
+    # Llenado: el reloj avanza para repartir las llaves en el tiempo
+    print(f"Llenando {args.keys:,} llaves...", file=sys.stderr)
+    step = args.fill_seconds / args.keys
+    start = time.perf_counter()
+    for i in range(args.keys):
+        clock.now += step
+        store.update(_transaction(samples[i % len(samples)], i, args.keys))
+    fill_seconds = time.perf_counter() - start
+    results['fill'] = {'updates_per_second': args.keys / fill_seconds}
+    results['keys'] = store.key_counts()
+    results['rss_mb'] = rss_mb() - rss_start
+    results['bytes_per_key'] = results['rss_mb'] * 1024 ** 2 / max(1, sum(results['keys'].values()))
+
+    n = args.iterations
+    existing = [_transaction(samples[i % len(samples)], (i * 7919) % args.keys, args.keys) for i in range(n)]
+    new = [_transaction(samples[i % len(samples)], args.keys + i, args.keys * 10) for i in range(n)]
+
+    print("Midiendo...", file=sys.stderr)
+    results['update_existing'] = _timed(store.update, existing)
+    results['update_new_key'] = _timed(store.update, new)
+    results['lookup'] = _timed(store.lookup, existing)
+
+    batch = existing[:args.batch_size]
+    summary = _timed(store.lookup_batch, [batch] * max(5, n // args.batch_size))
+    summary['rows_per_second'] = summary['calls_per_second'] * len(batch)
+    results[f'lookup_batch_{len(batch)}'] = summary
+    results['evictions'] = store.evictions()
+
+    print("Snapshot...", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'velocity.npz')
+        start = time.perf_counter()
+        state = store.snapshot()
+        copy_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        VelocityStore.write_snapshot(state, path)
+        write_seconds = time.perf_counter() - start
+        del state
+
+        restored_store = VelocityStore(args.capacity or args.keys, clock=clock)
+        start = time.perf_counter()
+        restored = restored_store.load_snapshot(path)
+        load_seconds = time.perf_counter() - start
+
+        results['snapshot'] = {
+            'copy_ms': copy_seconds * 1000,
+            'write_ms': write_seconds * 1000,
+            'load_ms': load_seconds * 1000,
+            'file_mb': os.path.getsize(path) / 1024 ** 2,
+            'keys_restored': restored,
+        }
+
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000, help="Tarjetas/dispositivos distintos a registrar")
+    parser.add_argument("--capacity", type=int, default=0, help="Capacidad por tipo de llave (0 = --keys)")
+    parser.add_argument("--fill-seconds", type=float, default=43200.0, help="Tiempo simulado que cubre el llenado")
+    parser.add_argument("--iterations", type=int, default=20000, help="Llamadas por medición")
+    parser.add_argument("--batch-size", type=int, default=256, help="Filas por lookup_batch")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    results = run(args)
+    write_report({'kind': 'velocity', 'environment': environment(), 'config': vars(args), 'results': results}, args.output)
+
+    print(
+        f"update p50 {results['update_existing']['p50_ms'] * 1000:.1f} µs | "
+        f"p99 {results['update_existing']['p99_ms'] * 1000:.1f} µs | "
+        f"{results['bytes_per_key']:.0f} bytes/llave",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Compara dos reportes JSON de benchmarks (bench_micro o load_test) y marca regresiones
+
+Se comparan todas las métricas numéricas comunes. Latencias, tiempos, CPU y memoria son mejores
+si bajan; throughput y llamadas por segundo, si suben. Retorna exit 1 si alguna métrica empeora
+más que --tolerance.
+
+Uso (desde ml-service/):
+    python -m benchmarks.compare baseline.json candidate.json --tolerance 0.10
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+# Métricas que no se comparan (contexto o conteos)
+IGNORED_KEYS = {'count', 'requests', 'elapsed_seconds', 'timestamp', 'cpu_count', 'dropped', 'keys', 'evictions', 'keys_restored'}
+HIGHER_IS_BETTER = ('throughput', 'per_second')
+
+
+def _flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    """Aplana un reporte a {ruta.con.puntos: valor} con solo las métricas numéricas"""
+    metrics: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key in ('environment', 'config', 'slo', 'status_codes') or key in IGNORED_KEYS:
+                continue
+            metrics.update(_flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        metrics[prefix.rstrip(".")] = float(data)
+    return metrics
+
+
+def _higher_is_better(metric: str) -> bool:
+    return any(token in metric for token in HIGHER_IS_BETTER)
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], tolerance: float):
+    """Retorna filas (métrica, base, candidato, cambio relativo, es_regresión)"""
+    base_metrics = _flatten(baseline)
+    candidate_metrics = _flatten(candidate)
+
+    rows = []
+    for metric in sorted(base_metrics.keys() & candidate_metrics.keys()):
+        base, new = base_metrics[metric], candidate_metrics[metric]
+        if base == 0:
+            continue
+        change = (new - base) / abs(base)
+        worse = -change if _higher_is_better(metric) else change
+        rows.append((metric, base, new, change, worse > tolerance))
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", help="Reporte de referencia")
+    parser.add_argument("candidate", help="Reporte a evaluar")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Empeoramiento relativo permitido")
+    parser.add_argument("--only-regressions", action="store_true", help="Mostrar solo las regresiones")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    if baseline.get('kind') != candidate.get('kind'):
+        print(f"Los reportes son de tipos distintos: {baseline.get('kind')} / {candidate.get('kind')}", file=sys.stderr)
+        return 2
+
+    rows = compare(baseline, candidate, args.tolerance)
+    regressions = [row for row in rows if row[4]]
+
+    for metric, base, new, change, regression in rows:
+        if args.only_regressions and not regression:
+            continue
+        flag = "REGRESIÓN" if regression else ""
+        print(f"{metric:50s} {base:14.4f} -> {new:14.4f} {change:+8.1%} {flag}")
+
+    print(f"{len(regressions)} regresiones de {len(rows)} métricas (tolerancia {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""
+Prueba de carga de /predict o /predict/batch con transacciones sintéticas
+
+Modos:
+- En proceso (por defecto): la app FastAPI se ejecuta en el mismo proceso con httpx.ASGITransport
+- Contra un servidor: --url http://localhost:5000 (opcionalmente --server-pid para CPU/RSS del servidor)
+
+Perfil:
+- Lazo cerrado: --concurrency clientes envían un request tras otro (--rps 0)
+- Lazo abierto: llegadas a --rps fijo; la latencia se mide desde el instante programado para no
+  ocultar la espera en cola (omisión coordinada). --concurrency limita los requests en vuelo
+
+Reporta throughput, latencias p50/p95/p99/p999, CPU y RSS en JSON y falla (exit 1) si p99 supera
+--slo-p99-ms o la tasa de error supera --max-error-rate.
+
+Uso (desde ml-service/):
+    python -m benchmarks.load_test --duration 30 --concurrency 32 --output load.json
+    python -m benchmarks.load_test --url http://localhost:5000 --rps 500 --duration 60
+"""
+import argparse
+import asyncio
+import contextlib
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from .report import cpu_seconds, environment, rss_mb, summarize_latencies, write_report
+from .synthetic import generate_transactions
+
+
+class LoadStats:
+    """Resultados acumulados durante la ventana de medición"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.status_codes: Counter = Counter()
+        self.errors = 0
+        self.dropped = 0
+        self.recording = False
+
+    def record(self, latency: float, status_code: Optional[int]):
+        if not self.recording:
+            return
+        self.latencies.append(latency)
+        if status_code is None:
+            self.status_codes['connection_error'] += 1
+            self.errors += 1
+        else:
+            self.status_codes[str(status_code)] += 1
+            if status_code >= 400:
+                self.errors += 1
+
+
+def _payloads(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    transactions = generate_transactions(args.unique_transactions, seed=args.seed)
+    if args.endpoint == "/predict":
+        return transactions
+    return [
+        {'transactions': [transactions[(i + j) % len(transactions)] for j in range(args.batch_size)]}
+        for i in range(0, len(transactions), args.batch_size)
+    ]
+
+
+async def _send(client: httpx.AsyncClient, endpoint: str, payload: Dict[str, Any], started: float, stats: LoadStats):
+    try:
+        response = await client.post(endpoint, json=payload)
+        status_code = response.status_code
+    except httpx.HTTPError:
+        status_code = None
+    stats.record(time.perf_counter() - started, status_code)
+
+
+async def _closed_loop(client, args, payloads, stats: LoadStats, deadline: float):
+    async def worker(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            await _send(client, args.endpoint, payloads[i % len(payloads)], time.perf_counter(), stats)
+            i += args.concurrency
+
+    await asyncio.gather(*(worker(offset) for offset in range(args.concurrency)))
+
+
+async def _open_loop(client, args, payloads, stats: LoadStats, deadline: float):
+    interval = 1.0 / args.rps
+    in_flight: set = set()
+    next_arrival = time.perf_counter()
+    i = 0
+
+    while next_arrival < deadline:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if len(in_flight) >= args.concurrency:
+            # El cliente no puede sostener la tasa pedida
+            if stats.recording:
+                stats.dropped += 1
+        else:
+            task = asyncio.create_task(_send(client, args.endpoint, payloads[i % len(payloads)], next_arrival, stats))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        i += 1
+        next_arrival += interval
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+@contextlib.asynccontextmanager
+async def _client(args: argparse.Namespace):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+            yield client
+        return
+
+    from app.main import app
+
+    # ASGITransport no ejecuta el lifespan: se inicia explícitamente para cargar el modelo
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", limits=limits, timeout=timeout) as client:
+            yield client
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    payloads = _payloads(args)
+    stats = LoadStats()
+    generate = _open_loop if args.rps > 0 else _closed_loop
+
+    async with _client(args) as client:
+        # Calentamiento fuera de la ventana de medición
+        if args.warmup > 0:
+            await generate(client, args, payloads, stats, time.perf_counter() + args.warmup)
+
+        pid = args.server_pid if args.url else None
+        cpu_start = cpu_seconds(pid)
+        started = time.perf_counter()
+        stats.recording = True
+        await generate(client, args, payloads, stats, started + args.duration)
+        elapsed = time.perf_counter() - started
+        cpu_used = cpu_seconds(pid) - cpu_start
+        memory = rss_mb(pid)
+
+    requests = len(stats.latencies)
+    transactions_per_request = 1 if args.endpoint == "/predict" else args.batch_size
+
+    return {
+        'requests': requests,
+        'errors': stats.errors,
+        'error_rate': stats.errors / requests if requests else 0.0,
+        'dropped': stats.dropped,
+        'status_codes': dict(stats.status_codes),
+        'elapsed_seconds': elapsed,
+        'throughput_rps': requests / elapsed,
+        'throughput_tps': requests * transactions_per_request / elapsed,
+        'latency': summarize_latencies(stats.latencies),
+        'cpu_seconds': cpu_used,
+        'cpu_utilization': cpu_used / elapsed,
+        'rss_mb': memory,
+        # En proceso, CPU y RSS incluyen al cliente de carga
+        'resource_scope': 'server' if pid else ('client' if args.url else 'client+app'),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL base de un servidor en ejecución (por defecto, app en proceso)")
+    parser.add_argument("--server-pid", type=int, help="PID del servidor para medir su CPU/RSS (con --url)")
+    parser.add_argument("--endpoint", default="/predict", choices=["/predict", "/predict/batch"])
+    parser.add_argument("--batch-size", type=int, default=32, help="Transacciones por request en /predict/batch")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clientes concurrentes / máximo en vuelo")
+    parser.add_argument("--rps", type=float, default=0.0, help="Tasa de llegada fija (0 = lazo cerrado)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de medición")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Segundos de calentamiento")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Timeout por request en segundos (axios del backend: 2 s)")
+    parser.add_argument("--unique-transactions", type=int, default=5000, help="Transacciones sintéticas distintas")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--slo-p99-ms", type=float, default=100.0, help="Objetivo de p99 (README: < 100 ms)")
+    parser.add_argument("--max-error-rate", type=float, default=0.001)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    # Los logs de arranque del servicio en proceso van a stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        results = asyncio.run(run_load(args))
+
+    config = {key: value for key, value in vars(args).items() if key != 'output'}
+    slo_ok = results['latency'].get('p99_ms', float('inf')) <= args.slo_p99_ms
+    errors_ok = results['error_rate'] <= args.max_error_rate
+    results['slo'] = {'p99_ms': args.slo_p99_ms, 'p99_ok': slo_ok, 'errors_ok': errors_ok}
+
+    write_report({'kind': 'load', 'environment': environment(), 'config': config, 'results': results}, args.output)
+
+    latency = results['latency']
+    print(
+        f"{results['throughput_rps']:.0f} req/s | p50 {latency.get('p50_ms', 0):.2f} ms | "
+        f"p99 {latency.get('p99_ms', 0):.2f} ms | p999 {latency.get('p999_ms', 0):.2f} ms | "
+        f"errores {results['errors']}/{results['requests']}",
+        file=sys.stderr
+    )
+    return 0 if slo_ok and errors_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Utilidades comunes de los benchmarks: percentiles, uso de CPU/memoria y reportes JSON
+"""
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+PERCENTILES = {'p50': 50, 'p95': 95, 'p99': 99, 'p999': 99.9}
+
+
+def summarize_latencies(latencies_s: Sequence[float]) -> Dict[str, float]:
+    """Resumen de latencias en milisegundos"""
+    if not len(latencies_s):
+        return {'count': 0}
+
+    values = np.asarray(latencies_s, dtype=np.float64) * 1000
+    summary = {'count': int(len(values)), 'mean_ms': float(values.mean()), 'max_ms': float(values.max())}
+    for name, percentile in PERCENTILES.items():
+        summary[f'{name}_ms'] = float(np.percentile(values, percentile))
+    return summary
+
+
+def cpu_seconds(pid: Optional[int] = None) -> float:
+    """Tiempo de CPU (usuario + sistema) del proceso actual o de `pid` (Linux)"""
+    if pid is None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime + usage.ru_stime
+
+    with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    # utime y stime son los campos 14 y 15 de /proc/<pid>/stat (en ticks)
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def rss_mb(pid: Optional[int] = None) -> float:
+    """Memoria residente actual en MB (Linux); sin /proc retorna el pico del proceso actual"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def environment() -> Dict[str, Any]:
+    """Contexto de la corrida para comparar reportes"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'timestamp': time.time(),
+    }
+
+
+def write_report(report: Dict[str, Any], output: Optional[str]):
+    """Escribe el reporte como JSON en `output` o en stdout"""
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Reporte escrito en {output}", file=sys.stderr)
+    else:
+        print(text)
@@ -0,0 +1,41 @@
+"""
+Transacciones sintéticas con el formato de PredictionRequest para los benchmarks
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+
+MCCS = ['5411', '5812', '5999', '5541', '5542', '4111', '5732', '7995', '6011', '7801']
+MCC_WEIGHTS = [0.25, 0.2, 0.2, 0.1, 0.05, 0.08, 0.07, 0.02, 0.02, 0.01]
+COUNTRIES = ['CO', 'US', 'BR', 'AR', 'PE', 'EC', 'MX', 'VE']
+COUNTRY_WEIGHTS = [0.7, 0.08, 0.05, 0.04, 0.04, 0.03, 0.04, 0.02]
+BINS = ['411111', '450060', '520082', '530000', '376400', '123456', '654321']
+BIN_WEIGHTS = [0.3, 0.2, 0.2, 0.15, 0.13, 0.01, 0.01]
+
+
+def generate_transactions(n: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Genera `n` payloads reproducibles para /predict"""
+    rng = np.random.default_rng(seed)
+
+    # Montos en COP con cola larga; parte de ellos redondeados a múltiplos de 10K
+    amounts = np.round(rng.lognormal(mean=11.5, sigma=1.2, size=n), 2)
+    round_mask = rng.random(n) < 0.3
+    amounts[round_mask] = np.maximum(10000, np.round(amounts[round_mask], -4))
+
+    mccs = rng.choice(MCCS, size=n, p=MCC_WEIGHTS)
+    countries = rng.choice(COUNTRIES, size=n, p=COUNTRY_WEIGHTS)
+    bins = rng.choice(BINS, size=n, p=BIN_WEIGHTS)
+    hours = rng.integers(0, 24, size=n)
+    days = rng.integers(0, 7, size=n)
+
+    return [
+        {
+            'amount': float(amounts[i]),
+            'merchantCategoryCode': str(mccs[i]),
+            'countryCode': str(countries[i]),
+            'hour': int(hours[i]),
+            'dayOfWeek': int(days[i]),
+            'bin': str(bins[i]),
+        }
+        for i in range(n)
+    ]
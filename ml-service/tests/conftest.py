@@ -0,0 +1,57 @@
+import contextlib
+import os
+import tempfile
+
+# Antes de importar app.config: sin reentrenamiento programado ni logs fuera del directorio temporal
+_log_dir = tempfile.mkdtemp(prefix="smaf-tests-logs-")
+os.environ.setdefault("RETRAIN_INTERVAL_HOURS", "0")
+os.environ.setdefault("BOOTSTRAP_TRAINING", "false")
+os.environ.setdefault("LOG_TO_STDOUT", "false")
+os.environ.setdefault("LOG_FILE", os.path.join(_log_dir, "ml_service.log"))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.models.fraud_detector import FraudDetector
+from app.models.registry import ModelRegistry
+
+
+@pytest.fixture(scope="session")
+def model_path(tmp_path_factory):
+    """Registro temporal con una versión publicada, compartido por la sesión"""
+    path = str(tmp_path_factory.mktemp("models"))
+    settings.MODEL_PATH = path
+    ModelRegistry().publish(FraudDetector.train_new("1.0.0"))
+    return path
+
+
+@pytest.fixture
+def transaction():
+    return {
+        "amount": 150000,
+        "merchantCategoryCode": "5411",
+        "countryCode": "CO",
+        "hour": 14,
+        "dayOfWeek": 2,
+        "bin": "411111",
+    }
+
+
+@pytest.fixture
+def make_client(model_path, monkeypatch):
+    """
+    TestClient con el lifespan completo sobre el registro temporal
+    `overrides` reemplaza settings antes del arranque; se revierten al terminar el test
+    """
+    from app.main import app
+
+    monkeypatch.setattr(settings, "MODEL_PATH", model_path)
+
+    @contextlib.contextmanager
+    def make(**overrides):
+        for name, value in overrides.items():
+            monkeypatch.setattr(settings, name, value)
+        with TestClient(app) as client:
+            yield client
+    return make
@@ -0,0 +1,114 @@
+import contextvars
+from time import perf_counter
+
+import pytest
+
+from app.schemas.prediction import PredictionRequest
+from app.services.admission import (
+    ADMIT,
+    EXPIRED,
+    FALLBACK,
+    FALLBACK_MODEL_VERSION,
+    FALLBACK_REASON_PREFIX,
+    SHED,
+    AdmissionController,
+    fallback_prediction,
+)
+
+DEADLINE_HEADER = "X-Request-Timeout-Ms"
+
+
+def _scope(timeout_ms=None):
+    headers = [] if timeout_ms is None else [(DEADLINE_HEADER.lower().encode(), str(timeout_ms).encode())]
+    return {"headers": headers}
+
+
+def _decide(controller, timeout_ms=None, arrival=None, route="/predict", fallback=True):
+    """enter + decide en un contexto propio, como cada request en el middleware"""
+    def run():
+        ticket = controller.enter(_scope(timeout_ms), perf_counter() if arrival is None else arrival)
+        return ticket, controller.decide(route, fallback=fallback)
+    return contextvars.copy_context().run(run)
+
+
+def test_expired_deadline_is_dropped_in_both_overload_modes():
+    for mode in ("fallback", "reject"):
+        controller = AdmissionController(overload_mode=mode)
+        # Llegó hace 200 ms con un plazo de 100 ms
+        _, decision = _decide(controller, timeout_ms=100, arrival=perf_counter() - 0.2)
+        assert decision == EXPIRED
+
+
+def test_full_in_flight_limit_sheds_or_falls_back_by_mode():
+    fallback = AdmissionController(max_in_flight=1, overload_mode="fallback")
+    first, decision = _decide(fallback)
+    assert decision == ADMIT
+    assert _decide(fallback)[1] == FALLBACK
+    # /predict/batch no tiene score de reglas: siempre 503
+    assert _decide(fallback, route="/predict/batch", fallback=False)[1] == SHED
+    assert fallback.stats()['in_flight'] == 3 and fallback.stats()['admitted'] == 1
+
+    # Al liberarse el lugar, la siguiente llegada vuelve a usar el modelo
+    fallback.leave(first)
+    assert _decide(fallback)[1] == ADMIT
+
+    reject = AdmissionController(max_in_flight=1, overload_mode="reject")
+    assert _decide(reject)[1] == ADMIT
+    assert _decide(reject)[1] == SHED
+
+
+def test_remaining_deadline_shorter_than_scoring_time_degrades():
+    controller = AdmissionController(min_remaining_ms=1.0)
+    controller.observe_scoring(0.5)
+
+    assert _decide(controller, timeout_ms=100)[1] == FALLBACK
+    assert _decide(controller, timeout_ms=10_000)[1] == ADMIT
+    # Sin header ni deadline por defecto no hay plazo que vigilar
+    assert _decide(controller)[1] == ADMIT
+
+
+def test_invalid_overload_mode_is_rejected():
+    with pytest.raises(ValueError, match="ADMISSION_OVERLOAD_MODE"):
+        AdmissionController(overload_mode="drop")
+
+
+def test_fallback_prediction_uses_rule_flags(transaction):
+    day = fallback_prediction(PredictionRequest(**{**transaction, "hour": 14}))
+    night = fallback_prediction(PredictionRequest(**{**transaction, "hour": 2}))
+
+    assert night['risk_score'] == pytest.approx(day['risk_score'] + 15.0)
+    assert night['fraud_probability'] == pytest.approx(night['risk_score'] / 100)
+    assert night['confidence'] == 0.0
+    assert night['model_version'] == FALLBACK_MODEL_VERSION
+    assert night['decision_reason'].startswith(FALLBACK_REASON_PREFIX)
+    assert "Horario nocturno" in night['decision_reason']
+    assert "Horario nocturno" not in day['decision_reason']
+
+
+def test_shed_decisions_map_to_503_and_504():
+    from app.main import _shed_exception
+
+    expired = _shed_exception(EXPIRED)
+    assert expired.status_code == 504
+
+    shed = _shed_exception(SHED)
+    assert shed.status_code == 503
+    assert shed.headers == {"Retry-After": "1"}
+
+
+def test_predict_degrades_under_a_short_deadline(make_client, transaction):
+    headers = {DEADLINE_HEADER: "50"}
+    overrides = dict(ADMISSION_CONTROL_ENABLED=True, ADMISSION_MIN_REMAINING_MS=1000.0)
+
+    with make_client(**overrides, ADMISSION_OVERLOAD_MODE="fallback") as client:
+        response = client.post("/predict", json=transaction, headers=headers)
+        assert response.status_code == 200
+        assert response.json()['fallback'] is True
+        assert response.json()['model_version'] == FALLBACK_MODEL_VERSION
+        assert client.post("/predict/batch", json={"transactions": [transaction]}, headers=headers).status_code == 503
+        assert client.post("/predict", json=transaction, headers={DEADLINE_HEADER: "0.001"}).status_code == 504
+
+    with make_client(**overrides, ADMISSION_OVERLOAD_MODE="reject") as client:
+        response = client.post("/predict", json=transaction, headers=headers)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,10 @@
+def test_oversized_batch_is_rejected_before_validating_transactions(make_client, transaction):
+    with make_client(MAX_BATCH_SIZE=3) as client:
+        ok = client.post("/predict/batch", json={"transactions": [transaction] * 3})
+        assert ok.status_code == 200
+        assert len(ok.json()['predictions']) == 3
+
+        # Transacciones inválidas: si se validaran, la respuesta sería 422
+        response = client.post("/predict/batch", json={"transactions": [{"amount": "x"}] * 4})
+        assert response.status_code == 413
+        assert "3 transacciones" in response.json()['detail']
@@ -0,0 +1,113 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import batch_score
+from app.batch_score import CHECKPOINT_SUFFIX, read_checkpoint, run
+
+
+@pytest.fixture
+def transactions_csv(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = 45
+    raw = pd.DataFrame({
+        'transactionId': [f"tx-{i}" for i in range(rows)],
+        'amount': rng.uniform(1000, 500000, rows).round(2),
+        'merchantCategoryCode': rng.choice(['5411', '7995', '5812'], rows),
+        'countryCode': rng.choice(['CO', 'US', 'VE'], rows),
+        'bin': rng.choice(['411111', '123456'], rows),
+        'hour': rng.integers(0, 24, rows),
+        'dayOfWeek': rng.integers(0, 7, rows),
+    })
+    # Fila incompleta: se lee pero no se evalúa
+    raw.loc[12, 'amount'] = np.nan
+    path = tmp_path / "transacciones.csv"
+    raw.to_csv(path, index=False)
+    return str(path)
+
+
+def _args(model_path, input_path, output_path, **overrides):
+    args = dict(
+        input=input_path,
+        output=output_path,
+        model=os.path.join(model_path, "registry", "1.0.0"),
+        workers=1,
+        chunk_size=10,
+        id_column='transactionId',
+        restart=False,
+    )
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_resume_after_crash_matches_uninterrupted_run(model_path, transactions_csv, tmp_path, monkeypatch):
+    expected_path = str(tmp_path / "expected.csv")
+    summary = run(_args(model_path, transactions_csv, expected_path))
+    assert summary['rows_read'] == 45 and summary['rows_scored'] == 44
+    assert not os.path.exists(expected_path + CHECKPOINT_SUFFIX)
+
+    # El tercer bloque falla: quedan dos bloques en disco y el checkpoint en la fila 20
+    output_path = str(tmp_path / "scores.csv")
+    score_chunk = batch_score.score_chunk
+    calls = []
+
+    def crash_on_third_chunk(*args, **kwargs):
+        calls.append(args[0])
+        if len(calls) == 3:
+            raise RuntimeError("proceso caído")
+        return score_chunk(*args, **kwargs)
+
+    monkeypatch.setattr(batch_score, "score_chunk", crash_on_third_chunk)
+    with pytest.raises(RuntimeError):
+        run(_args(model_path, transactions_csv, output_path))
+    checkpoint = read_checkpoint(output_path + CHECKPOINT_SUFFIX)
+    assert checkpoint['rows_read'] == 20
+    assert checkpoint['rows_scored'] == 19
+
+    # Una escritura a medias después del checkpoint se descarta al retomar
+    with open(output_path, 'ab') as f:
+        f.write(b"20,tx-20,0.1")
+
+    monkeypatch.setattr(batch_score, "score_chunk", score_chunk)
+    resumed = run(_args(model_path, transactions_csv, output_path))
+
+    assert resumed['rows_resumed'] == 20
+    assert resumed['rows_read'] == 45 and resumed['rows_scored'] == 44
+    assert _read(output_path) == _read(expected_path)
+    assert not os.path.exists(output_path + CHECKPOINT_SUFFIX)
+
+    scores = pd.read_csv(output_path)
+    assert scores['row'].tolist() == [row for row in range(45) if row != 12]
+    assert scores['transactionId'].tolist() == [f"tx-{row}" for row in range(45) if row != 12]
+
+
+def test_checkpoint_of_another_run_is_rejected_unless_restarting(model_path, transactions_csv, tmp_path, monkeypatch):
+    output_path = str(tmp_path / "scores.csv")
+    score_chunk = batch_score.score_chunk
+
+    def crash_after_first_chunk(first_row, *args, **kwargs):
+        if first_row > 0:
+            raise RuntimeError("proceso caído")
+        return score_chunk(first_row, *args, **kwargs)
+
+    monkeypatch.setattr(batch_score, "score_chunk", crash_after_first_chunk)
+    with pytest.raises(RuntimeError):
+        run(_args(model_path, transactions_csv, output_path))
+    monkeypatch.setattr(batch_score, "score_chunk", score_chunk)
+
+    # Mismo input y modelo pero otra columna de id: no se mezclan salidas de dos ejecuciones
+    with pytest.raises(ValueError, match="id_column"):
+        run(_args(model_path, transactions_csv, output_path, id_column=None))
+
+    summary = run(_args(model_path, transactions_csv, output_path, id_column=None, restart=True))
+    assert summary['rows_resumed'] == 0
+    assert summary['rows_scored'] == 44
+    assert list(pd.read_csv(output_path).columns) == ['row', 'risk_score', 'fraud_probability', 'confidence', 'anomaly_score', 'model_version']
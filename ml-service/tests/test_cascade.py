@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.models.explainer import risk_level_indices
+from app.models.fraud_detector import FraudDetector
+from app.training.simulated_data import generate_simulated_data
+
+
+def _train(fraud_threshold: float) -> FraudDetector:
+    detector = FraudDetector(auto_load=False)
+    detector.model_version = "test"
+    detector.training_source = 'simulated'
+    detector._fit(generate_simulated_data(10000, seed=42, fraud_threshold=fraud_threshold))
+    return detector
+
+
+def _traffic(detector: FraudDetector, fraud_threshold: float) -> np.ndarray:
+    traffic = generate_simulated_data(5000, seed=7, fraud_threshold=fraud_threshold)
+    return traffic[detector.feature_names].to_numpy(dtype=np.float64)
+
+
+@pytest.fixture
+def cascade_enabled(monkeypatch):
+    monkeypatch.setattr(settings, "CASCADE_ENABLED", True)
+
+
+@pytest.fixture(scope="module")
+def _separable_detector() -> FraudDetector:
+    # Corte 35 del simulador: ~9 % de fraude, la mitad del tráfico sin factores de riesgo
+    return _train(fraud_threshold=35)
+
+
+@pytest.fixture
+def separable_detector(_separable_detector, cascade_enabled) -> FraudDetector:
+    _separable_detector.cascade_rows = _separable_detector.cascade_early_exits = 0
+    return _separable_detector
+
+
+def test_early_exit_scores_stay_close_to_the_full_ensemble(separable_detector):
+    detector = separable_detector
+    X = _traffic(detector, fraud_threshold=35)
+
+    full = detector._score_matrix(X, cascade=False)
+    cascade = detector._score_matrix(X)
+    exited = detector.cascade.exits[detector.cascade.apply(X)]
+
+    assert detector.cascade.has_exits
+    assert exited.mean() > 0.3
+    assert detector.cascade_early_exits == exited.sum()
+
+    delta = np.abs(cascade['risk_score'] - full['risk_score'])[exited]
+    assert delta.mean() < 5.0
+    # Las filas que salen temprano no eran alertas del ensemble (pérdida acotada por la calibración)
+    alerts = full['risk_score'][exited] >= settings.MEDIUM_RISK_THRESHOLD * 100
+    assert alerts.mean() <= settings.CASCADE_MAX_RECALL_LOSS
+    assert (risk_level_indices(cascade['risk_score']) == risk_level_indices(full['risk_score'])).mean() >= 0.99
+    # Las filas que no salen reciben exactamente el score del ensemble
+    np.testing.assert_allclose(cascade['risk_score'][~exited], full['risk_score'][~exited])
+
+
+def test_live_counters_are_exact_under_concurrent_scoring(separable_detector):
+    detector = separable_detector
+    X = _traffic(detector, fraud_threshold=35)[:50]
+    exits_per_call = int(detector.cascade.exits[detector.cascade.apply(X)].sum())
+    calls = 400
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: detector._score_matrix(X), range(calls)))
+
+    live = detector.get_model_info()['cascade']['live']
+    assert exits_per_call > 0
+    assert live['rows'] == calls * len(X)
+    assert live['early_exits'] == calls * exits_per_call
+
+
+def test_stage_without_exit_leaves_is_not_evaluated(cascade_enabled):
+    # Datos simulados por defecto: ninguna hoja queda claramente por debajo del umbral medio
+    detector = _train(fraud_threshold=0)
+    X = _traffic(detector, fraud_threshold=0)
+
+    assert not detector.cascade.has_exits
+    np.testing.assert_allclose(detector._score_matrix(X)['risk_score'], detector._score_matrix(X, cascade=False)['risk_score'])
+    assert detector.cascade_rows == 0
+    assert detector.get_model_info()['cascade']['enabled'] is False
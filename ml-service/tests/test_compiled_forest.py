@@ -0,0 +1,46 @@
+import numpy as np
+from sklearn.ensemble import IsolationForest, RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from app.config import settings
+from app.models.compiled_forest import CompiledEnsemble
+from app.models.fraud_detector import FraudDetector
+
+TOLERANCE = 1e-9
+
+
+def _assert_parity(probability, anomaly, sk_probability, sk_anomaly):
+    np.testing.assert_allclose(probability, sk_probability, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(anomaly, sk_anomaly, rtol=0, atol=TOLERANCE)
+    assert np.array_equal(anomaly < 0, sk_anomaly < 0)
+
+
+def test_compiled_ensemble_matches_sklearn():
+    rng = np.random.default_rng(3)
+    scale = [1.0, 10.0, 100.0, 0.1, 5.0]
+    X = rng.normal(size=(1500, 5)) * scale
+    y = (X[:, 0] + X[:, 1] / 10 + rng.normal(scale=0.5, size=len(X)) > 1).astype(int)
+
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    random_forest = RandomForestClassifier(n_estimators=15, max_depth=6, random_state=0).fit(X_scaled, y)
+    # max_features < 1: cada iTree usa un subconjunto de columnas
+    isolation_forest = IsolationForest(n_estimators=15, max_samples=128, max_features=0.6, random_state=0).fit(X_scaled)
+    ensemble = CompiledEnsemble.from_estimators(scaler, random_forest, isolation_forest)
+
+    X_new = rng.normal(size=(500, 5)) * scale
+    _assert_parity(
+        *ensemble.score(X_new),
+        random_forest.predict_proba(scaler.transform(X_new))[:, 1],
+        isolation_forest.decision_function(scaler.transform(X_new))
+    )
+
+
+def test_fraud_detector_compiled_scores_match_sklearn(tmp_path, monkeypatch):
+    # El modelo se entrena y guarda en un directorio temporal, no en el MODEL_PATH del repo
+    monkeypatch.setattr(settings, "MODEL_PATH", str(tmp_path))
+    detector = FraudDetector()
+    X = detector._generate_simulated_data(1000)[detector.feature_names].to_numpy(dtype=np.float64)
+
+    sk_probability, sk_anomaly, _ = detector._score_matrix_sklearn(X)
+    _assert_parity(*detector.compiled_ensemble.score(X), sk_probability, sk_anomaly)
@@ -0,0 +1,31 @@
+import pytest
+
+PROFILE_ROUTES = [
+    ("get", "/debug/profile"),
+    ("post", "/debug/profile"),
+    ("get", "/debug/profile/result"),
+    ("delete", "/debug/profile"),
+]
+
+
+@pytest.mark.parametrize("method,route", PROFILE_ROUTES)
+def test_profile_routes_are_disabled_without_admin_token(make_client, method, route):
+    with make_client(ADMIN_TOKEN=None) as client:
+        assert client.request(method, route).status_code == 404
+
+
+def test_profile_routes_require_the_admin_token(make_client, transaction):
+    headers = {"X-Admin-Token": "secret"}
+    with make_client(ADMIN_TOKEN="secret") as client:
+        assert client.get("/debug/profile").status_code == 403
+        assert client.get("/debug/profile", headers={"X-Admin-Token": "other"}).status_code == 403
+
+        response = client.post("/debug/profile", params={"mode": "cprofile", "requests": 1}, headers=headers)
+        assert response.status_code == 200
+        assert client.post("/predict", json=transaction).status_code == 200
+
+        assert client.get("/debug/profile", headers=headers).json()['session']['requests'] == 1
+        result = client.get("/debug/profile/result", headers=headers)
+        assert result.status_code == 200
+        assert "function calls" in result.text
+        assert client.delete("/debug/profile", headers=headers).status_code == 200
@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.models.drift import INSUFFICIENT_DATA, DriftMonitor, DriftReference
+
+
+def _monitor(min_observations: int) -> DriftMonitor:
+    rng = np.random.default_rng(0)
+    reference = DriftReference.from_data(
+        rng.normal(size=(2000, 2)), rng.uniform(0, 100, 2000), ['amount', 'hour'], n_bins=10
+    )
+    return DriftMonitor(reference, "1.0.0", window_size=1000, min_observations=min_observations)
+
+
+def test_features_report_insufficient_data_until_ready():
+    monitor = _monitor(min_observations=50)
+    monitor.observe(np.array([[5.0, 5.0]]), np.array([99.0]))
+
+    report = monitor.report()
+    assert not report['ready']
+    for values in [report['risk_score'], *report['features'].values()]:
+        assert values == {'psi': None, 'ks': None, 'status': INSUFFICIENT_DATA}
+    assert report['drifted_features'] == []
+
+
+def test_features_report_psi_once_ready():
+    monitor = _monitor(min_observations=50)
+    rng = np.random.default_rng(1)
+    monitor.observe(rng.normal(size=(200, 2)) + [3.0, 0.0], rng.uniform(0, 100, 200))
+
+    report = monitor.report()
+    assert report['ready']
+    assert report['features']['amount']['status'] == 'significant'
+    assert report['features']['hour']['status'] == 'stable'
+    assert report['drifted_features'] == ['amount']
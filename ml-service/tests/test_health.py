@@ -0,0 +1,41 @@
+import os
+import shutil
+import time
+
+
+def test_live_and_ready_with_a_model(make_client):
+    with make_client() as client:
+        live = client.get("/health/live")
+        assert live.status_code == 200
+        assert live.json()['status'] == "alive"
+
+        ready = client.get("/health/ready")
+        assert ready.status_code == 200
+        assert ready.json()['status'] == "ready"
+        assert ready.json()['model_version'] == "1.0.0"
+
+
+def test_empty_registry_is_alive_but_not_ready_until_a_model_is_published(make_client, model_path, tmp_path, transaction):
+    with make_client(MODEL_PATH=str(tmp_path), BOOTSTRAP_TRAINING=False, MODEL_SYNC_INTERVAL_SECONDS=0.05) as client:
+        # El proceso responde aunque no haya modelo: el orquestador no debe reiniciarlo
+        assert client.get("/health/live").status_code == 200
+
+        ready = client.get("/health/ready")
+        assert ready.status_code == 503
+        assert ready.json()['detail']['status'] == "not_ready"
+        assert ready.json()['detail']['bootstrap_job'] is None
+        assert client.post("/predict", json=transaction).status_code == 503
+
+        # Otro worker publica una versión: este la activa al sincronizarse con el puntero CURRENT
+        registry_path = os.path.join(str(tmp_path), "registry")
+        shutil.copytree(os.path.join(model_path, "registry", "1.0.0"), os.path.join(registry_path, "1.0.0"))
+        with open(os.path.join(registry_path, "CURRENT"), "w", encoding="utf-8") as f:
+            f.write("1.0.0")
+
+        deadline = time.monotonic() + 10
+        while client.get("/health/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        assert client.get("/health/ready").json()['model_version'] == "1.0.0"
+        assert client.get("/health/live").status_code == 200
+        assert client.post("/predict", json=transaction).status_code == 200
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.features.encoder import TRANSACTION_FEATURES
+from app.training.ingestion import _Reservoir, load_training_data
+
+
+@pytest.fixture
+def training_csv(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = 50
+    raw = pd.DataFrame({
+        # Montos únicos: identifican cada fila en la muestra
+        'amount': np.arange(rows) * 1000.0 + 500,
+        'merchantCategoryCode': rng.choice(['5411', '7995', '5812'], rows),
+        'countryCode': rng.choice(['CO', 'US', 'NG'], rows),
+        'bin': rng.choice(['411111', '550000'], rows),
+        'hour': rng.integers(0, 24, rows),
+        'dayOfWeek': rng.integers(0, 7, rows),
+        'is_fraud': rng.integers(0, 2, rows),
+    })
+    raw.loc[3, 'amount'] = np.nan
+    path = tmp_path / "training_data.csv"
+    raw.to_csv(path, index=False)
+    return str(path)
+
+
+def test_chunked_load_uses_compact_dtypes_and_matches_single_chunk(training_csv):
+    train_data, report = load_training_data(training_csv, chunk_size=7)
+
+    assert report['chunks'] == 8
+    assert report['rows_read'] == 50
+    assert report['rows_dropped'] == 1
+    assert len(train_data) == 49
+    assert list(train_data.columns) == [*TRANSACTION_FEATURES, 'is_fraud']
+    assert train_data['amount'].dtype == np.float32
+    assert train_data['hour'].dtype == np.int8
+    assert train_data['mcc_numeric'].dtype == np.int16
+    assert train_data['bin_numeric'].dtype == np.int32
+    assert train_data['is_fraud'].dtype == np.int8
+
+    single_chunk, _ = load_training_data(training_csv, chunk_size=1000)
+    pd.testing.assert_frame_equal(train_data, single_chunk)
+
+
+def test_sample_rows_keeps_a_bounded_sample_of_the_whole_file(training_csv):
+    full, _ = load_training_data(training_csv, chunk_size=7)
+    sample, report = load_training_data(training_csv, chunk_size=7, sample_rows=10)
+
+    assert report['rows_read'] == 50
+    assert len(sample) == 10
+    assert sample.dtypes.equals(full.dtypes)
+    # Filas completas del archivo, sin repetir, no solo las primeras
+    merged = sample.merge(full, how='left', indicator=True)
+    assert (merged['_merge'] == 'both').all()
+    assert sample['amount'].is_unique
+    assert sample['amount'].max() > full['amount'].iloc[9]
+
+
+def test_reservoir_sample_is_uniform_across_chunks():
+    rows, size, trials = 20, 5, 1500
+    chunks = [pd.DataFrame({'row': np.arange(start, min(start + 3, rows))}) for start in range(0, rows, 3)]
+    counts = np.zeros(rows)
+    for seed in range(trials):
+        reservoir = _Reservoir(size, seed=seed)
+        for chunk in chunks:
+            reservoir.add(chunk)
+        counts[reservoir.frame()['row'].to_numpy()] += 1
+
+    # Cada fila entra con probabilidad size / rows (desvío estándar ~0.011)
+    np.testing.assert_allclose(counts / trials, size / rows, atol=0.06)
@@ -0,0 +1,60 @@
+import asyncio
+
+from app.services.micro_batcher import MicroBatcher
+
+
+class _Model:
+    """Modelo de prueba: solo acepta vectores de su propio largo"""
+
+    def __init__(self, version: str, n_features: int):
+        self.version = version
+        self.n_features = n_features
+        self.batches = []
+
+    def predict_batch(self, features_list):
+        self.batches.append(len(features_list))
+        for features in features_list:
+            if len(features) != self.n_features:
+                raise ValueError(f"{self.version} espera {self.n_features} features")
+        return [{'model_version': self.version, 'features': features} for features in features_list]
+
+
+def _score(model, features_list):
+    return model.predict_batch(features_list)
+
+
+async def _submit_during_swap(old, new):
+    # Ventana amplia: todas las solicitudes quedan en el mismo lote
+    batcher = MicroBatcher(_score, max_batch_size=64, max_wait_ms=50)
+    await batcher.start()
+    try:
+        # Filas codificadas con la versión anterior, luego se activa la nueva con esas filas aún en cola
+        queued = [asyncio.ensure_future(batcher.submit(old, [1.0] * old.n_features)) for _ in range(3)]
+        await asyncio.sleep(0)
+        swapped = [asyncio.ensure_future(batcher.submit(new, [2.0] * new.n_features)) for _ in range(2)]
+        return await asyncio.gather(*queued, *swapped, return_exceptions=True)
+    finally:
+        await batcher.stop()
+
+
+def test_rows_queued_across_a_model_swap_are_scored_by_their_own_model():
+    old, new = _Model("1.0.0", 3), _Model("1.0.1", 4)
+
+    results = asyncio.run(_submit_during_swap(old, new))
+
+    assert [result['model_version'] for result in results] == ["1.0.0"] * 3 + ["1.0.1"] * 2
+    assert old.batches == [3]
+    assert new.batches == [2]
+
+
+def test_a_failing_model_only_fails_its_own_rows():
+    class _Broken(_Model):
+        def predict_batch(self, features_list):
+            raise RuntimeError("modelo roto")
+
+    old, broken = _Model("1.0.0", 3), _Broken("1.0.1", 3)
+
+    results = asyncio.run(_submit_during_swap(old, broken))
+
+    assert [result['model_version'] for result in results[:3]] == ["1.0.0"] * 3
+    assert all(isinstance(error, RuntimeError) for error in results[3:])
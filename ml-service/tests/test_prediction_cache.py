@@ -0,0 +1,64 @@
+import numpy as np
+
+from app.features.encoder import FeatureEncoder
+from app.services.prediction_cache import PredictionCache
+
+
+def _prediction(**extra):
+    return {
+        'risk_score': 42.0,
+        'fraud_probability': 0.42,
+        'confidence': 0.8,
+        'anomaly_score': 0.05,
+        'is_outlier': False,
+        'model_version': '1.0.0',
+        'processing_time_ms': 1.5,
+        **extra,
+    }
+
+
+def test_hit_returns_every_field_except_the_per_request_ones():
+    cache = PredictionCache(max_entries=10)
+    # Un campo que la predicción no tenía al escribir el cache también se guarda
+    prediction = _prediction(risk_level='medium')
+    cache.put(b'key', prediction)
+
+    expected = {name: value for name, value in prediction.items() if name not in ('model_version', 'processing_time_ms')}
+    assert cache.get(b'key') == expected
+
+
+def test_entries_are_evicted_by_capacity_and_expire():
+    cache = PredictionCache(max_entries=2)
+    for key in (b'a', b'b', b'c'):
+        cache.put(key, _prediction())
+    assert cache.get(b'a') is None
+    assert cache.get(b'c') is not None
+    assert len(cache) == 2
+
+    expired = PredictionCache(max_entries=2, ttl_seconds=-1.0)
+    expired.put(b'a', _prediction())
+    assert expired.get(b'a') is None
+    assert len(expired) == 0
+
+
+def test_key_includes_the_model_version():
+    encoder = FeatureEncoder(['amount', 'hour'])
+    cache = PredictionCache(amount_bucket=1000)
+    features = np.array([150100.0, 14.0])
+
+    assert cache.key(features, encoder, '1.0.0') == cache.key(np.array([150400.0, 14.0]), encoder, '1.0.0')
+    assert cache.key(features, encoder, '1.0.0') != cache.key(features, encoder, '1.0.1')
+
+
+def test_cache_hit_returns_the_same_prediction(make_client, transaction):
+    with make_client(PREDICTION_CACHE_ENABLED=True) as client:
+        first = client.post("/predict", json=transaction)
+        second = client.post("/predict", json=transaction)
+
+    assert first.status_code == 200
+    assert second.status_code == 200, second.text
+    # Todo salvo el tiempo de proceso sale del cache
+    first_body, second_body = first.json(), second.json()
+    first_body.pop("processing_time_ms")
+    second_body.pop("processing_time_ms")
+    assert second_body == first_body
@@ -0,0 +1,85 @@
+import os
+import threading
+
+import pytest
+
+from app.models.fraud_detector import FraudDetector
+from app.models.registry import CURRENT_POINTER, ModelNotFoundError, ModelRegistry
+
+
+@pytest.fixture(scope="module")
+def detectors():
+    return [FraudDetector.train_new("1.0.0"), FraudDetector.train_new("1.0.1")]
+
+
+@pytest.fixture
+def registry(tmp_path, detectors):
+    """Registro con dos versiones publicadas; la activa es 1.0.1"""
+    registry = ModelRegistry(str(tmp_path))
+    for detector in detectors:
+        registry.publish(detector)
+    return registry
+
+
+def _pointer(registry: ModelRegistry) -> str:
+    with open(os.path.join(registry.base_path, CURRENT_POINTER), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_rollback_activates_an_earlier_version(registry):
+    previous = registry.load("1.0.0")
+    assert registry.active.model_version == "1.0.1"
+    assert _pointer(registry) == "1.0.1"
+
+    # La versión anterior sigue en memoria: el rollback no vuelve a cargarla del disco
+    assert registry.activate("1.0.0") is previous
+    assert registry.active is previous
+    assert _pointer(registry) == "1.0.0"
+    assert [(v["model_version"], v["active"]) for v in registry.list_versions()] == [("1.0.0", True), ("1.0.1", False)]
+
+
+def test_unknown_version_leaves_active_model_and_pointer_untouched(registry):
+    active = registry.active
+
+    with pytest.raises(ModelNotFoundError):
+        registry.activate("9.9.9")
+
+    assert registry.active is active
+    assert _pointer(registry) == "1.0.1"
+    assert not [name for name in os.listdir(registry.base_path) if ".tmp-" in name]
+
+
+def test_readers_always_see_a_complete_model_while_activating(registry):
+    expected = {version: registry.load(version) for version in ("1.0.0", "1.0.1")}
+    stop = threading.Event()
+    seen = []
+
+    def read():
+        while not stop.is_set():
+            detector = registry.active
+            seen.append(detector is not None and expected[detector.model_version] is detector)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for i in range(50):
+            registry.activate("1.0.0" if i % 2 == 0 else "1.0.1")
+    finally:
+        stop.set()
+        reader.join()
+
+    assert seen and all(seen)
+    assert _pointer(registry) == "1.0.1"
+
+
+def test_sync_with_pointer_follows_another_worker(registry):
+    # Otro worker sobre el mismo directorio arranca con la versión del puntero
+    worker = ModelRegistry(registry.base_path)
+    assert worker.sync_with_pointer()
+    assert worker.active.model_version == "1.0.1"
+    assert not worker.sync_with_pointer()
+
+    registry.activate("1.0.0")
+    assert worker.sync_with_pointer()
+    assert worker.active.model_version == "1.0.0"
+    assert not worker.sync_with_pointer()
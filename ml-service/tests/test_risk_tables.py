@@ -0,0 +1,86 @@
+import os
+
+import pytest
+
+from app.features import risk_tables
+from app.features.risk_tables import (
+    BIN_FILE,
+    COUNTRY_FILE,
+    MCC_FILE,
+    RiskTables,
+    get_risk_tables,
+    reload_if_changed,
+)
+
+
+def _write(directory, name, content, mtime=None):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    if mtime is not None:
+        # Resolución de mtime del sistema de archivos: se fija explícitamente para que el cambio se note
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def tables_dir(tmp_path, monkeypatch):
+    """Directorio de tablas con MCC y BIN en archivos; país usa la tabla por defecto"""
+    directory = str(tmp_path)
+    _write(directory, MCC_FILE, "mcc,tier\n5411,high\n7995, 1\n", mtime=1_000_000)
+    _write(directory, BIN_FILE, "bin_start,bin_end,tier\n400000,400999,2\n400500,400600,1\n", mtime=1_000_000)
+    # Las tablas globales se restauran al terminar el test
+    monkeypatch.setattr(risk_tables, "_current", RiskTables.load(directory))
+    return directory
+
+
+def test_csv_tables_override_defaults(tables_dir):
+    tables = get_risk_tables()
+
+    assert tables.mcc_tiers[5411] == 2
+    assert tables.mcc_tiers[7995] == 1
+    # Los MCC de la tabla por defecto que no están en el archivo quedan en riesgo bajo
+    assert tables.mcc_tiers[6011] == 0
+    # Rangos solapados: gana el tier más alto
+    assert tables.bin_tiers[[399999, 400000, 400550, 400999, 401000]].tolist() == [0, 2, 2, 2, 0]
+    assert tables.country_tiers['VE'] == 2
+    assert tables.summary()['source'] == {MCC_FILE: 'file', COUNTRY_FILE: 'default', BIN_FILE: 'file'}
+    assert tables.summary()['bin_ranges'] == 2
+
+
+def test_invalid_tier_is_rejected(tmp_path):
+    _write(str(tmp_path), MCC_FILE, "mcc,tier\n5411,critical\n")
+    with pytest.raises(ValueError, match="tier 'critical' inválido"):
+        RiskTables.load(str(tmp_path))
+
+
+def test_reload_picks_up_changed_and_new_files(tables_dir):
+    before = get_risk_tables()
+    assert not reload_if_changed()
+    assert get_risk_tables() is before
+
+    _write(tables_dir, MCC_FILE, "mcc,tier\n5411,0\n7995,high\n", mtime=1_000_100)
+    assert reload_if_changed()
+    after = get_risk_tables()
+    assert after is not before
+    assert after.mcc_tiers[5411] == 0 and after.mcc_tiers[7995] == 2
+    # La instancia anterior no se modifica: los requests en curso la siguen usando completa
+    assert before.mcc_tiers[5411] == 2
+
+    _write(tables_dir, COUNTRY_FILE, "country,tier\nco,high\n")
+    assert reload_if_changed()
+    assert get_risk_tables().country_tiers == {'CO': 2}
+    assert not reload_if_changed()
+
+
+def test_failed_reload_keeps_current_tables(tables_dir):
+    before = get_risk_tables()
+    _write(tables_dir, BIN_FILE, "bin_start,bin_end,tier\n500000,499999,2\n", mtime=1_000_100)
+
+    with pytest.raises(ValueError, match="bin_end menor que bin_start"):
+        reload_if_changed()
+    assert get_risk_tables() is before
+
+    os.remove(os.path.join(tables_dir, BIN_FILE))
+    assert reload_if_changed()
+    assert get_risk_tables().summary()['source'][BIN_FILE] == 'default'
@@ -0,0 +1,48 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.models.registry import ModelRegistry
+from app.services.shadow import DELTA_BUCKETS, ShadowScorer, summarize_pairs
+
+
+def test_summarize_pairs_counts_agreements_deltas_and_level_changes():
+    champion = np.array([10.0, 20.0, 50.0, 80.0, 95.0])
+    challenger = np.array([10.5, 35.0, 48.0, 60.0, 95.0])
+
+    summary = summarize_pairs(champion, challenger)
+
+    assert summary['scored'] == 5
+    # Niveles champion: low low medium high high; challenger: low medium medium medium high
+    assert summary['agreements'] == 3
+    assert summary['level_matrix'] == [[1, 1, 0], [0, 1, 0], [0, 1, 1]]
+    assert summary['delta_sum'] == pytest.approx(-6.5)
+    assert summary['delta_abs_sum'] == pytest.approx(37.5)
+    assert summary['delta_abs_max'] == pytest.approx(20.0)
+    # |delta| 0.5, 15, 2, 20, 0 en los buckets (<1, <5, <10, <25, <50, >=50)
+    assert summary['delta_buckets'] == [2, 1, 0, 2, 0, 0]
+    assert len(summary['delta_buckets']) == len(DELTA_BUCKETS) + 1
+
+
+def test_summarize_pairs_of_an_empty_block():
+    summary = summarize_pairs(np.array([]), np.array([]))
+    assert summary['scored'] == 0
+    assert summary['agreements'] == 0
+    assert summary['delta_abs_max'] == 0.0
+    assert sum(summary['delta_buckets']) == 0
+
+
+def test_accepts_refuses_itself_as_champion_and_different_features(model_path):
+    registry = ModelRegistry(os.path.join(model_path, "registry"))
+    scorer = ShadowScorer(registry, "1.0.0")
+    features = list(scorer.feature_names)
+
+    assert scorer.accepts(SimpleNamespace(model_version="0.9.0", feature_names=features))
+    # El challenger pasó a ser el champion
+    assert not scorer.accepts(SimpleNamespace(model_version="1.0.0", feature_names=features))
+    # Champion con otras features: sus filas codificadas no sirven al challenger
+    assert not scorer.accepts(SimpleNamespace(model_version="1.1.0", feature_names=features[:-1]))
+    assert not scorer.accepts(SimpleNamespace(model_version="1.2.0", feature_names=features[::-1]))
+    assert scorer.accepts(SimpleNamespace(model_version="1.3.0", feature_names=features))
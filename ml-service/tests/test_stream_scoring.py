@@ -0,0 +1,61 @@
+import json
+
+from app.metrics import PREDICTION_COUNTER
+from app.models.fraud_detector import FraudDetector
+
+
+def _ndjson(lines):
+    return "\n".join(lines).encode()
+
+
+def _post_stream(client, body):
+    response = client.post("/predict/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    return {line["line"]: line for line in map(json.loads, response.text.splitlines())}
+
+
+def _error_count():
+    return PREDICTION_COUNTER.labels(result="error")._value.get()
+
+
+def test_invalid_lines_report_errors_and_stream_continues(make_client, transaction):
+    valid = json.dumps({**transaction, "id": "tx-1"})
+    overlong = json.dumps({**transaction, "id": "x" * 400})
+    malformed = json.dumps({"amount": "no-es-un-monto"})
+
+    with make_client(STREAM_CHUNK_SIZE=2, STREAM_MAX_LINE_BYTES=300) as client:
+        errors_before = _error_count()
+        # La última línea, demasiado larga y sin salto de línea final, cae en la rama de cierre del stream
+        lines = _post_stream(client, _ndjson([valid, malformed, "{no es json", overlong, valid, overlong]))
+
+    assert lines[1]["id"] == "tx-1" and "risk_score" in lines[1]
+    assert lines[2]["error"] == "validation"
+    assert lines[3]["error"] == "validation"
+    assert lines[4] == {"line": 4, "error": "line_too_long"}
+    assert "risk_score" in lines[5]
+    assert lines[6] == {"line": 6, "error": "line_too_long"}
+    assert _error_count() - errors_before == 4
+
+
+def test_scoring_failure_reports_chunk_rows_and_stream_continues(make_client, transaction, monkeypatch):
+    original_predict_batch = FraudDetector.predict_batch
+    calls = []
+
+    def failing_first_chunk(self, *args, **kwargs):
+        calls.append(len(args[0]))
+        if len(calls) == 1:
+            raise ValueError("X has 11 features, but model expects 12")
+        return original_predict_batch(self, *args, **kwargs)
+
+    with make_client(STREAM_CHUNK_SIZE=2) as client:
+        monkeypatch.setattr(FraudDetector, "predict_batch", failing_first_chunk)
+        errors_before = _error_count()
+        lines = _post_stream(client, _ndjson([json.dumps(transaction)] * 5))
+
+    assert calls == [2, 2, 1]
+    for line_number in (1, 2):
+        assert lines[line_number]["error"] == "scoring"
+        assert "12" in lines[line_number]["detail"]
+    for line_number in (3, 4, 5):
+        assert "risk_score" in lines[line_number]
+    assert _error_count() - errors_before == 2
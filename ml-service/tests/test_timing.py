@@ -0,0 +1,60 @@
+import contextvars
+import re
+import time
+
+from app.config import settings
+from app.timing import NULL_TIMER, StageTimer, current_timer, start_request_timer
+
+SERVER_TIMING_ENTRY = re.compile(r"^(\w+);dur=(\d+\.\d{3})$")
+
+
+def _stages(header: str):
+    entries = [SERVER_TIMING_ENTRY.match(entry) for entry in header.split(", ")]
+    assert all(entries), header
+    return [(entry.group(1), float(entry.group(2))) for entry in entries]
+
+
+def test_stage_timer_measures_time_since_previous_mark():
+    timer = StageTimer()
+    time.sleep(0.02)
+    timer.mark("encode")
+    timer.mark("model")
+
+    assert [stage for stage, _ in timer.stages] == ["encode", "model"]
+    assert timer.stages[0][1] >= 0.02
+    assert timer.stages[1][1] < timer.stages[0][1]
+    stages = _stages(timer.server_timing())
+    assert stages[0][0] == "encode" and stages[0][1] >= 20.0
+
+
+def test_request_timer_only_for_timed_routes(monkeypatch):
+    def start(path):
+        timer = start_request_timer(path)
+        return timer, current_timer()
+
+    timer, current = contextvars.copy_context().run(start, "/predict")
+    assert isinstance(timer, StageTimer) and current is timer
+
+    timer, current = contextvars.copy_context().run(start, "/health")
+    assert timer is None and current is NULL_TIMER
+
+    monkeypatch.setattr(settings, "STAGE_TIMING_ENABLED", False)
+    timer, current = contextvars.copy_context().run(start, "/predict")
+    assert timer is None and current is NULL_TIMER
+
+
+def test_predict_sends_server_timing_header(make_client, transaction):
+    with make_client(STAGE_TIMING_ENABLED=True) as client:
+        response = client.post("/predict", json=transaction)
+        assert response.status_code == 200
+        stages = [stage for stage, _ in _stages(response.headers["Server-Timing"])]
+        assert stages[0] == "validation"
+        assert {"encode", "combine", "serialize"} <= set(stages)
+        assert stages[-1] == "serialize"
+
+        batch = client.post("/predict/batch", json={"transactions": [transaction] * 3})
+        assert "encode" in batch.headers["Server-Timing"]
+        assert "Server-Timing" not in client.get("/health/live").headers
+
+    with make_client(STAGE_TIMING_ENABLED=False) as client:
+        assert "Server-Timing" not in client.post("/predict", json=transaction).headers
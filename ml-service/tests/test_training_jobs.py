@@ -0,0 +1,94 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models.registry import ModelRegistry
+from app.services import training_jobs
+from app.services.training_jobs import FAILED, TrainingJobManager
+
+
+def _crash_training(model_version: str, output_dir: str):
+    """Simula un proceso de entrenamiento que muere (p. ej. por OOM) sin retornar"""
+    os._exit(1)
+
+
+def test_crashed_training_process_does_not_break_later_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, "_run_training_job", _crash_training)
+
+    async def scenario():
+        manager = TrainingJobManager(ModelRegistry(str(tmp_path)))
+        try:
+            job = manager.submit(trigger="test")
+            await asyncio.gather(*manager._tasks)
+            assert job.status == FAILED
+            assert "terminó abruptamente" in job.error
+
+            # El pool se reemplazó: el próximo proceso de entrenamiento arranca normalmente
+            loop = asyncio.get_running_loop()
+            child_pid = await loop.run_in_executor(manager._executor, os.getpid)
+            assert child_pid != os.getpid()
+        finally:
+            await manager.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_version_allocation_is_unique_across_registries(tmp_path):
+    # Dos instancias sobre el mismo directorio, como dos workers
+    registries = [ModelRegistry(str(tmp_path)), ModelRegistry(str(tmp_path))]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        versions = list(pool.map(lambda i: registries[i % 2].allocate_version(), range(40)))
+
+    assert len(set(versions)) == 40
+    assert registries[0].allocate_version() == "1.0.40"
+
+
+def test_job_status_is_visible_from_another_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, "_run_training_job", _crash_training)
+
+    async def scenario():
+        worker_a = TrainingJobManager(ModelRegistry(str(tmp_path)))
+        worker_b = TrainingJobManager(ModelRegistry(str(tmp_path)))
+        try:
+            job = worker_a.submit(trigger="test")
+            assert worker_b.get(job.job_id).model_version == job.model_version
+            await asyncio.gather(*worker_a._tasks)
+
+            seen = worker_b.get(job.job_id)
+            assert seen.status == FAILED
+            assert seen.finished_at is not None
+            assert [listed["job_id"] for listed in worker_b.list_jobs()] == [job.job_id]
+            assert worker_b.get("../CURRENT") is None
+        finally:
+            await worker_a.shutdown()
+            await worker_b.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_only_one_retrain_runs_per_registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(training_jobs, "_run_training_job", _crash_training)
+
+    async def scenario():
+        worker_a = TrainingJobManager(ModelRegistry(str(tmp_path)))
+        worker_b = TrainingJobManager(ModelRegistry(str(tmp_path)))
+        try:
+            job = worker_a.submit(trigger="test")
+            # El otro worker recibe el job en curso en lugar de lanzar un segundo entrenamiento
+            concurrent = worker_b.submit(trigger="test")
+            assert concurrent.job_id == job.job_id
+            assert not worker_b._tasks
+            assert len(worker_b.list_jobs()) == 1
+
+            # Al terminar el job el lock se libera y cualquier worker puede reentrenar
+            await asyncio.gather(*worker_a._tasks)
+            next_job = worker_b.submit(trigger="test")
+            assert next_job.job_id != job.job_id
+            assert next_job.model_version != job.model_version
+            assert worker_a.submit(trigger="test").job_id == next_job.job_id
+            await asyncio.gather(*worker_b._tasks)
+        finally:
+            await worker_a.shutdown()
+            await worker_b.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import os
+
+from app.features.velocity import VelocityStore, claim_snapshot_slot
+
+
+def test_each_process_claims_its_own_snapshot_slot(tmp_path):
+    path = str(tmp_path / "velocity_snapshot.npz")
+
+    first = claim_snapshot_slot(path, slots=2)
+    second = claim_snapshot_slot(path, slots=2)
+    assert first[0] == path
+    assert second[0] == str(tmp_path / "velocity_snapshot.1.npz")
+    assert claim_snapshot_slot(path, slots=2) is None
+
+    # Al liberar un slot (p. ej. el worker se reinicia) el siguiente proceso lo reutiliza
+    first[1].close()
+    reclaimed = claim_snapshot_slot(path, slots=2)
+    assert reclaimed[0] == path
+    reclaimed[1].close()
+    second[1].close()
+
+
+def test_snapshot_round_trip_leaves_no_temporary_file(tmp_path):
+    path = str(tmp_path / "velocity_snapshot.npz")
+    store = VelocityStore(max_keys=100, clock=lambda: 1_700_000_000)
+    for amount in (100.0, 250.0, 75.0):
+        store.update({'amount': amount, 'cardHash': 'card-1', 'bin': '411111'})
+
+    VelocityStore.write_snapshot(store.snapshot(), path)
+    assert os.listdir(tmp_path) == ["velocity_snapshot.npz"]
+
+    restored = VelocityStore(max_keys=100, clock=lambda: 1_700_000_000)
+    assert restored.load_snapshot(path) == 2
+    transaction = {'amount': 10.0, 'cardHash': 'card-1', 'bin': '411111'}
+    assert restored.lookup(transaction) == store.lookup(transaction)
+
+
+def test_service_saves_its_snapshot_on_shutdown(make_client, transaction, tmp_path):
+    path = str(tmp_path / "velocity_snapshot.npz")
+    with make_client(VELOCITY_ENABLED=True, VELOCITY_SNAPSHOT_FILE=path, VELOCITY_SNAPSHOT_INTERVAL_SECONDS=0) as client:
+        assert client.post("/predict", json={**transaction, "cardHash": "card-1"}).status_code == 200
+
+    assert VelocityStore(max_keys=100).load_snapshot(path) == 2
@@ -154,7 +154,7 @@ docker-compose -f $COMPOSE_FILE up -d ml-service
 # Esperar a que el servicio ML esté listo
 log "Esperando a que el servicio ML esté listo..."
 counter=0
-while ! curl -f http://localhost:5000/health &>/dev/null; do
+while ! curl -f http://localhost:5000/health/ready &>/dev/null; do
     sleep 3
     counter=$((counter+3))
     if [ $counter -ge $timeout ]; then